@@ -7,5 +7,30 @@ load_dotenv()
 class Settings(BaseSettings):
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./analytics.db")
     DEBUG: bool = False
+    ASYNC_DB_ENABLED: bool = False
+    # Connection pool sizing, per process. Keep replicas * (size + overflow)
+    # below Postgres max_connections, or set DB_PGBOUNCER behind PgBouncer.
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_PGBOUNCER: bool = False
+    # Requests issuing more queries than this are logged as possible N+1 loops.
+    DB_N_PLUS_ONE_THRESHOLD: int = 10
+    # Buffered event ingestion (src/buffer.py): events per multi-row insert,
+    # longest an event waits before a flush, and buffer bound beyond which
+    # batches get 429. Events per batch request and errors listed back.
+    ANALYTICS_FLUSH_SIZE: int = 5000
+    ANALYTICS_FLUSH_INTERVAL_SECONDS: float = 1.0
+    ANALYTICS_BUFFER_MAX_EVENTS: int = 200000
+    ANALYTICS_BATCH_MAX_EVENTS: int = 10000
+    ANALYTICS_BATCH_MAX_ERRORS: int = 100
+    # Columnar event store (src/segments.py): directory for Parquet segments
+    # ("" disables it), payload keys extracted as typed columns per segment,
+    # and rows per row group (the unit of time pruning within a segment).
+    ANALYTICS_SEGMENT_DIR: str = ""
+    ANALYTICS_SEGMENT_MAX_COLUMNS: int = 64
+    ANALYTICS_SEGMENT_ROW_GROUP_SIZE: int = 1000
 
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,170 @@
+"""In-process buffer for analytics events.
+
+POST /api/analytics/events:batch only appends events here and returns; it
+never waits on the database. A single writer flushes the buffer when it
+holds ANALYTICS_FLUSH_SIZE events or every ANALYTICS_FLUSH_INTERVAL_SECONDS,
+with one multi-row INSERT per ANALYTICS_FLUSH_SIZE events. Each committed
+chunk is also written to the columnar store when it is enabled.
+
+The buffer is bounded by ANALYTICS_BUFFER_MAX_EVENTS, counting events being
+written. A batch that does not fit is rejected whole (the route answers 429)
+so a slow database pushes back on clients instead of growing memory. Events
+from a failed write go back to the front of the buffer and are retried;
+ones still buffered at shutdown are flushed by stop(). Events are lost only
+if the process dies before they are written.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from config.settings import settings
+from .database import SessionLocal
+from .logging_config import get_logger
+from .metrics import (
+    ANALYTICS_BUFFER_EVENTS, ANALYTICS_EVENT_LAG, ANALYTICS_EVENTS, ANALYTICS_FLUSH_DURATION, ANALYTICS_SEGMENT_ERRORS,
+)
+from .models import AnalyticsEvent
+from .segments import SegmentStore, segment_store
+
+logger = get_logger(__name__)
+
+
+class BufferFull(Exception):
+    """Raised when a batch does not fit in the buffer."""
+
+
+class EventBuffer:
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal,
+                 store: Optional[SegmentStore] = segment_store):
+        self.session_factory = session_factory
+        self.store = store
+        self._rows: List[dict] = []
+        # When the oldest buffered event was accepted (monotonic clock).
+        self._oldest: Optional[float] = None
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._rows)
+
+    def add(self, rows: List[dict]) -> None:
+        """Buffer ``rows`` (AnalyticsEvent column values) or raise BufferFull."""
+        with self._lock:
+            if len(self._rows) + self._in_flight + len(rows) > settings.ANALYTICS_BUFFER_MAX_EVENTS:
+                ANALYTICS_EVENTS.labels(result="rejected").inc(len(rows))
+                raise BufferFull()
+            if not self._rows:
+                self._oldest = time.monotonic()
+            self._rows.extend(rows)
+            size = len(self._rows)
+            ANALYTICS_BUFFER_EVENTS.set(size + self._in_flight)
+        ANALYTICS_EVENTS.labels(result="accepted").inc(len(rows))
+        if size >= settings.ANALYTICS_FLUSH_SIZE and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def flush(self) -> int:
+        """Write everything buffered; return the number of events written.
+
+        Runs on the writer thread. On a database error the unwritten events
+        are put back and the error is raised.
+        """
+        with self._lock:
+            rows, oldest = self._rows, self._oldest
+            self._rows, self._oldest = [], None
+            self._in_flight += len(rows)
+        written = 0
+        try:
+            for i in range(0, len(rows), settings.ANALYTICS_FLUSH_SIZE):
+                chunk = rows[i:i + settings.ANALYTICS_FLUSH_SIZE]
+                start = time.perf_counter()
+                db = self.session_factory()
+                try:
+                    db.execute(insert(AnalyticsEvent.__table__), chunk)
+                    db.commit()
+                finally:
+                    db.close()
+                ANALYTICS_FLUSH_DURATION.observe(time.perf_counter() - start)
+                written += len(chunk)
+                self._append_segment(chunk)
+        except Exception:
+            with self._lock:
+                self._rows[:0] = rows[written:]
+                self._oldest = oldest
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= len(rows)
+                ANALYTICS_BUFFER_EVENTS.set(len(self._rows) + self._in_flight)
+            if written:
+                ANALYTICS_EVENTS.labels(result="written").inc(written)
+                ANALYTICS_EVENT_LAG.observe(time.monotonic() - oldest)
+        return written
+
+    def _append_segment(self, chunk: List[dict]) -> None:
+        """Copy a committed chunk to the columnar store; a failure there does
+        not fail the flush, as the events are already in the database."""
+        if self.store is None:
+            return
+        try:
+            self.store.append(chunk)
+        except Exception as e:
+            ANALYTICS_SEGMENT_ERRORS.inc()
+            logger.error(f"Writing analytics segment of {len(chunk)} events failed: {e}")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), settings.ANALYTICS_FLUSH_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if not len(self):
+                continue
+            try:
+                await self._loop.run_in_executor(self._executor, self.flush)
+            except Exception as e:
+                logger.error(f"Analytics event flush failed, retrying: {e}")
+                await asyncio.sleep(settings.ANALYTICS_FLUSH_INTERVAL_SECONDS)
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        # One writer thread: flushes never overlap, and events are written in
+        # the order they were accepted.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="analytics-writer")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the writer and flush what is left."""
+        if self._executor is None:
+            return
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            if len(self):
+                await self._loop.run_in_executor(self._executor, self.flush)
+        except Exception as e:
+            logger.error(f"Final analytics event flush failed, {len(self)} events lost: {e}")
+        finally:
+            self._loop = None
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._rows, self._oldest = [], None
+
+
+event_buffer = EventBuffer()
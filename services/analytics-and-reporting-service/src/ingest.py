@@ -0,0 +1,89 @@
+"""Parsing of analytics event batches (a JSON array or NDJSON).
+
+Each event is validated on its own. Invalid ones are recorded by position
+(array index or line number, from 1) and skipped, so one bad event does not
+cost the client the rest of the batch.
+"""
+import json
+from datetime import datetime, timezone
+from typing import List, Tuple
+
+from pydantic import ValidationError
+
+from .schemas import BatchEvent, EventBatchError
+
+JSON_TYPES = ("application/json",)
+NDJSON_TYPES = ("application/x-ndjson", "application/jsonl", "application/json-seq", "application/ndjson")
+
+
+class UnsupportedBatchType(Exception):
+    """Raised for a Content-Type other than JSON or NDJSON."""
+
+
+class BadBatch(Exception):
+    """Raised when a JSON body is not an array of events."""
+
+
+def _describe(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, e['loc'])) or 'event'}: {e['msg']}" for e in error.errors())
+
+
+def naive_utc(value: datetime) -> datetime:
+    """Timestamps are stored as naive UTC."""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _row(event: BatchEvent, received: datetime) -> dict:
+    """AnalyticsEvent column values."""
+    return {
+        "event_type": event.event_type,
+        "payload": json.dumps(event.payload) if event.payload else None,
+        "timestamp": naive_utc(event.timestamp or received),
+    }
+
+
+def _items(body: bytes, media_type: str):
+    """Yield (position, decoded item or the decoding error)."""
+    if media_type in JSON_TYPES:
+        try:
+            items = json.loads(body)
+        except ValueError as e:
+            raise BadBatch(f"Invalid JSON: {e}")
+        if not isinstance(items, list):
+            raise BadBatch("Expected a JSON array of events")
+        yield from enumerate(items, 1)
+        return
+    for number, line in enumerate(body.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as e:
+            yield number, e
+
+
+def parse_events(body: bytes, content_type: str, max_errors: int) -> Tuple[List[dict], int, List[EventBatchError]]:
+    """Return (rows, rejected count, first ``max_errors`` errors)."""
+    media_type = content_type.split(";")[0].strip().lower()
+    if media_type not in JSON_TYPES + NDJSON_TYPES:
+        raise UnsupportedBatchType(media_type)
+    received = datetime.utcnow()
+    rows: List[dict] = []
+    errors: List[EventBatchError] = []
+    rejected = 0
+    for position, item in _items(body, media_type):
+        try:
+            if isinstance(item, ValueError):
+                raise item
+            rows.append(_row(BatchEvent.model_validate(item), received))
+            continue
+        except ValidationError as e:
+            message = _describe(e)
+        except ValueError as e:
+            message = str(e)
+        rejected += 1
+        if len(errors) < max_errors:
+            errors.append(EventBatchError(line=position, error=message))
+    return rows, rejected, errors
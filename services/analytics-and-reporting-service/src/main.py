@@ -1,62 +1,129 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+import math
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from datetime import datetime
+from config.settings import settings
+from .buffer import BufferFull, event_buffer
 from .database import get_db, engine, Base
+from .ingest import BadBatch, UnsupportedBatchType, naive_utc, parse_events
+from .segments import event_type_counts, segment_store
 from .schemas import (
-    EventCreate, EventResponse,
+    EventCreate, EventResponse, EventBatchResult, EventTypeCount,
     JobCreate, JobResponse,
     ReportCreate, ReportResponse,
     DashboardCreate, DashboardUpdate, DashboardResponse
 )
-from .services import AnalyticsService
+from .services import AsyncAnalyticsService
+from .query_metrics import QueryMetricsMiddleware
 
 # Create tables
 # Base.metadata.create_all(bind=engine)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await event_buffer.start()
+    yield
+    await event_buffer.stop()
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(QueryMetricsMiddleware)
 
 @app.post("/api/analytics/data", response_model=EventResponse, status_code=status.HTTP_201_CREATED)
-def submit_data(event: EventCreate, db: Session = Depends(get_db)):
-    return AnalyticsService.submit_data(db, event)
+async def submit_data(event: EventCreate, db: Session = Depends(get_db)):
+    """Store one event and return its row.
+
+    The event is written straight to the database, not through the event
+    buffer, so it is not counted by /api/analytics/events/summary. Use
+    /api/analytics/events:batch for events that should be.
+    """
+    return await AsyncAnalyticsService.submit_data(db, event)
+
+@app.post("/api/analytics/events:batch", response_model=EventBatchResult, status_code=status.HTTP_202_ACCEPTED)
+async def submit_events(request: Request):
+    """Accept a JSON array or NDJSON of events; they are written in the background.
+
+    Answers 429 when the write buffer is full; the client should retry the
+    whole batch later.
+    """
+    body = await request.body()
+    try:
+        rows, rejected, errors = await run_in_threadpool(
+            parse_events, body, request.headers.get("content-type", ""), settings.ANALYTICS_BATCH_MAX_ERRORS)
+    except UnsupportedBatchType as e:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Unsupported Content-Type {str(e)!r}; send application/json or application/x-ndjson",
+        )
+    except BadBatch as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if len(rows) + rejected > settings.ANALYTICS_BATCH_MAX_EVENTS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.ANALYTICS_BATCH_MAX_EVENTS} events per batch",
+        )
+    if rows:
+        try:
+            event_buffer.add(rows)
+        except BufferFull:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Event buffer is full, retry later",
+                headers={"Retry-After": str(math.ceil(settings.ANALYTICS_FLUSH_INTERVAL_SECONDS))},
+            )
+    return EventBatchResult(accepted=len(rows), rejected=rejected, errors=errors)
+
+@app.get("/api/analytics/events/summary", response_model=List[EventTypeCount])
+async def event_summary(start: Optional[datetime] = None, end: Optional[datetime] = None):
+    """Events per type in [start, end), counted from the columnar store.
+
+    Only events accepted by /api/analytics/events:batch while the store was
+    enabled are counted; ones sent to /api/analytics/data are not.
+    """
+    if segment_store is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Columnar event store is not enabled")
+    return await run_in_threadpool(
+        event_type_counts, segment_store, start and naive_utc(start), end and naive_utc(end))
 
 @app.get("/api/analytics/status")
 def get_analytics_status():
     return {"status": "operational", "timestamp": datetime.utcnow()}
 
 @app.post("/api/analytics/jobs", response_model=JobResponse, status_code=status.HTTP_201_CREATED)
-def schedule_job(job: JobCreate, db: Session = Depends(get_db)):
-    return AnalyticsService.schedule_job(db, job)
+async def schedule_job(job: JobCreate, db: Session = Depends(get_db)):
+    return await AsyncAnalyticsService.schedule_job(db, job)
 
 @app.get("/api/analytics/jobs/{job_id}", response_model=JobResponse)
-def get_job(job_id: int, db: Session = Depends(get_db)):
-    job = AnalyticsService.get_job(db, job_id)
+async def get_job(job_id: int, db: Session = Depends(get_db)):
+    job = await AsyncAnalyticsService.get_job(db, job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     return job
 
 @app.post("/api/reports/generate", response_model=ReportResponse, status_code=status.HTTP_201_CREATED)
-def generate_report(report: ReportCreate, db: Session = Depends(get_db)):
-    return AnalyticsService.generate_report(db, report)
+async def generate_report(report: ReportCreate, db: Session = Depends(get_db)):
+    return await AsyncAnalyticsService.generate_report(db, report)
 
 @app.get("/api/reports/{report_id}", response_model=ReportResponse)
-def get_report(report_id: int, db: Session = Depends(get_db)):
-    report = AnalyticsService.get_report(db, report_id)
+async def get_report(report_id: int, db: Session = Depends(get_db)):
+    report = await AsyncAnalyticsService.get_report(db, report_id)
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
     return report
 
 @app.get("/api/dashboards", response_model=List[DashboardResponse])
-def list_dashboards(db: Session = Depends(get_db)):
-    return AnalyticsService.list_dashboards(db)
+async def list_dashboards(db: Session = Depends(get_db)):
+    return await AsyncAnalyticsService.list_dashboards(db)
 
 @app.post("/api/dashboards", response_model=DashboardResponse, status_code=status.HTTP_201_CREATED)
-def create_dashboard(dashboard: DashboardCreate, db: Session = Depends(get_db)):
-    return AnalyticsService.create_dashboard(db, dashboard)
+async def create_dashboard(dashboard: DashboardCreate, db: Session = Depends(get_db)):
+    return await AsyncAnalyticsService.create_dashboard(db, dashboard)
 
 @app.patch("/api/dashboards/{dashboard_id}", response_model=DashboardResponse)
-def update_dashboard(dashboard_id: int, update: DashboardUpdate, db: Session = Depends(get_db)):
-    dashboard_resp = AnalyticsService.update_dashboard(db, dashboard_id, update)
+async def update_dashboard(dashboard_id: int, update: DashboardUpdate, db: Session = Depends(get_db)):
+    dashboard_resp = await AsyncAnalyticsService.update_dashboard(db, dashboard_id, update)
     if not dashboard_resp:
         raise HTTPException(status_code=404, detail="Dashboard not found")
     return dashboard_resp
@@ -26,7 +26,97 @@ ACTIVE_REQUESTS = Gauge(
 DB_QUERY_COUNT = Counter(
     "db_queries_total",
     "Total database queries",
-    ["operation"]
+    ["operation", "route"]
+)
+
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds",
+    "Database statement execution time in seconds",
+    ["operation", "route"],
+    buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0]
+)
+
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request",
+    "Database statements issued while serving one request",
+    ["route"],
+    buckets=[1, 2, 3, 5, 10, 20, 50, 100]
+)
+
+DB_N_PLUS_ONE_REQUESTS = Counter(
+    "db_n_plus_one_requests_total",
+    "Requests that issued more than DB_N_PLUS_ONE_THRESHOLD queries",
+    ["route"]
+)
+
+ANALYTICS_EVENTS = Counter(
+    "analytics_events_total",
+    "Analytics events by result (accepted, rejected, written)",
+    ["result"]
+)
+
+ANALYTICS_BUFFER_EVENTS = Gauge(
+    "analytics_buffer_events",
+    "Analytics events buffered or being written"
+)
+
+ANALYTICS_FLUSH_DURATION = Histogram(
+    "analytics_flush_duration_seconds",
+    "Time to write one chunk of buffered analytics events",
+    buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0]
+)
+
+ANALYTICS_EVENT_LAG = Histogram(
+    "analytics_event_flush_lag_seconds",
+    "Time the oldest event of a flush waited in the buffer before being written",
+    buckets=[0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0]
+)
+
+ANALYTICS_SEGMENTS = Gauge(
+    "analytics_segments",
+    "Columnar event segments listed in the manifest"
+)
+
+ANALYTICS_SEGMENT_WRITE_DURATION = Histogram(
+    "analytics_segment_write_seconds",
+    "Time to encode and write one columnar event segment",
+    buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5]
+)
+
+ANALYTICS_SEGMENT_ERRORS = Counter(
+    "analytics_segment_errors_total",
+    "Flushed event chunks that could not be written as a segment"
+)
+
+ANALYTICS_SCAN_SEGMENTS = Counter(
+    "analytics_scan_segments_total",
+    "Segments considered by scans, by result (read, pruned)",
+    ["result"]
+)
+
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a database connection from the pool",
+    ["engine"],
+    buckets=[0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0]
+)
+
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts_total",
+    "Connection checkouts that gave up after DB_POOL_TIMEOUT",
+    ["engine"]
+)
+
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_connections_checked_out",
+    "Database connections currently in use",
+    ["engine"]
+)
+
+DB_POOL_SATURATION = Gauge(
+    "db_pool_saturation_ratio",
+    "Checked-out connections as a fraction of pool size plus overflow",
+    ["engine"]
 )
 
 
@@ -51,3 +141,12 @@ def setup_metrics(app, service_name: str):
     instrumentator.instrument(app).expose(app, endpoint="/metrics")
     
     return instrumentator
+
+
+def track_pool(pool, engine: str, max_overflow: int):
+    """Export usage of a SQLAlchemy QueuePool, read at scrape time."""
+    capacity = pool.size() + max(max_overflow, 0)
+    DB_POOL_CHECKED_OUT.labels(engine=engine).set_function(pool.checkedout)
+    DB_POOL_SATURATION.labels(engine=engine).set_function(
+        lambda: pool.checkedout() / capacity if capacity else 0.0
+    )
@@ -1,11 +1,28 @@
 from pydantic import BaseModel, ConfigDict
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 
 class EventCreate(BaseModel):
     event_type: str
     payload: Optional[Dict[str, Any]] = None
 
+class BatchEvent(EventCreate):
+    # When the client saw the event; defaults to when the batch was received.
+    timestamp: Optional[datetime] = None
+
+class EventBatchError(BaseModel):
+    line: int
+    error: str
+
+class EventBatchResult(BaseModel):
+    accepted: int
+    rejected: int
+    errors: List[EventBatchError] = []
+
+class EventTypeCount(BaseModel):
+    event_type: Optional[str]
+    count: int
+
 class EventResponse(BaseModel):
     id: int
     event_type: str
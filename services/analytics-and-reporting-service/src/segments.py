@@ -0,0 +1,182 @@
+"""Append-only columnar store of analytics events.
+
+Each chunk the buffered writer (src/buffer.py) commits is also written as
+one zstd-compressed Parquet segment under ANALYTICS_SEGMENT_DIR:
+
+* ``timestamp`` (microseconds), ``event_type`` (dictionary encoded) and the
+  raw ``payload`` JSON, plus
+* one typed column per top-level scalar payload key, named
+  ``payload.<key>`` (at most ANALYTICS_SEGMENT_MAX_COLUMNS per segment). A
+  key whose values have mixed types in a chunk is stored as JSON strings,
+  and one typed differently in other segments is read back as strings.
+
+``manifest.json`` lists the segments with their row count, min/max
+timestamp and column types. It is replaced atomically after each segment
+is written, so a segment is visible only once complete.
+
+scan() skips segments whose time range misses the query. Files are memory
+mapped, and only the requested columns and the row groups in range are
+read. The database table stays the system of record. Only events that
+went through the buffer are here: POST /api/analytics/data writes its one
+event straight to the database, and nothing rebuilds the store from the
+table if its directory is lost.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from config.settings import settings
+from .metrics import ANALYTICS_SCAN_SEGMENTS, ANALYTICS_SEGMENT_WRITE_DURATION, ANALYTICS_SEGMENTS
+
+MANIFEST = "manifest.json"
+BASE_COLUMNS = ("timestamp", "event_type", "payload")
+PAYLOAD_PREFIX = "payload."
+_TIMESTAMP = pa.timestamp("us")
+
+
+def _payload_columns(payloads: List[Optional[dict]]) -> Dict[str, pa.Array]:
+    """Typed arrays for the top-level scalar keys of ``payloads``."""
+    keys: Dict[str, None] = {}
+    for payload in payloads:
+        for key, value in (payload or {}).items():
+            if not isinstance(value, (dict, list)) and len(keys) < settings.ANALYTICS_SEGMENT_MAX_COLUMNS:
+                keys.setdefault(key)
+    columns = {}
+    for key in keys:
+        values = [None if payload is None else payload.get(key) for payload in payloads]
+        try:
+            array = pa.array(values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            array = pa.array([None if v is None else json.dumps(v) for v in values], pa.string())
+        if pa.types.is_null(array.type):
+            continue
+        columns[PAYLOAD_PREFIX + key] = array
+    return columns
+
+
+def to_table(rows: List[dict]) -> pa.Table:
+    """Columnar form of AnalyticsEvent rows as produced by src/ingest.py."""
+    payloads = [json.loads(row["payload"]) if row["payload"] else None for row in rows]
+    columns = {
+        "timestamp": pa.array([row["timestamp"] for row in rows], _TIMESTAMP),
+        "event_type": pa.array([row["event_type"] for row in rows], pa.string()).dictionary_encode(),
+        "payload": pa.array([row["payload"] for row in rows], pa.string()),
+    }
+    columns.update(_payload_columns(payloads))
+    return pa.table(columns)
+
+
+class SegmentStore:
+    """Segments and their manifest in ``directory``; one writer per directory."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._segments: Optional[List[dict]] = None
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def segments(self) -> List[dict]:
+        with self._lock:
+            if self._segments is None:
+                try:
+                    with open(self._path(MANIFEST)) as f:
+                        self._segments = json.load(f)["segments"]
+                except FileNotFoundError:
+                    self._segments = []
+                ANALYTICS_SEGMENTS.set(len(self._segments))
+            return list(self._segments)
+
+    def append(self, rows: List[dict]) -> Optional[dict]:
+        """Write ``rows`` as a new segment and return its manifest entry."""
+        if not rows:
+            return None
+        start = time.perf_counter()
+        table = to_table(rows)
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}.parquet"
+        temp = self._path(f".{name}.tmp")
+        pq.write_table(table, temp, compression="zstd", row_group_size=settings.ANALYTICS_SEGMENT_ROW_GROUP_SIZE)
+        os.replace(temp, self._path(name))
+        timestamps = table.column("timestamp")
+        entry = {
+            "file": name,
+            "rows": table.num_rows,
+            "min_timestamp": pc.min(timestamps).as_py().isoformat(),
+            "max_timestamp": pc.max(timestamps).as_py().isoformat(),
+            "columns": {field.name: str(field.type) for field in table.schema},
+        }
+        segments = self.segments() + [entry]
+        temp = self._path(f".{MANIFEST}.tmp")
+        with open(temp, "w") as f:
+            json.dump({"segments": segments}, f)
+        os.replace(temp, self._path(MANIFEST))
+        with self._lock:
+            self._segments = segments
+        ANALYTICS_SEGMENTS.set(len(segments))
+        ANALYTICS_SEGMENT_WRITE_DURATION.observe(time.perf_counter() - start)
+        return entry
+
+    def scan(self, columns: Iterable[str], start: Optional[datetime] = None,
+             end: Optional[datetime] = None) -> pa.Table:
+        """``columns`` of the events with start <= timestamp < end (naive UTC).
+
+        Columns a segment lacks come back as nulls. A column whose type
+        differs between the segments read comes back as strings.
+        """
+        columns = list(dict.fromkeys(columns))
+        filters = []
+        if start is not None:
+            filters.append(("timestamp", ">=", pa.scalar(start, _TIMESTAMP)))
+        if end is not None:
+            filters.append(("timestamp", "<", pa.scalar(end, _TIMESTAMP)))
+        segments = []
+        for segment in self.segments():
+            if ((start is not None and datetime.fromisoformat(segment["max_timestamp"]) < start)
+                    or (end is not None and datetime.fromisoformat(segment["min_timestamp"]) >= end)):
+                ANALYTICS_SCAN_SEGMENTS.labels(result="pruned").inc()
+            else:
+                segments.append(segment)
+        # A payload key typed differently across segments is read as strings.
+        types: Dict[str, set] = {}
+        for segment in segments:
+            for column, type_name in segment["columns"].items():
+                types.setdefault(column, set()).add(type_name)
+        mixed = {column for column in columns if len(types.get(column, ())) > 1}
+        tables = []
+        for segment in segments:
+            ANALYTICS_SCAN_SEGMENTS.labels(result="read").inc()
+            present = [c for c in columns if c in segment["columns"]]
+            table = pq.read_table(self._path(segment["file"]), columns=present, filters=filters or None,
+                                  memory_map=True)
+            for column in columns:
+                if column not in segment["columns"]:
+                    table = table.append_column(column, pa.nulls(table.num_rows))
+                elif column in mixed:
+                    index = table.schema.get_field_index(column)
+                    table = table.set_column(index, column, pc.cast(table.column(column), pa.string()))
+            tables.append(table.select(columns))
+        if not tables:
+            return pa.table({column: pa.array([]) for column in columns})
+        return pa.concat_tables(tables, promote_options="permissive")
+
+
+def event_type_counts(store: SegmentStore, start: Optional[datetime] = None,
+                      end: Optional[datetime] = None) -> List[dict]:
+    """Events per event_type in [start, end), reading only that column."""
+    column = store.scan(["event_type"], start, end).column("event_type").cast(pa.string())
+    counts = pc.value_counts(column).to_pylist()
+    return sorted(({"event_type": c["values"], "count": c["counts"]} for c in counts),
+                  key=lambda c: (-c["count"], c["event_type"] or ""))
+
+
+segment_store = SegmentStore(settings.ANALYTICS_SEGMENT_DIR) if settings.ANALYTICS_SEGMENT_DIR else None
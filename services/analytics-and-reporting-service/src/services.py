@@ -4,6 +4,7 @@ from datetime import datetime
 import json
 from .models import AnalyticsEvent, AnalyticsJob, Report, Dashboard
 from .schemas import EventCreate, JobCreate, ReportCreate, DashboardCreate, DashboardUpdate, DashboardResponse
+from .database import AsyncService
 
 class AnalyticsService:
     @staticmethod
@@ -97,3 +98,5 @@ class AnalyticsService:
             configuration=json.loads(dashboard.configuration),
             created_at=dashboard.created_at
         )
+
+AsyncAnalyticsService = AsyncService(AnalyticsService)
@@ -1,14 +1,22 @@
 import pytest
 import json
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock, patch
 from fastapi.testclient import TestClient
 from datetime import datetime
 from src.main import app, get_db
 from src.models import AnalyticsEvent, AnalyticsJob, Report, Dashboard
+from src.buffer import EventBuffer, event_buffer
+from src.segments import SegmentStore, event_type_counts
 
 
 # --- Fixtures ---
 
+@pytest.fixture(autouse=True)
+def clear_event_buffer():
+    event_buffer.clear()
+    yield
+    event_buffer.clear()
+
 @pytest.fixture
 def mock_db_session():
     """Returns a mock implementation of the SQLAlchemy Session."""
@@ -36,8 +44,10 @@ def client(mock_db_session):
             pass
     
     app.dependency_overrides[get_db] = override_get_db
-    with TestClient(app) as c:
-        yield c
+    # The buffered writer is exercised directly below.
+    with patch("src.main.event_buffer.start", AsyncMock()), patch("src.main.event_buffer.stop", AsyncMock()):
+        with TestClient(app) as c:
+            yield c
     app.dependency_overrides = {}
 
 # --- Tests ---
@@ -135,3 +145,127 @@ def test_update_dashboard(client, mock_db_session):
     assert response.status_code == 200
     assert response.json()["configuration"] == new_config
     assert json.loads(mock_dash.configuration) == new_config
+
+# --- Tests for batched event ingestion ---
+
+def test_submit_events_batch_ndjson(client):
+    body = "\n".join([
+        json.dumps({"event_type": "page_view", "payload": {"url": "/home"}}),
+        json.dumps({"payload": {"url": "/cart"}}),
+        json.dumps({"event_type": "click", "timestamp": "2026-10-18T09:30:00+05:30"}),
+    ])
+    response = client.post("/api/analytics/events:batch", content=body,
+                           headers={"Content-Type": "application/x-ndjson"})
+
+    assert response.status_code == 202
+    result = response.json()
+    assert (result["accepted"], result["rejected"]) == (2, 1)
+    assert result["errors"][0]["line"] == 2
+    assert len(event_buffer) == 2
+
+def test_submit_events_batch_returns_429_when_buffer_full(client, monkeypatch):
+    monkeypatch.setattr("src.buffer.settings.ANALYTICS_BUFFER_MAX_EVENTS", 1)
+    events = [{"event_type": "click"}, {"event_type": "click"}]
+
+    response = client.post("/api/analytics/events:batch", json=events)
+
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
+    assert len(event_buffer) == 0
+
+def test_buffer_flush_uses_one_multi_row_insert():
+    session = MagicMock()
+    buffer = EventBuffer(lambda: session)
+    buffer.add([{"event_type": "click", "payload": None, "timestamp": datetime.utcnow()} for _ in range(3)])
+
+    assert buffer.flush() == 3
+
+    session.execute.assert_called_once()
+    assert len(session.execute.call_args[0][1]) == 3
+    session.commit.assert_called_once()
+    assert len(buffer) == 0
+
+def test_buffer_keeps_events_when_flush_fails():
+    session = MagicMock()
+    session.execute.side_effect = Exception("connection refused")
+    buffer = EventBuffer(lambda: session)
+    buffer.add([{"event_type": "click", "payload": None, "timestamp": datetime.utcnow()}])
+
+    with pytest.raises(Exception, match="connection refused"):
+        buffer.flush()
+    assert len(buffer) == 1
+
+def _event(event_type, timestamp, **payload):
+    return {"event_type": event_type, "payload": json.dumps(payload) if payload else None, "timestamp": timestamp}
+
+def test_segment_scan_reads_requested_columns_in_range(tmp_path):
+    store = SegmentStore(str(tmp_path))
+    store.append([_event("click", datetime(2024, 1, 1, 10), url="/a", ms=12),
+                  _event("view", datetime(2024, 1, 1, 11), url="/b")])
+    store.append([_event("click", datetime(2024, 1, 2, 10), button="buy")])
+
+    table = store.scan(["event_type", "payload.ms"], start=datetime(2024, 1, 1), end=datetime(2024, 1, 1, 11))
+
+    assert table.column_names == ["event_type", "payload.ms"]
+    assert table.to_pylist() == [{"event_type": "click", "payload.ms": 12}]
+    # Reopening reads the manifest back; the second segment lacks payload.url.
+    table = SegmentStore(str(tmp_path)).scan(["payload.url"], start=datetime(2024, 1, 1, 11))
+    assert table.column("payload.url").to_pylist() == ["/b", None]
+    assert event_type_counts(store) == [{"event_type": "click", "count": 2}, {"event_type": "view", "count": 1}]
+
+def test_segment_scan_reads_key_typed_differently_across_segments_as_strings(tmp_path):
+    store = SegmentStore(str(tmp_path))
+    store.append([_event("click", datetime(2024, 1, 1, 10), x=1)])
+    store.append([_event("click", datetime(2024, 1, 1, 11), x="one")])
+    store.append([_event("click", datetime(2024, 1, 1, 12), y=True)])
+
+    assert store.scan(["payload.x"]).column("payload.x").to_pylist() == ["1", "one", None]
+    # Only the segments read decide: in range, payload.x is all int64.
+    assert store.scan(["payload.x"], end=datetime(2024, 1, 1, 11)).column("payload.x").to_pylist() == [1]
+
+def test_buffer_flush_appends_segment_and_survives_segment_errors(tmp_path):
+    store = SegmentStore(str(tmp_path))
+    buffer = EventBuffer(lambda: MagicMock(), store)
+    buffer.add([_event("click", datetime.utcnow())])
+    assert buffer.flush() == 1
+    assert [s["rows"] for s in store.segments()] == [1]
+
+    store.append = MagicMock(side_effect=OSError("disk full"))
+    buffer.add([_event("click", datetime.utcnow())])
+    assert buffer.flush() == 1
+    assert len(buffer) == 0
+
+
+def test_request_queries_and_pool_checkouts_are_recorded(tmp_path):
+    from prometheus_client import REGISTRY
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from src.database import Base, TimedQueuePool, pool_options, settings, track_engine_pool
+
+    # The pool the service would build for Postgres, over a SQLite file.
+    engine = create_engine(
+        f"sqlite:///{tmp_path}/queries.db", **pool_options("postgresql+psycopg://u:p@db/app", TimedQueuePool))
+    assert isinstance(engine.pool, TimedQueuePool) and engine.pool.size() == settings.DB_POOL_SIZE
+    Base.metadata.create_all(engine)
+    track_engine_pool(engine, "sync")
+    sessions = sessionmaker(bind=engine)
+
+    def sqlite_db():
+        db = sessions()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = sqlite_db
+    route = "/api/analytics/jobs/{job_id}"
+    selects = REGISTRY.get_sample_value("db_queries_total", {"operation": "select", "route": route}) or 0
+    requests = REGISTRY.get_sample_value("db_queries_per_request_count", {"route": route}) or 0
+    checkouts = REGISTRY.get_sample_value("db_pool_checkout_wait_seconds_count", {"engine": "sync"}) or 0
+    try:
+        assert TestClient(app).get("/api/analytics/jobs/1").status_code == 404
+    finally:
+        app.dependency_overrides = {}
+    assert REGISTRY.get_sample_value("db_queries_total", {"operation": "select", "route": route}) > selects
+    assert REGISTRY.get_sample_value("db_queries_per_request_count", {"route": route}) == requests + 1
+    assert REGISTRY.get_sample_value("db_pool_checkout_wait_seconds_count", {"engine": "sync"}) > checkouts
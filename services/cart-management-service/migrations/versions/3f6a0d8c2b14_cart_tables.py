@@ -0,0 +1,56 @@
+"""cart_tables
+
+Revision ID: 3f6a0d8c2b14
+Revises: a79f44c9e5f1
+Create Date: 2026-10-18 14:02:40.118305
+
+This revision owns carts and cart_items: upgrade creates them and
+downgrade drops them. A database whose tables were made by
+Base.metadata.create_all before uq_cart_items_cart_product existed already
+has them; run ``alembic stamp 3f6a0d8c2b14`` on it once, then
+``alembic upgrade head``.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f6a0d8c2b14'
+down_revision: Union[str, Sequence[str], None] = 'a79f44c9e5f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # initial_schema shipped empty; create the tables it should have.
+    op.create_table(
+        "carts",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("username", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_carts_id", "carts", ["id"])
+    op.create_index("ix_carts_username", "carts", ["username"], unique=True)
+    op.create_table(
+        "cart_items",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("cart_id", sa.Integer(), sa.ForeignKey("carts.id"), nullable=True),
+        sa.Column("product_id", sa.Integer(), nullable=True),
+        sa.Column("quantity", sa.Integer(), nullable=True),
+    )
+    op.create_index("ix_cart_items_id", "cart_items", ["id"])
+    op.create_index("ix_cart_items_product_id", "cart_items", ["product_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_cart_items_product_id", table_name="cart_items")
+    op.drop_index("ix_cart_items_id", table_name="cart_items")
+    op.drop_table("cart_items")
+    op.drop_index("ix_carts_username", table_name="carts")
+    op.drop_index("ix_carts_id", table_name="carts")
+    op.drop_table("carts")
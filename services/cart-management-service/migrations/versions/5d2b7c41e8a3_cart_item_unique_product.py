@@ -0,0 +1,38 @@
+"""cart_item_unique_product
+
+Revision ID: 5d2b7c41e8a3
+Revises: 3f6a0d8c2b14
+Create Date: 2026-10-18 14:05:12.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2b7c41e8a3'
+down_revision: Union[str, Sequence[str], None] = '3f6a0d8c2b14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Fold duplicate lines into the oldest one before enforcing uniqueness.
+    op.execute(
+        "UPDATE cart_items SET quantity = ("
+        " SELECT sum(d.quantity) FROM cart_items d"
+        " WHERE d.cart_id = cart_items.cart_id AND d.product_id = cart_items.product_id)"
+        " WHERE id IN (SELECT min(id) FROM cart_items GROUP BY cart_id, product_id HAVING count(*) > 1)"
+    )
+    op.execute(
+        "DELETE FROM cart_items WHERE id NOT IN (SELECT min(id) FROM cart_items GROUP BY cart_id, product_id)"
+    )
+    op.create_index("uq_cart_items_cart_product", "cart_items", ["cart_id", "product_id"], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Duplicate lines merged by upgrade() stay merged.
+    op.drop_index("uq_cart_items_cart_product", table_name="cart_items")
@@ -0,0 +1,289 @@
+"""Hot-cart and verified-token caches.
+
+GET /api/cart is served from here when possible. Mutations write the cart
+they return back into the cache, so a user reopening the cart page right
+after changing it does not touch Postgres.
+
+Each cached cart has a version, changed by every invalidate and fill. A
+reader takes the version before reading Postgres and fills the cache only
+if it is unchanged, so a GET that read the cart while a mutation was in
+flight cannot put the old cart back after the mutation refreshed it.
+
+Without Redis each replica keeps its own LRU, and a cart changed through
+another replica can be served stale for up to CART_CACHE_TTL_SECONDS. Set
+REDIS_URL (the same URL the rate limiter uses) to share one cache across
+replicas.
+
+verified_tokens lets get_current_username skip jwt.decode for a token it
+has already checked.
+"""
+import hashlib
+import itertools
+import threading
+import uuid
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from config.settings import settings
+from .logging_config import get_logger
+from .metrics import AUTH_CACHE_REQUESTS, CART_CACHE_REQUESTS
+from .schemas import CartResponse
+
+logger = get_logger(__name__)
+
+
+class TTLCache:
+    """Thread-safe LRU mapping whose entries expire ``ttl`` seconds after being set."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class VerifiedTokenCache:
+    """Claims of already-verified JWTs, keyed by the token's SHA-256.
+
+    An entry lives until the token's ``exp`` (capped at ``max_ttl``), so an
+    expired token is never served from here and goes back through
+    ``jwt.decode``, which rejects it.
+    """
+
+    def __init__(self, maxsize: int, max_ttl: float):
+        self.max_ttl = max_ttl
+        self._entries = TTLCache(maxsize, max_ttl)
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[dict]:
+        claims = self._entries.get(self._key(token))
+        AUTH_CACHE_REQUESTS.labels(cache="token", result="hit" if claims is not None else "miss").inc()
+        return claims
+
+    def put(self, token: str, claims: dict) -> None:
+        ttl = self.max_ttl
+        if "exp" in claims:
+            ttl = min(ttl, float(claims["exp"]) - time.time())
+        if ttl > 0:
+            self._entries.set(self._key(token), claims, ttl=ttl)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class MemoryCartStore:
+    def __init__(self, maxsize: int, ttl: float):
+        self._entries = TTLCache(maxsize, ttl)
+        # Versions come from one counter, so a version that was evicted and
+        # recreated never matches one handed out before.
+        self._versions = TTLCache(maxsize, ttl)
+        self._counter = itertools.count(1)
+
+    async def get(self, username: str) -> Optional[CartResponse]:
+        return self._entries.get(username)
+
+    async def set(self, username: str, cart: CartResponse) -> None:
+        self._entries.set(username, cart)
+
+    async def delete(self, username: str) -> None:
+        self._entries.pop(username)
+
+    # None of these await, so each runs atomically on the event loop.
+    async def version(self, username: str) -> int:
+        version = self._versions.get(username)
+        if version is None:
+            version = next(self._counter)
+            self._versions.set(username, version)
+        return version
+
+    async def invalidate(self, username: str) -> int:
+        self._entries.pop(username)
+        version = next(self._counter)
+        self._versions.set(username, version)
+        return version
+
+    async def fill(self, username: str, cart: CartResponse, version: int) -> bool:
+        if self._versions.get(username) != version:
+            return False
+        self._entries.set(username, cart)
+        self._versions.set(username, next(self._counter))
+        return True
+
+    async def clear(self) -> None:
+        self._entries.clear()
+        self._versions.clear()
+
+
+class RedisCartStore:
+    """Carts stored as JSON under ``cart:<username>`` in Redis.
+
+    ``client`` is a ``redis.asyncio.Redis`` or anything with the same
+    get/set/delete coroutines. Redis errors are logged and treated as a
+    miss: the cache must never fail a request.
+    """
+
+    PREFIX = "cart:"
+    VERSION_PREFIX = "cart-version:"
+
+    # Versions are random tokens, so one that expired and was recreated
+    # never matches a token handed out before.
+    _VERSION = """
+local version = redis.call('get', KEYS[1])
+if not version then
+    version = ARGV[1]
+    redis.call('set', KEYS[1], version, 'px', ARGV[2])
+end
+return version
+"""
+    _INVALIDATE = """
+redis.call('del', KEYS[1])
+redis.call('set', KEYS[2], ARGV[1], 'px', ARGV[2])
+return ARGV[1]
+"""
+    _FILL = """
+if redis.call('get', KEYS[2]) ~= ARGV[1] then
+    return 0
+end
+redis.call('set', KEYS[1], ARGV[2], 'px', ARGV[4])
+redis.call('set', KEYS[2], ARGV[3], 'px', ARGV[4])
+return 1
+"""
+
+    def __init__(self, client, ttl: float):
+        self._client = client
+        self._ttl_ms = max(int(ttl * 1000), 1)
+
+    async def get(self, username: str) -> Optional[CartResponse]:
+        try:
+            payload = await self._client.get(self.PREFIX + username)
+        except Exception as e:
+            logger.warning(f"Cart cache read failed: {e}")
+            return None
+        return CartResponse.model_validate_json(payload) if payload else None
+
+    async def set(self, username: str, cart: CartResponse) -> None:
+        try:
+            await self._client.set(self.PREFIX + username, cart.model_dump_json(), px=self._ttl_ms)
+        except Exception as e:
+            logger.warning(f"Cart cache write failed: {e}")
+
+    async def delete(self, username: str) -> None:
+        try:
+            await self._client.delete(self.PREFIX + username)
+        except Exception as e:
+            # The entry may now outlive the change; it expires with the TTL.
+            logger.warning(f"Cart cache invalidation failed: {e}")
+
+    async def version(self, username: str) -> Optional[str]:
+        try:
+            version = await self._client.eval(
+                self._VERSION, 1, self.VERSION_PREFIX + username, uuid.uuid4().hex, self._ttl_ms)
+        except Exception as e:
+            logger.warning(f"Cart cache version read failed: {e}")
+            return None
+        return version.decode() if isinstance(version, bytes) else version
+
+    async def invalidate(self, username: str) -> Optional[str]:
+        version = uuid.uuid4().hex
+        try:
+            await self._client.eval(
+                self._INVALIDATE, 2, self.PREFIX + username, self.VERSION_PREFIX + username, version, self._ttl_ms)
+        except Exception as e:
+            # The entry may now outlive the change; it expires with the TTL.
+            logger.warning(f"Cart cache invalidation failed: {e}")
+            return None
+        return version
+
+    async def fill(self, username: str, cart: CartResponse, version: str) -> bool:
+        try:
+            return bool(await self._client.eval(
+                self._FILL, 2, self.PREFIX + username, self.VERSION_PREFIX + username,
+                version, cart.model_dump_json(), uuid.uuid4().hex, self._ttl_ms))
+        except Exception as e:
+            logger.warning(f"Cart cache write failed: {e}")
+            return False
+
+    async def clear(self) -> None:
+        pass
+
+
+class CartCache:
+    """Cart cache keyed by username, recording hits and misses."""
+
+    def __init__(self, store):
+        self.store = store
+
+    async def get(self, username: str) -> Optional[CartResponse]:
+        if not settings.CART_CACHE_ENABLED:
+            return None
+        cart = await self.store.get(username)
+        CART_CACHE_REQUESTS.labels(result="hit" if cart is not None else "miss").inc()
+        return cart
+
+    async def version(self, username: str):
+        """Version to pass to fill(); take it before reading the cart."""
+        if not settings.CART_CACHE_ENABLED:
+            return None
+        return await self.store.version(username)
+
+    async def fill(self, username: str, cart: CartResponse, version) -> bool:
+        """Cache ``cart`` unless the entry changed since ``version`` was taken."""
+        if not settings.CART_CACHE_ENABLED or version is None:
+            return False
+        return await self.store.fill(username, cart, version)
+
+    async def invalidate(self, username: str):
+        """Drop the cached cart and return its new version."""
+        if not settings.CART_CACHE_ENABLED:
+            return None
+        return await self.store.invalidate(username)
+
+    async def clear(self) -> None:
+        await self.store.clear()
+
+
+def create_cart_store():
+    if settings.REDIS_URL.startswith(("redis://", "rediss://")):
+        import redis.asyncio as redis
+
+        return RedisCartStore(redis.Redis.from_url(settings.REDIS_URL), settings.CART_CACHE_TTL_SECONDS)
+    return MemoryCartStore(settings.CART_CACHE_MAX_ENTRIES, settings.CART_CACHE_TTL_SECONDS)
+
+
+cart_cache = CartCache(create_cart_store())
+verified_tokens = VerifiedTokenCache(settings.TOKEN_CACHE_MAX_ENTRIES, settings.TOKEN_CACHE_TTL_SECONDS)
@@ -2,12 +2,17 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from config.settings import settings
+from .cache import verified_tokens
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 ALGORITHM = "HS256" # Hardcoding or moving to settings if consistent
 
-def get_current_username(token: str = Depends(oauth2_scheme)) -> str:
+async def get_current_username(token: str = Depends(oauth2_scheme)) -> str:
+    payload = verified_tokens.get(token)
+    if payload is not None:
+        return payload["sub"]
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -18,6 +23,7 @@ def get_current_username(token: str = Depends(oauth2_scheme)) -> str:
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
+        verified_tokens.put(token, payload)
     except JWTError:
         raise credentials_exception
     return username
@@ -7,6 +7,7 @@ from .routes import router
 from .health import router as health_router
 from .logging_config import setup_logging, get_logger
 from .metrics import setup_metrics
+from .query_metrics import QueryMetricsMiddleware
 from .rate_limit import get_limiter, setup_rate_limiting
 
 # Setup structured logging
@@ -44,6 +45,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(QueryMetricsMiddleware)
 
 
 @app.middleware("http")
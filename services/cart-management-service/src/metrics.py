@@ -26,7 +26,64 @@ ACTIVE_REQUESTS = Gauge(
 DB_QUERY_COUNT = Counter(
     "db_queries_total",
     "Total database queries",
-    ["operation"]
+    ["operation", "route"]
+)
+
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds",
+    "Database statement execution time in seconds",
+    ["operation", "route"],
+    buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0]
+)
+
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request",
+    "Database statements issued while serving one request",
+    ["route"],
+    buckets=[1, 2, 3, 5, 10, 20, 50, 100]
+)
+
+DB_N_PLUS_ONE_REQUESTS = Counter(
+    "db_n_plus_one_requests_total",
+    "Requests that issued more than DB_N_PLUS_ONE_THRESHOLD queries",
+    ["route"]
+)
+
+AUTH_CACHE_REQUESTS = Counter(
+    "auth_cache_requests_total",
+    "Authentication cache lookups by cache (token, user) and result (hit, miss)",
+    ["cache", "result"]
+)
+
+CART_CACHE_REQUESTS = Counter(
+    "cart_cache_requests_total",
+    "Cart cache lookups by result (hit or miss)",
+    ["result"]
+)
+
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a database connection from the pool",
+    ["engine"],
+    buckets=[0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0]
+)
+
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts_total",
+    "Connection checkouts that gave up after DB_POOL_TIMEOUT",
+    ["engine"]
+)
+
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_connections_checked_out",
+    "Database connections currently in use",
+    ["engine"]
+)
+
+DB_POOL_SATURATION = Gauge(
+    "db_pool_saturation_ratio",
+    "Checked-out connections as a fraction of pool size plus overflow",
+    ["engine"]
 )
 
 
@@ -51,3 +108,12 @@ def setup_metrics(app, service_name: str):
     instrumentator.instrument(app).expose(app, endpoint="/metrics")
     
     return instrumentator
+
+
+def track_pool(pool, engine: str, max_overflow: int):
+    """Export usage of a SQLAlchemy QueuePool, read at scrape time."""
+    capacity = pool.size() + max(max_overflow, 0)
+    DB_POOL_CHECKED_OUT.labels(engine=engine).set_function(pool.checkedout)
+    DB_POOL_SATURATION.labels(engine=engine).set_function(
+        lambda: pool.checkedout() / capacity if capacity else 0.0
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -15,6 +15,8 @@ class Cart(Base):
 
 class CartItem(Base):
     __tablename__ = "cart_items"
+    # One line per product: add_item upserts against this index.
+    __table_args__ = (Index("uq_cart_items_cart_product", "cart_id", "product_id", unique=True),)
 
     id = Column(Integer, primary_key=True, index=True)
     cart_id = Column(Integer, ForeignKey("carts.id"))
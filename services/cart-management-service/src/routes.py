@@ -1,94 +1,54 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from .database import get_db
-from .models import Cart, CartItem
-from .schemas import CartResponse, CartItemCreate, CartItemUpdate
+from .schemas import CartResponse, CartItemCreate, CartItemUpdate, CartBatchRequest
+from .services import AsyncCartService
+from .cache import cart_cache
 from .dependencies import get_current_username
 
 router = APIRouter()
 
+async def _mutate(mutation, db: Session, username: str, *args) -> CartResponse:
+    # Drop the cached cart first, which also turns away fills from GETs
+    # already reading it, then cache the committed cart the mutation returns
+    # for the next GET. If that fill is turned away (a concurrent mutation or
+    # GET filled first) or the mutation failed, whatever was cached meanwhile
+    # may predate this change, so drop it again.
+    version = await cart_cache.invalidate(username)
+    try:
+        cart = await mutation(db, username, *args)
+    except Exception:
+        await cart_cache.invalidate(username)
+        raise
+    if not await cart_cache.fill(username, cart, version):
+        await cart_cache.invalidate(username)
+    return cart
+
 @router.get("/api/cart", response_model=CartResponse)
-def get_cart(username: str = Depends(get_current_username), db: Session = Depends(get_db)):
-    cart = db.query(Cart).filter(Cart.username == username).first()
-    if not cart:
-        # Auto-create cart on access if not exists? Or return 404?
-        # E-commerce usually creates on add, but viewing empty cart is valid.
-        # Let's return a transient empty cart structure or create one.
-        # Creating one is persistent.
-        cart = Cart(username=username)
-        db.add(cart)
-        db.commit()
-        db.refresh(cart)
+async def get_cart(username: str = Depends(get_current_username), db: Session = Depends(get_db)):
+    cart = await cart_cache.get(username)
+    if cart is None:
+        version = await cart_cache.version(username)
+        cart = await AsyncCartService.get_cart(db, username)
+        await cart_cache.fill(username, cart, version)
     return cart
 
 @router.post("/api/cart/items", response_model=CartResponse)
-def add_item(item: CartItemCreate, username: str = Depends(get_current_username), db: Session = Depends(get_db)):
-    cart = db.query(Cart).filter(Cart.username == username).first()
-    if not cart:
-        cart = Cart(username=username)
-        db.add(cart)
-        db.commit()
-        db.refresh(cart)
-    
-    # Check if item exists
-    cart_item = db.query(CartItem).filter(CartItem.cart_id == cart.id, CartItem.product_id == item.product_id).first()
-    if cart_item:
-        cart_item.quantity += item.quantity
-    else:
-        cart_item = CartItem(cart_id=cart.id, product_id=item.product_id, quantity=item.quantity)
-        db.add(cart_item)
-    
-    db.commit()
-    db.refresh(cart)
-    return cart
+async def add_item(item: CartItemCreate, username: str = Depends(get_current_username), db: Session = Depends(get_db)):
+    return await _mutate(AsyncCartService.add_item, db, username, item)
+
+@router.post("/api/cart/items:batch", response_model=CartResponse)
+async def batch_update_items(batch: CartBatchRequest, username: str = Depends(get_current_username), db: Session = Depends(get_db)):
+    return await _mutate(AsyncCartService.apply_batch, db, username, batch.operations)
 
 @router.patch("/api/cart/items/{item_id}", response_model=CartResponse)
-def update_item(item_id: int, update: CartItemUpdate, username: str = Depends(get_current_username), db: Session = Depends(get_db)):
-    cart = db.query(Cart).filter(Cart.username == username).first()
-    if not cart:
-         raise HTTPException(status_code=404, detail="Cart not found")
-    
-    cart_item = db.query(CartItem).filter(CartItem.id == item_id, CartItem.cart_id == cart.id).first()
-    if not cart_item:
-        raise HTTPException(status_code=404, detail="Item not found in cart")
-    
-    if update.quantity <= 0:
-        db.delete(cart_item)
-    else:
-        cart_item.quantity = update.quantity
-    
-    db.commit()
-    db.refresh(cart)
-    return cart
+async def update_item(item_id: int, update: CartItemUpdate, username: str = Depends(get_current_username), db: Session = Depends(get_db)):
+    return await _mutate(AsyncCartService.update_item, db, username, item_id, update)
 
 @router.delete("/api/cart/items/{item_id}", response_model=CartResponse)
-def remove_item(item_id: int, username: str = Depends(get_current_username), db: Session = Depends(get_db)):
-    cart = db.query(Cart).filter(Cart.username == username).first()
-    if not cart:
-         raise HTTPException(status_code=404, detail="Cart not found")
-
-    cart_item = db.query(CartItem).filter(CartItem.id == item_id, CartItem.cart_id == cart.id).first()
-    if not cart_item:
-        raise HTTPException(status_code=404, detail="Item not found in cart")
-
-    db.delete(cart_item)
-    db.commit()
-    db.refresh(cart)
-    return cart
+async def remove_item(item_id: int, username: str = Depends(get_current_username), db: Session = Depends(get_db)):
+    return await _mutate(AsyncCartService.remove_item, db, username, item_id)
 
 @router.delete("/api/cart", response_model=CartResponse) # Reset cart
-def clear_cart(username: str = Depends(get_current_username), db: Session = Depends(get_db)):
-    cart = db.query(Cart).filter(Cart.username == username).first()
-    if cart:
-        # Delete items
-        db.query(CartItem).filter(CartItem.cart_id == cart.id).delete()
-        db.commit()
-        db.refresh(cart)
-    else:
-         # Create empty if not exists to satisfy response model
-         cart = Cart(username=username)
-         db.add(cart)
-         db.commit()
-         db.refresh(cart)
-         
-    return cart
+async def clear_cart(username: str = Depends(get_current_username), db: Session = Depends(get_db)):
+    return await _mutate(AsyncCartService.clear_cart, db, username)
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import Annotated, List, Literal, Optional, Union
 from datetime import datetime
 
 class CartItemBase(BaseModel):
@@ -28,3 +28,25 @@ class CartResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+# POST /api/cart/items:batch applies these in order, in one transaction.
+MAX_BATCH_OPERATIONS = 100
+
+class CartAddOperation(CartItemBase):
+    op: Literal["add"]
+
+class CartUpdateOperation(CartItemUpdate):
+    op: Literal["update"]
+    item_id: int
+
+class CartRemoveOperation(BaseModel):
+    op: Literal["remove"]
+    item_id: int
+
+CartOperation = Annotated[
+    Union[CartAddOperation, CartUpdateOperation, CartRemoveOperation],
+    Field(discriminator="op"),
+]
+
+class CartBatchRequest(BaseModel):
+    operations: List[CartOperation] = Field(..., min_length=1, max_length=MAX_BATCH_OPERATIONS)
@@ -0,0 +1,174 @@
+from datetime import datetime
+from typing import List, Optional
+from fastapi import HTTPException
+from sqlalchemy import delete, literal, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from .models import Cart, CartItem
+from .schemas import (
+    CartResponse, CartItemResponse, CartItemCreate, CartItemUpdate,
+    CartAddOperation, CartUpdateOperation, CartOperation,
+)
+from .database import AsyncService
+
+# Responses are built by read_cart: one Core SELECT joining carts to
+# cart_items, mapped straight into CartResponse. That avoids the lazy load of
+# `cart.items` and ORM hydration, and the result stays valid after an async
+# route gets it back from run_sync.
+
+
+def _insert(db: Session):
+    """Dialect-specific INSERT, which is the one that supports ON CONFLICT."""
+    return postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+
+
+def _upsert_cart(insert, username: str, now: datetime):
+    """INSERT the user's cart, or touch it if it exists, RETURNING its id."""
+    stmt = insert(Cart).values(username=username, created_at=now, updated_at=now)
+    return stmt.on_conflict_do_update(
+        index_elements=[Cart.username], set_={"updated_at": stmt.excluded.updated_at}
+    ).returning(Cart.id)
+
+
+def read_cart(db: Session, username: str) -> Optional[CartResponse]:
+    rows = db.execute(
+        select(
+            Cart.id, Cart.username, Cart.created_at, Cart.updated_at,
+            CartItem.id.label("item_id"), CartItem.product_id, CartItem.quantity,
+        )
+        .outerjoin(CartItem, CartItem.cart_id == Cart.id)
+        .where(Cart.username == username)
+        .order_by(CartItem.id)
+    ).all()
+    if not rows:
+        return None
+    cart = rows[0]
+    items = [
+        CartItemResponse(id=row.item_id, cart_id=cart.id, product_id=row.product_id, quantity=row.quantity)
+        for row in rows if row.item_id is not None
+    ]
+    return CartResponse(
+        id=cart.id, username=cart.username, created_at=cart.created_at, updated_at=cart.updated_at, items=items
+    )
+
+
+def _merge_quantity(stmt):
+    """Turn a cart_items INSERT into an upsert adding to the existing line."""
+    return stmt.on_conflict_do_update(
+        index_elements=[CartItem.cart_id, CartItem.product_id],
+        set_={"quantity": CartItem.quantity + stmt.excluded.quantity},
+    )
+
+
+class CartService:
+    @staticmethod
+    def get_cart(db: Session, username: str) -> CartResponse:
+        cart = read_cart(db, username)
+        if cart is None:
+            # Viewing an empty cart is valid, so create one on first access.
+            db.execute(_upsert_cart(_insert(db), username, datetime.utcnow()))
+            db.commit()
+            cart = read_cart(db, username)
+        return cart
+
+    @staticmethod
+    def add_item(db: Session, username: str, item: CartItemCreate) -> CartResponse:
+        insert = _insert(db)
+        cart = _upsert_cart(insert, username, datetime.utcnow())
+        if db.get_bind().dialect.name == "postgresql":
+            # One round-trip: the cart upsert runs as a data-modifying CTE
+            # feeding the cart_items upsert.
+            cart = cart.cte("cart")
+            line = insert(CartItem).from_select(
+                ["cart_id", "product_id", "quantity"],
+                select(cart.c.id, literal(item.product_id), literal(item.quantity)),
+            )
+        else:
+            # SQLite has no data-modifying CTEs, so this takes two statements.
+            cart_id = db.execute(cart).scalar_one()
+            line = insert(CartItem).values(cart_id=cart_id, product_id=item.product_id, quantity=item.quantity)
+        db.execute(_merge_quantity(line))
+        db.commit()
+        return read_cart(db, username)
+
+    @staticmethod
+    def update_item(db: Session, username: str, item_id: int, update: CartItemUpdate) -> CartResponse:
+        cart = db.query(Cart).filter(Cart.username == username).first()
+        if not cart:
+            raise HTTPException(status_code=404, detail="Cart not found")
+
+        cart_item = db.query(CartItem).filter(CartItem.id == item_id, CartItem.cart_id == cart.id).first()
+        if not cart_item:
+            raise HTTPException(status_code=404, detail="Item not found in cart")
+
+        if update.quantity <= 0:
+            db.delete(cart_item)
+        else:
+            cart_item.quantity = update.quantity
+
+        db.commit()
+        return read_cart(db, username)
+
+    @staticmethod
+    def remove_item(db: Session, username: str, item_id: int) -> CartResponse:
+        cart = db.query(Cart).filter(Cart.username == username).first()
+        if not cart:
+            raise HTTPException(status_code=404, detail="Cart not found")
+
+        cart_item = db.query(CartItem).filter(CartItem.id == item_id, CartItem.cart_id == cart.id).first()
+        if not cart_item:
+            raise HTTPException(status_code=404, detail="Item not found in cart")
+
+        db.delete(cart_item)
+        db.commit()
+        return read_cart(db, username)
+
+    @staticmethod
+    def clear_cart(db: Session, username: str) -> CartResponse:
+        cart_ids = select(Cart.id).where(Cart.username == username)
+        db.query(CartItem).filter(CartItem.cart_id.in_(cart_ids)).delete(synchronize_session=False)
+        db.commit()
+        # Also creates the cart if the user had none, to satisfy the response model.
+        return CartService.get_cart(db, username)
+
+    @staticmethod
+    def apply_batch(db: Session, username: str, operations: List[CartOperation]) -> CartResponse:
+        """Apply add/update/remove operations in order and commit once.
+
+        Any operation naming an item that is not in the cart rolls back the
+        whole batch with a 404.
+        """
+        insert = _insert(db)
+        cart_id = db.execute(_upsert_cart(insert, username, datetime.utcnow())).scalar_one()
+        i = 0
+        while i < len(operations):
+            operation = operations[i]
+            if isinstance(operation, CartAddOperation):
+                # A run of adds becomes one multi-row upsert. Postgres rejects
+                # an upsert touching the same row twice, so sum per product.
+                quantities = {}
+                while i < len(operations) and isinstance(operations[i], CartAddOperation):
+                    add = operations[i]
+                    quantities[add.product_id] = quantities.get(add.product_id, 0) + add.quantity
+                    i += 1
+                db.execute(_merge_quantity(insert(CartItem).values([
+                    {"cart_id": cart_id, "product_id": product_id, "quantity": quantity}
+                    for product_id, quantity in quantities.items()
+                ])))
+                continue
+
+            match = (CartItem.id == operation.item_id, CartItem.cart_id == cart_id)
+            if isinstance(operation, CartUpdateOperation) and operation.quantity > 0:
+                result = db.execute(update(CartItem).where(*match).values(quantity=operation.quantity))
+            else:
+                result = db.execute(delete(CartItem).where(*match))
+            if result.rowcount == 0:
+                db.rollback()
+                raise HTTPException(status_code=404, detail=f"Item {operation.item_id} not found in cart")
+            i += 1
+
+        db.commit()
+        return read_cart(db, username)
+
+
+AsyncCartService = AsyncService(CartService)
@@ -0,0 +1,66 @@
+"""Queries per request for the cart read path, before and after the Core read model.
+
+Run from the service directory:
+
+    DATABASE_URL=sqlite:// python -m tests.benchmark_cart_read
+
+"legacy" is the previous implementation: an ORM query for the cart followed
+by a lazy load of `cart.items` when the response model walks it. Both paths
+run against the same SQLite database with a cart of ITEMS lines.
+"""
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.database import Base
+from src.models import Cart
+from src.schemas import CartItemCreate, CartResponse
+from src.services import CartService
+
+ITEMS = 20
+ROUNDS = 500
+
+
+def legacy_get_cart(db, username):
+    cart = db.query(Cart).filter(Cart.username == username).first()
+    return CartResponse.model_validate(cart)
+
+
+def measure(session_factory, counter, fn):
+    queries = 0
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        db = session_factory()
+        before = counter["n"]
+        fn(db, "bench")
+        queries += counter["n"] - before
+        db.close()
+    elapsed = time.perf_counter() - start
+    return queries / ROUNDS, elapsed / ROUNDS * 1000
+
+
+def main():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    counter = {"n": 0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count(*args):
+        counter["n"] += 1
+
+    session_factory = sessionmaker(bind=engine)
+    db = session_factory()
+    for product_id in range(ITEMS):
+        CartService.add_item(db, "bench", CartItemCreate(product_id=product_id, quantity=1))
+    db.close()
+
+    print(f"GET /api/cart, {ITEMS} items, {ROUNDS} rounds")
+    for name, fn in [("legacy", legacy_get_cart), ("read model", CartService.get_cart)]:
+        queries, ms = measure(session_factory, counter, fn)
+        print(f"  {name:<10}  {queries:.1f} queries/request  {ms:.3f} ms/request")
+
+
+if __name__ == "__main__":
+    main()
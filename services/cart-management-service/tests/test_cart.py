@@ -1,11 +1,16 @@
+import asyncio
 import pytest
 from unittest.mock import MagicMock, patch, PropertyMock
 from fastapi.testclient import TestClient
 from datetime import datetime
+from types import SimpleNamespace
 from src.main import app
 from src.database import get_db
 from src.dependencies import get_current_username
+from src.schemas import CartItemResponse, CartResponse
 from src.models import Cart, CartItem
+from src.cache import CartCache, MemoryCartStore, RedisCartStore, TTLCache, cart_cache
+from src.services import CartService
 
 
 def create_mock_cart(username="testuser", cart_id=1, items=None):
@@ -29,6 +34,24 @@ def create_mock_cart_item(item_id=1, cart_id=1, product_id=101, quantity=1):
     return item
 
 
+def cart_rows(cart):
+    """Rows of the carts/cart_items outer join that read_cart selects."""
+    cart_columns = dict(id=cart.id, username=cart.username, created_at=cart.created_at, updated_at=cart.updated_at)
+    if not cart.items:
+        return [SimpleNamespace(**cart_columns, item_id=None, product_id=None, quantity=None)]
+    return [
+        SimpleNamespace(**cart_columns, item_id=item.id, product_id=item.product_id, quantity=item.quantity)
+        for item in cart.items
+    ]
+
+
+@pytest.fixture(autouse=True)
+def reset_cart_cache():
+    asyncio.run(cart_cache.clear())
+    yield
+    asyncio.run(cart_cache.clear())
+
+
 @pytest.fixture
 def mock_db_session():
     """Returns a mock implementation of the SQLAlchemy Session."""
@@ -60,45 +83,64 @@ def client(mock_db_session):
 
 def test_get_cart_empty_creates_new(client, mock_db_session):
     """Test that accessing cart creates one if it doesn't exist."""
-    # First call returns None (no cart), after add/commit/refresh, return new cart
-    new_cart = create_mock_cart()
-    
-    mock_db_session.query.return_value.filter.return_value.first.return_value = None
-    mock_db_session.refresh.side_effect = lambda cart: setattr(cart, 'items', [])
-    
-    # After commit, the cart should be returned - configure add to capture and refresh to set
-    def mock_refresh(obj):
-        obj.id = 1
-        obj.items = []
-        obj.created_at = datetime.utcnow()
-        obj.updated_at = datetime.utcnow()
-    
-    mock_db_session.refresh.side_effect = mock_refresh
-    
+    # No cart rows on the first read; the upsert creates it and the re-read finds it.
+    mock_db_session.execute.return_value.all.side_effect = [[], cart_rows(create_mock_cart())]
+
     response = client.get("/api/cart")
-    
+
     assert response.status_code == 200
-    mock_db_session.add.assert_called()
+    assert response.json()["items"] == []
+    assert mock_db_session.execute.call_count == 3
     mock_db_session.commit.assert_called()
 
 
-def test_add_item_to_new_cart(client, mock_db_session):
-    """Test adding item creates cart if needed."""
-    mock_db_session.query.return_value.filter.return_value.first.return_value = None
-    
-    def mock_refresh(obj):
-        obj.id = 1
-        obj.items = []
-        obj.created_at = datetime.utcnow()
-        obj.updated_at = datetime.utcnow()
-    
-    mock_db_session.refresh.side_effect = mock_refresh
-    
+def test_get_cart_single_query(client, mock_db_session):
+    """An existing cart and its items come back from one SELECT."""
+    items = [create_mock_cart_item(item_id=1, product_id=101), create_mock_cart_item(item_id=2, product_id=102)]
+    mock_db_session.execute.return_value.all.return_value = cart_rows(create_mock_cart(items=items))
+
+    response = client.get("/api/cart")
+
+    assert response.status_code == 200
+    assert [i["product_id"] for i in response.json()["items"]] == [101, 102]
+    mock_db_session.execute.assert_called_once()
+    mock_db_session.query.assert_not_called()
+
+
+def test_add_item_upserts_cart_and_line(client, mock_db_session):
+    """Adding an item upserts cart and line, then reads the cart once."""
+    mock_cart = create_mock_cart(items=[create_mock_cart_item(product_id=101, quantity=2)])
+    mock_db_session.execute.return_value.all.return_value = cart_rows(mock_cart)
+
     payload = {"product_id": 101, "quantity": 2}
     response = client.post("/api/cart/items", json=payload)
-    
+
     assert response.status_code == 200
-    assert mock_db_session.add.call_count >= 1
+    assert response.json()["items"][0]["quantity"] == 2
+    assert mock_db_session.execute.call_count == 3
+    mock_db_session.add.assert_not_called()
+    mock_db_session.commit.assert_called_once()
+
+
+def test_add_item_merges_quantity_sqlite():
+    """The upsert adds to an existing line instead of creating a duplicate."""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from src.database import Base
+    from src.schemas import CartItemCreate
+    from src.services import CartService
+
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+
+    CartService.add_item(db, "testuser", CartItemCreate(product_id=101, quantity=2))
+    CartService.add_item(db, "testuser", CartItemCreate(product_id=102, quantity=1))
+    cart = CartService.add_item(db, "testuser", CartItemCreate(product_id=101, quantity=3))
+
+    assert db.query(Cart).count() == 1
+    assert {(i.product_id, i.quantity) for i in cart.items} == {(101, 5), (102, 1)}
 
 
 def test_update_item_quantity(client, mock_db_session):
@@ -109,11 +151,7 @@ def test_update_item_quantity(client, mock_db_session):
     
     # First filter call returns cart, second returns item
     mock_db_session.query.return_value.filter.return_value.first.side_effect = [mock_cart, mock_item]
-    
-    def mock_refresh(obj):
-        pass  # Keep existing attributes
-    
-    mock_db_session.refresh.side_effect = mock_refresh
+    mock_db_session.execute.return_value.all.return_value = cart_rows(mock_cart)
     
     response = client.patch("/api/cart/items/5", json={"quantity": 5})
     
@@ -128,14 +166,186 @@ def test_remove_item(client, mock_db_session):
     mock_cart = create_mock_cart(items=[mock_item])
     
     mock_db_session.query.return_value.filter.return_value.first.side_effect = [mock_cart, mock_item]
-    
-    def mock_refresh(obj):
-        obj.items = []  # Item removed
-    
-    mock_db_session.refresh.side_effect = mock_refresh
+    mock_db_session.execute.return_value.all.return_value = cart_rows(create_mock_cart())  # Item removed
     
     response = client.delete("/api/cart/items/5")
     
     assert response.status_code == 200
     mock_db_session.delete.assert_called_with(mock_item)
     mock_db_session.commit.assert_called()
+
+
+def test_batch_applies_operations_in_one_commit(client, mock_db_session):
+    """A batch runs every operation, then commits once and reads the cart."""
+    mock_db_session.execute.return_value.scalar_one.return_value = 1
+    mock_db_session.execute.return_value.rowcount = 1
+    mock_db_session.execute.return_value.all.return_value = cart_rows(
+        create_mock_cart(items=[create_mock_cart_item(item_id=5, product_id=101, quantity=3)])
+    )
+
+    response = client.post("/api/cart/items:batch", json={"operations": [
+        {"op": "add", "product_id": 101, "quantity": 1},
+        {"op": "add", "product_id": 101, "quantity": 2},
+        {"op": "update", "item_id": 5, "quantity": 3},
+        {"op": "remove", "item_id": 6},
+    ]})
+
+    assert response.status_code == 200
+    # cart upsert + one merged add + update + remove + read
+    assert mock_db_session.execute.call_count == 5
+    mock_db_session.commit.assert_called_once()
+
+
+def test_batch_unknown_item_rolls_back(client, mock_db_session):
+    mock_db_session.execute.return_value.rowcount = 0
+
+    response = client.post("/api/cart/items:batch", json={"operations": [
+        {"op": "add", "product_id": 101, "quantity": 1},
+        {"op": "remove", "item_id": 99},
+    ]})
+
+    assert response.status_code == 404
+    mock_db_session.rollback.assert_called_once()
+    mock_db_session.commit.assert_not_called()
+
+
+def test_get_cart_served_from_cache(client, mock_db_session):
+    """Repeat GETs hit the cache; a mutation refreshes the cached cart."""
+    mock_db_session.execute.return_value.all.return_value = cart_rows(create_mock_cart())
+    assert client.get("/api/cart").json()["items"] == []
+    assert client.get("/api/cart").json()["items"] == []
+    mock_db_session.execute.assert_called_once()
+
+    mock_db_session.execute.return_value.all.return_value = cart_rows(
+        create_mock_cart(items=[create_mock_cart_item(product_id=101, quantity=2)])
+    )
+    client.post("/api/cart/items", json={"product_id": 101, "quantity": 2})
+    calls = mock_db_session.execute.call_count
+    assert client.get("/api/cart").json()["items"][0]["product_id"] == 101
+    assert mock_db_session.execute.call_count == calls
+
+
+def test_cart_cache_turns_away_fills_that_raced_a_mutation():
+    cache = CartCache(MemoryCartStore(maxsize=10, ttl=60))
+    old = CartResponse(id=1, username="testuser", created_at=datetime.utcnow(), updated_at=datetime.utcnow())
+    new = old.model_copy(update={"items": [CartItemResponse(id=1, cart_id=1, product_id=101, quantity=2)]})
+
+    async def scenario():
+        # A GET reads the cart, then a mutation commits and caches its result
+        # before the GET fills the cache with what it read.
+        reader = await cache.version("testuser")
+        writer = await cache.invalidate("testuser")
+        assert await cache.fill("testuser", new, writer)
+        assert not await cache.fill("testuser", old, reader)
+        assert await cache.get("testuser") == new
+
+        # Of two concurrent mutations only the first to fill wins; the
+        # other's fill is turned away.
+        first, second = await cache.invalidate("testuser"), await cache.invalidate("testuser")
+        assert await cache.fill("testuser", old, second)
+        assert not await cache.fill("testuser", new, first)
+
+    asyncio.run(scenario())
+
+def test_mutation_drops_cart_cached_while_it_ran(client, mock_db_session):
+    stale = CartResponse(id=1, username="testuser", created_at=datetime.utcnow(), updated_at=datetime.utcnow())
+    mock_db_session.execute.return_value.all.return_value = cart_rows(
+        create_mock_cart(items=[create_mock_cart_item(product_id=101, quantity=2)])
+    )
+
+    async def add_item_racing_a_get(db, username, item):
+        # A GET that started during the mutation fills the cache first.
+        await cart_cache.fill(username, stale, await cart_cache.version(username))
+        return CartService.add_item(db, username, item)
+
+    with patch("src.routes.AsyncCartService.add_item", add_item_racing_a_get):
+        client.post("/api/cart/items", json={"product_id": 101, "quantity": 2})
+
+    assert asyncio.run(cart_cache.get("testuser")) is None
+
+def test_ttl_cache_expiry_and_lru():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)  # evicts "b", the least recently used
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+    cache.set("a", 1, ttl=0)
+    assert cache.get("a") is None
+
+
+def test_redis_cart_store_round_trip():
+    class FakeRedis:
+        def __init__(self):
+            self.data = {}
+
+        async def get(self, key):
+            return self.data.get(key)
+
+        async def set(self, key, value, px=None):
+            self.data[key] = value
+
+        async def delete(self, key):
+            self.data.pop(key, None)
+
+    redis = FakeRedis()
+    store = RedisCartStore(redis, ttl=10)
+    cart = CartResponse(id=1, username="testuser", created_at=datetime.utcnow(), updated_at=datetime.utcnow())
+
+    async def scenario():
+        await store.set("testuser", cart)
+        assert "cart:testuser" in redis.data
+        assert await store.get("testuser") == cart
+        await store.delete("testuser")
+        assert await store.get("testuser") is None
+
+    asyncio.run(scenario())
+
+
+def test_get_current_username_caches_verified_token():
+    from jose import jwt
+    from src.cache import verified_tokens
+    from src.dependencies import ALGORITHM, settings
+
+    verified_tokens.clear()
+    token = jwt.encode({"sub": "testuser"}, settings.SECRET_KEY, algorithm=ALGORITHM)
+    assert asyncio.run(get_current_username(token)) == "testuser"
+    with patch("src.dependencies.jwt.decode") as decode:
+        assert asyncio.run(get_current_username(token)) == "testuser"
+    decode.assert_not_called()
+
+
+def test_request_queries_and_pool_checkouts_are_recorded(tmp_path):
+    from prometheus_client import REGISTRY
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from src.database import Base, TimedQueuePool, pool_options, settings, track_engine_pool
+
+    # The pool the service would build for Postgres, over a SQLite file.
+    engine = create_engine(
+        f"sqlite:///{tmp_path}/queries.db", **pool_options("postgresql+psycopg://u:p@db/app", TimedQueuePool))
+    assert isinstance(engine.pool, TimedQueuePool) and engine.pool.size() == settings.DB_POOL_SIZE
+    Base.metadata.create_all(engine)
+    track_engine_pool(engine, "sync")
+    sessions = sessionmaker(bind=engine)
+
+    def sqlite_db():
+        db = sessions()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = sqlite_db
+    app.dependency_overrides[get_current_username] = lambda: "testuser"
+    route = "/api/cart"
+    selects = REGISTRY.get_sample_value("db_queries_total", {"operation": "select", "route": route}) or 0
+    requests = REGISTRY.get_sample_value("db_queries_per_request_count", {"route": route}) or 0
+    checkouts = REGISTRY.get_sample_value("db_pool_checkout_wait_seconds_count", {"engine": "sync"}) or 0
+    try:
+        assert TestClient(app).get("/api/cart").status_code == 200
+    finally:
+        app.dependency_overrides = {}
+    assert REGISTRY.get_sample_value("db_queries_total", {"operation": "select", "route": route}) > selects
+    assert REGISTRY.get_sample_value("db_queries_per_request_count", {"route": route}) == requests + 1
+    assert REGISTRY.get_sample_value("db_pool_checkout_wait_seconds_count", {"engine": "sync"}) > checkouts
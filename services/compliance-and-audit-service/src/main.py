@@ -1,4 +1,4 @@
-from fastapi import FastAPI, Depends, HTTPException, Query, status
+from fastapi import FastAPI, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from .database import get_db, engine, Base
@@ -8,40 +8,47 @@ from .schemas import (
     ReportCreate, ReportResponse,
     RiskAssessmentCreate, RiskAssessmentResponse
 )
-from .services import ComplianceService
+from .services import ComplianceService, AsyncComplianceService
+from .pagination import PageParams, set_next_cursor
+from .query_metrics import QueryMetricsMiddleware
 
 # Create tables
 # Base.metadata.create_all(bind=engine)
 
 app = FastAPI()
+app.add_middleware(QueryMetricsMiddleware)
 
 @app.post("/api/audit", response_model=AuditLogResponse, status_code=status.HTTP_201_CREATED)
-def create_audit_log(log: AuditLogCreate, db: Session = Depends(get_db)):
-    return ComplianceService.create_audit_log(db, log)
+async def create_audit_log(log: AuditLogCreate, db: Session = Depends(get_db)):
+    return await AsyncComplianceService.create_audit_log(db, log)
 
 @app.get("/api/audit", response_model=List[AuditLogResponse])
-def get_audit_logs(
+async def get_audit_logs(
+    response: Response,
     user_id: Optional[int] = Query(None),
     action: Optional[str] = Query(None),
+    page: PageParams = Depends(),
     db: Session = Depends(get_db)
 ):
-    return ComplianceService.get_audit_logs(db, user_id, action)
+    logs, next_cursor = await AsyncComplianceService.get_audit_logs(db, page, user_id, action)
+    set_next_cursor(response, next_cursor)
+    return logs
 
 @app.get("/api/logs/{log_id}", response_model=AuditLogResponse)
-def get_audit_log_details(log_id: int, db: Session = Depends(get_db)):
-    log = ComplianceService.get_audit_log_details(db, log_id)
+async def get_audit_log_details(log_id: int, db: Session = Depends(get_db)):
+    log = await AsyncComplianceService.get_audit_log_details(db, log_id)
     if not log:
         raise HTTPException(status_code=404, detail="Audit log not found")
     return log
 
 # Compliance Checks
 @app.post("/api/compliance/checks", response_model=CheckResponse, status_code=status.HTTP_201_CREATED)
-def perform_compliance_check(check: CheckCreate, db: Session = Depends(get_db)):
-    return ComplianceService.perform_compliance_check(db, check)
+async def perform_compliance_check(check: CheckCreate, db: Session = Depends(get_db)):
+    return await AsyncComplianceService.perform_compliance_check(db, check)
 
 @app.get("/api/compliance/results/{check_id}", response_model=CheckResponse)
-def get_check_result(check_id: int, db: Session = Depends(get_db)):
-    check = ComplianceService.get_check_result(db, check_id)
+async def get_check_result(check_id: int, db: Session = Depends(get_db)):
+    check = await AsyncComplianceService.get_check_result(db, check_id)
     if not check:
         raise HTTPException(status_code=404, detail="Compliance check not found")
     return check
@@ -57,12 +64,12 @@ def get_compliance_report(report_id: str):
 
 # Risk Assessment
 @app.post("/api/risk-assessment", response_model=RiskAssessmentResponse, status_code=status.HTTP_201_CREATED)
-def start_risk_assessment(assessment: RiskAssessmentCreate, db: Session = Depends(get_db)):
-    return ComplianceService.start_risk_assessment(db, assessment)
+async def start_risk_assessment(assessment: RiskAssessmentCreate, db: Session = Depends(get_db)):
+    return await AsyncComplianceService.start_risk_assessment(db, assessment)
 
 @app.get("/api/risk-assessment/results/{assessment_id}", response_model=RiskAssessmentResponse)
-def get_risk_assessment(assessment_id: int, db: Session = Depends(get_db)):
-    assessment = ComplianceService.get_risk_assessment(db, assessment_id)
+async def get_risk_assessment(assessment_id: int, db: Session = Depends(get_db)):
+    assessment = await AsyncComplianceService.get_risk_assessment(db, assessment_id)
     if not assessment:
         raise HTTPException(status_code=404, detail="Assessment not found")
     return assessment
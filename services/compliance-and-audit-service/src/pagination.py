@@ -0,0 +1,59 @@
+"""Keyset (cursor) pagination for list endpoints.
+
+Pages are fetched with ``WHERE key > :after ORDER BY key LIMIT :n`` on an
+indexed, unique column, so the cost of a page does not depend on how deep
+into the table it is. The next-page cursor is returned in the
+``X-Next-Cursor`` response header and is absent on the last page.
+"""
+import base64
+import binascii
+import json
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException, Query, Response, status
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class PageParams:
+    """FastAPI dependency holding the ``limit`` and ``after`` query parameters."""
+
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        after: Optional[str] = Query(None, description="Opaque cursor from the previous page's X-Next-Cursor header"),
+    ):
+        self.limit = limit
+        self.after = after
+
+
+def encode_cursor(value: Any) -> str:
+    return base64.urlsafe_b64encode(json.dumps([value]).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Any:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        (value,) = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return value
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor")
+
+
+def paginate(query, key_column, page: PageParams) -> Tuple[List[Any], Optional[str]]:
+    """Return one page of ``query`` ordered by ``key_column`` and the cursor for the next."""
+    if page.after is not None:
+        query = query.filter(key_column > decode_cursor(page.after))
+    # Fetch one extra row to learn whether another page exists.
+    rows = query.order_by(key_column).limit(page.limit + 1).all()
+    if len(rows) <= page.limit:
+        return rows, None
+    rows = rows[:page.limit]
+    return rows, encode_cursor(getattr(rows[-1], key_column.key))
+
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]) -> None:
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
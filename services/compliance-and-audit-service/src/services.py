@@ -1,9 +1,11 @@
 from sqlalchemy.orm import Session
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
 import json
 from .models import AuditLog, ComplianceCheck, RiskAssessment
+from .pagination import PageParams, paginate
 from .schemas import AuditLogCreate, CheckCreate, ReportCreate, ReportResponse, RiskAssessmentCreate
+from .database import AsyncService
 
 class ComplianceService:
     @staticmethod
@@ -20,13 +22,13 @@ class ComplianceService:
         return db_log
 
     @staticmethod
-    def get_audit_logs(db: Session, user_id: Optional[int] = None, action: Optional[str] = None) -> List[AuditLog]:
+    def get_audit_logs(db: Session, page: PageParams, user_id: Optional[int] = None, action: Optional[str] = None) -> Tuple[List[AuditLog], Optional[str]]:
         query = db.query(AuditLog)
         if user_id:
             query = query.filter(AuditLog.user_id == user_id)
         if action:
             query = query.filter(AuditLog.action == action)
-        return query.all()
+        return paginate(query, AuditLog.id, page)
 
     @staticmethod
     def get_audit_log_details(db: Session, log_id: int) -> Optional[AuditLog]:
@@ -87,3 +89,5 @@ class ComplianceService:
     @staticmethod
     def get_risk_assessment(db: Session, assessment_id: int) -> Optional[RiskAssessment]:
         return db.query(RiskAssessment).filter(RiskAssessment.id == assessment_id).first()
+
+AsyncComplianceService = AsyncService(ComplianceService)
@@ -62,7 +62,7 @@ def test_get_audit_logs(client, mock_db_session):
         id=1, user_id=1, action="login", resource="auth",
         details=json.dumps({"ip": "1.2.3.4"}), timestamp=datetime.utcnow()
     )
-    mock_db_session.query.return_value.filter.return_value.all.return_value = [mock_log]
+    mock_db_session.query.return_value.filter.return_value.order_by.return_value.limit.return_value.all.return_value = [mock_log]
     
     response = client.get("/api/audit?user_id=1")
     
@@ -70,6 +70,27 @@ def test_get_audit_logs(client, mock_db_session):
     assert len(response.json()) == 1
     assert response.json()[0]["details"] == {"ip": "1.2.3.4"}
 
+def test_get_audit_logs_next_cursor(client, mock_db_session):
+    logs = [AuditLog(id=i, user_id=1, action="login", resource="auth", details=None, timestamp=datetime.utcnow())
+            for i in (1, 2, 3)]
+    mock_query = mock_db_session.query.return_value
+    mock_query.order_by.return_value.limit.return_value.all.return_value = logs
+
+    response = client.get("/api/audit?limit=2")
+
+    assert [log["id"] for log in response.json()] == [1, 2]
+    cursor = response.headers["x-next-cursor"]
+
+    mock_query.filter.return_value.order_by.return_value.limit.return_value.all.return_value = logs[2:]
+    response = client.get(f"/api/audit?limit=2&after={cursor}")
+
+    assert [log["id"] for log in response.json()] == [3]
+    assert "x-next-cursor" not in response.headers
+    assert str(mock_query.filter.call_args[0][0].right.value) == "2"
+
+def test_get_audit_logs_rejects_large_pages(client):
+    assert client.get("/api/audit?limit=201").status_code == 422
+
 def test_perform_compliance_check(client, mock_db_session):
     payload = {"check_type": "gdpr", "details": {"scope": "all"}}
     response = client.post("/api/compliance/checks", json=payload)
@@ -97,3 +118,38 @@ def test_get_risk_assessment_not_found(client, mock_db_session):
     mock_db_session.query.return_value.filter.return_value.first.return_value = None
     response = client.get("/api/risk-assessment/results/999")
     assert response.status_code == 404
+
+
+def test_request_queries_and_pool_checkouts_are_recorded(tmp_path):
+    from prometheus_client import REGISTRY
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from src.database import Base, TimedQueuePool, pool_options, settings, track_engine_pool
+
+    # The pool the service would build for Postgres, over a SQLite file.
+    engine = create_engine(
+        f"sqlite:///{tmp_path}/queries.db", **pool_options("postgresql+psycopg://u:p@db/app", TimedQueuePool))
+    assert isinstance(engine.pool, TimedQueuePool) and engine.pool.size() == settings.DB_POOL_SIZE
+    Base.metadata.create_all(engine)
+    track_engine_pool(engine, "sync")
+    sessions = sessionmaker(bind=engine)
+
+    def sqlite_db():
+        db = sessions()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = sqlite_db
+    route = "/api/audit"
+    selects = REGISTRY.get_sample_value("db_queries_total", {"operation": "select", "route": route}) or 0
+    requests = REGISTRY.get_sample_value("db_queries_per_request_count", {"route": route}) or 0
+    checkouts = REGISTRY.get_sample_value("db_pool_checkout_wait_seconds_count", {"engine": "sync"}) or 0
+    try:
+        assert TestClient(app).get("/api/audit").status_code == 200
+    finally:
+        app.dependency_overrides = {}
+    assert REGISTRY.get_sample_value("db_queries_total", {"operation": "select", "route": route}) > selects
+    assert REGISTRY.get_sample_value("db_queries_per_request_count", {"route": route}) == requests + 1
+    assert REGISTRY.get_sample_value("db_pool_checkout_wait_seconds_count", {"engine": "sync"}) > checkouts
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, Depends, HTTPException, Query, status
+from fastapi import FastAPI, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from .database import get_db, engine, Base
@@ -8,73 +8,80 @@ from .schemas import (
     ArticleCreate, ArticleResponse,
     ChatRequest, EmailSupportRequest, SocialMediaPostRequest
 )
-from .services import FeedbackService
+from .services import FeedbackService, AsyncFeedbackService
+from .pagination import PageParams, set_next_cursor
+from .query_metrics import QueryMetricsMiddleware
 
 # Create tables
 # Base.metadata.create_all(bind=engine)
 
 app = FastAPI()
+app.add_middleware(QueryMetricsMiddleware)
 
 # Support Tickets
 @app.post("/api/support/tickets", response_model=TicketResponse, status_code=status.HTTP_201_CREATED)
-def create_support_ticket(ticket: TicketCreate, db: Session = Depends(get_db)):
-    return FeedbackService.create_ticket(db, ticket)
+async def create_support_ticket(ticket: TicketCreate, db: Session = Depends(get_db)):
+    return await AsyncFeedbackService.create_ticket(db, ticket)
 
 @app.get("/api/support/tickets", response_model=List[TicketResponse])
-def get_support_tickets(
+async def get_support_tickets(
+    response: Response,
     status: Optional[str] = Query(None),
     user_id: Optional[int] = Query(None),
+    page: PageParams = Depends(),
     db: Session = Depends(get_db)
 ):
-    return FeedbackService.get_tickets(db, status, user_id)
+    tickets, next_cursor = await AsyncFeedbackService.get_tickets(db, page, status, user_id)
+    set_next_cursor(response, next_cursor)
+    return tickets
 
 @app.get("/api/support/tickets/{ticket_id}", response_model=TicketResponse)
-def get_support_ticket(ticket_id: int, db: Session = Depends(get_db)):
-    ticket = FeedbackService.get_ticket(db, ticket_id)
+async def get_support_ticket(ticket_id: int, db: Session = Depends(get_db)):
+    ticket = await AsyncFeedbackService.get_ticket(db, ticket_id)
     if not ticket:
         raise HTTPException(status_code=404, detail="Ticket not found")
     return ticket
 
 @app.patch("/api/support/tickets/{ticket_id}", response_model=TicketResponse)
-def update_support_ticket(ticket_id: int, update: TicketUpdate, db: Session = Depends(get_db)):
-    ticket = FeedbackService.get_ticket(db, ticket_id)
+async def update_support_ticket(ticket_id: int, update: TicketUpdate, db: Session = Depends(get_db)):
+    ticket = await AsyncFeedbackService.get_ticket(db, ticket_id)
     if not ticket:
         raise HTTPException(status_code=404, detail="Ticket not found")
-    return FeedbackService.update_ticket(db, ticket, update)
+    return await AsyncFeedbackService.update_ticket(db, ticket, update)
 
 @app.delete("/api/support/tickets/{ticket_id}")
-def close_support_ticket(ticket_id: int, db: Session = Depends(get_db)):
-    ticket = FeedbackService.get_ticket(db, ticket_id)
+async def close_support_ticket(ticket_id: int, db: Session = Depends(get_db)):
+    ticket = await AsyncFeedbackService.get_ticket(db, ticket_id)
     if not ticket:
         raise HTTPException(status_code=404, detail="Ticket not found")
-    FeedbackService.close_ticket(db, ticket)
+    await AsyncFeedbackService.close_ticket(db, ticket)
     return {"message": "Ticket closed successfully"}
 
 # Feedback
 @app.post("/api/feedback", response_model=TicketResponse, status_code=status.HTTP_201_CREATED)
-def submit_feedback(ticket: TicketCreate, db: Session = Depends(get_db)):
-    return FeedbackService.submit_feedback(db, ticket)
+async def submit_feedback(ticket: TicketCreate, db: Session = Depends(get_db)):
+    return await AsyncFeedbackService.submit_feedback(db, ticket)
 
 @app.get("/api/feedback/stats")
-def get_feedback_stats(db: Session = Depends(get_db)):
-    return FeedbackService.get_feedback_stats(db)
+async def get_feedback_stats(db: Session = Depends(get_db)):
+    return await AsyncFeedbackService.get_feedback_stats(db)
 
 # Knowledge Base
 @app.get("/api/knowledge-base/topics", response_model=List[TopicResponse])
-def list_topics(db: Session = Depends(get_db)):
-    return FeedbackService.list_topics(db)
+async def list_topics(db: Session = Depends(get_db)):
+    return await AsyncFeedbackService.list_topics(db)
 
 @app.post("/api/knowledge-base/topics", response_model=TopicResponse)
-def create_topic(topic: TopicCreate, db: Session = Depends(get_db)):
-    return FeedbackService.create_topic(db, topic)
+async def create_topic(topic: TopicCreate, db: Session = Depends(get_db)):
+    return await AsyncFeedbackService.create_topic(db, topic)
 
 @app.get("/api/knowledge-base/articles/{topic_id}", response_model=List[ArticleResponse])
-def list_articles(topic_id: int, db: Session = Depends(get_db)):
-    return FeedbackService.list_articles(db, topic_id)
+async def list_articles(topic_id: int, db: Session = Depends(get_db)):
+    return await AsyncFeedbackService.list_articles(db, topic_id)
 
 @app.post("/api/knowledge-base/articles", response_model=ArticleResponse)
-def create_article(article: ArticleCreate, db: Session = Depends(get_db)):
-    return FeedbackService.create_article(db, article)
+async def create_article(article: ArticleCreate, db: Session = Depends(get_db)):
+    return await AsyncFeedbackService.create_article(db, article)
 
 # Multi-channel Support Stub
 @app.post("/api/support/chat")
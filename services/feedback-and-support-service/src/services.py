@@ -1,8 +1,10 @@
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from datetime import datetime
 from .models import FeedbackTicket, Topic, Article
+from .pagination import PageParams, paginate
 from .schemas import TicketCreate, TicketUpdate, TopicCreate, ArticleCreate, ChatRequest, EmailSupportRequest, SocialMediaPostRequest
+from .database import AsyncService
 
 class FeedbackService:
     @staticmethod
@@ -19,13 +21,13 @@ class FeedbackService:
         return db_ticket
 
     @staticmethod
-    def get_tickets(db: Session, status: Optional[str] = None, user_id: Optional[int] = None) -> List[FeedbackTicket]:
+    def get_tickets(db: Session, page: PageParams, status: Optional[str] = None, user_id: Optional[int] = None) -> Tuple[List[FeedbackTicket], Optional[str]]:
         query = db.query(FeedbackTicket)
         if status:
             query = query.filter(FeedbackTicket.status == status)
         if user_id:
             query = query.filter(FeedbackTicket.user_id == user_id)
-        return query.all()
+        return paginate(query, FeedbackTicket.id, page)
 
     @staticmethod
     def get_ticket(db: Session, ticket_id: int) -> Optional[FeedbackTicket]:
@@ -98,3 +100,5 @@ class FeedbackService:
     @staticmethod
     def post_social_media(request: SocialMediaPostRequest) -> dict:
         return {"message": f"Posted to {request.platform}"}
+
+AsyncFeedbackService = AsyncService(FeedbackService)
@@ -54,13 +54,34 @@ def test_create_support_ticket(client, mock_db_session):
 
 def test_get_support_tickets_filter(client, mock_db_session):
     mock_ticket = FeedbackTicket(id=1, user_id=1, subject="Help", description="Login", status="open", timestamp=datetime.utcnow())
-    mock_db_session.query.return_value.filter.return_value.filter.return_value.all.return_value = [mock_ticket]
+    mock_db_session.query.return_value.filter.return_value.filter.return_value.order_by.return_value.limit.return_value.all.return_value = [mock_ticket]
     
     response = client.get("/api/support/tickets?status=open&user_id=1")
     
     assert response.status_code == 200
     assert len(response.json()) == 1
 
+def test_get_support_tickets_next_cursor(client, mock_db_session):
+    tickets = [FeedbackTicket(id=i, user_id=1, subject="Help", description="Login", status="open", timestamp=datetime.utcnow())
+               for i in (1, 2, 3)]
+    mock_query = mock_db_session.query.return_value
+    mock_query.order_by.return_value.limit.return_value.all.return_value = tickets
+
+    response = client.get("/api/support/tickets?limit=2")
+
+    assert [t["id"] for t in response.json()] == [1, 2]
+    cursor = response.headers["x-next-cursor"]
+
+    mock_query.filter.return_value.order_by.return_value.limit.return_value.all.return_value = tickets[2:]
+    response = client.get(f"/api/support/tickets?limit=2&after={cursor}")
+
+    assert [t["id"] for t in response.json()] == [3]
+    assert "x-next-cursor" not in response.headers
+    assert str(mock_query.filter.call_args[0][0].right.value) == "2"
+
+def test_get_support_tickets_rejects_large_pages(client):
+    assert client.get("/api/support/tickets?limit=201").status_code == 422
+
 def test_close_support_ticket(client, mock_db_session):
     mock_ticket = FeedbackTicket(id=1, status="open")
     mock_db_session.query.return_value.filter.return_value.first.return_value = mock_ticket
@@ -103,3 +124,38 @@ def test_support_stubs(client):
     response = client.post("/api/support/chat", json={"user_id": 1, "message": "Hi"})
     assert response.status_code == 200
     assert "session_id" in response.json()
+
+
+def test_request_queries_and_pool_checkouts_are_recorded(tmp_path):
+    from prometheus_client import REGISTRY
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from src.database import Base, TimedQueuePool, pool_options, settings, track_engine_pool
+
+    # The pool the service would build for Postgres, over a SQLite file.
+    engine = create_engine(
+        f"sqlite:///{tmp_path}/queries.db", **pool_options("postgresql+psycopg://u:p@db/app", TimedQueuePool))
+    assert isinstance(engine.pool, TimedQueuePool) and engine.pool.size() == settings.DB_POOL_SIZE
+    Base.metadata.create_all(engine)
+    track_engine_pool(engine, "sync")
+    sessions = sessionmaker(bind=engine)
+
+    def sqlite_db():
+        db = sessions()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = sqlite_db
+    route = "/api/support/tickets"
+    selects = REGISTRY.get_sample_value("db_queries_total", {"operation": "select", "route": route}) or 0
+    requests = REGISTRY.get_sample_value("db_queries_per_request_count", {"route": route}) or 0
+    checkouts = REGISTRY.get_sample_value("db_pool_checkout_wait_seconds_count", {"engine": "sync"}) or 0
+    try:
+        assert TestClient(app).get("/api/support/tickets").status_code == 200
+    finally:
+        app.dependency_overrides = {}
+    assert REGISTRY.get_sample_value("db_queries_total", {"operation": "select", "route": route}) > selects
+    assert REGISTRY.get_sample_value("db_queries_per_request_count", {"route": route}) == requests + 1
+    assert REGISTRY.get_sample_value("db_pool_checkout_wait_seconds_count", {"engine": "sync"}) > checkouts
@@ -7,5 +7,16 @@ load_dotenv()
 class Settings(BaseSettings):
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./logistics.db")
     DEBUG: bool = False
+    ASYNC_DB_ENABLED: bool = False
+    # Connection pool sizing, per process. Keep replicas * (size + overflow)
+    # below Postgres max_connections, or set DB_PGBOUNCER behind PgBouncer.
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_PGBOUNCER: bool = False
+    # Requests issuing more queries than this are logged as possible N+1 loops.
+    DB_N_PLUS_ONE_THRESHOLD: int = 10
 
 settings = Settings()
\ No newline at end of file
@@ -7,6 +7,7 @@ from .schemas import (
     ShippingCreate, ShippingUpdate,
     LocationUpdate, TrackingResponse
 )
+from .database import AsyncService
 
 class LogisticsService:
     @staticmethod
@@ -92,3 +93,5 @@ class LogisticsService:
             carrier=shipping.carrier if shipping else None,
             tracking_number=shipping.tracking_number if shipping else None
         )
+
+AsyncLogisticsService = AsyncService(LogisticsService)
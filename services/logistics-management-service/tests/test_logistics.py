@@ -105,3 +105,38 @@ def test_update_location_coords(client, mock_db_session):
     
     assert response.status_code == 200
     assert mock_delivery.location == "12.34,56.78"
+
+
+def test_request_queries_and_pool_checkouts_are_recorded(tmp_path):
+    from prometheus_client import REGISTRY
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from src.database import Base, TimedQueuePool, pool_options, settings, track_engine_pool
+
+    # The pool the service would build for Postgres, over a SQLite file.
+    engine = create_engine(
+        f"sqlite:///{tmp_path}/queries.db", **pool_options("postgresql+psycopg://u:p@db/app", TimedQueuePool))
+    assert isinstance(engine.pool, TimedQueuePool) and engine.pool.size() == settings.DB_POOL_SIZE
+    Base.metadata.create_all(engine)
+    track_engine_pool(engine, "sync")
+    sessions = sessionmaker(bind=engine)
+
+    def sqlite_db():
+        db = sessions()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = sqlite_db
+    route = "/api/deliveries/{delivery_id}"
+    selects = REGISTRY.get_sample_value("db_queries_total", {"operation": "select", "route": route}) or 0
+    requests = REGISTRY.get_sample_value("db_queries_per_request_count", {"route": route}) or 0
+    checkouts = REGISTRY.get_sample_value("db_pool_checkout_wait_seconds_count", {"engine": "sync"}) or 0
+    try:
+        assert TestClient(app).get("/api/deliveries/1").status_code == 404
+    finally:
+        app.dependency_overrides = {}
+    assert REGISTRY.get_sample_value("db_queries_total", {"operation": "select", "route": route}) > selects
+    assert REGISTRY.get_sample_value("db_queries_per_request_count", {"route": route}) == requests + 1
+    assert REGISTRY.get_sample_value("db_pool_checkout_wait_seconds_count", {"engine": "sync"}) > checkouts
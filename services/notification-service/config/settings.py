@@ -11,5 +11,50 @@ class Settings(BaseSettings):
     TWILIO_ACCOUNT_SID: str = os.getenv("TWILIO_ACCOUNT_SID", "AC_mock_sid")
     TWILIO_AUTH_TOKEN: str = os.getenv("TWILIO_AUTH_TOKEN", "mock_token")
     SENDGRID_API_KEY: str = os.getenv("SENDGRID_API_KEY", "SG.mock_key")
+    TWILIO_FROM_NUMBER: str = "YOUR_TWILIO_PHONE_NUMBER"
+    SENDGRID_FROM_EMAIL: str = "your-email@example.com"
+    # Provider clients (src/utils.py): "twilio"/"sendgrid", or "local" to
+    # keep messages in memory. Pool size should cover NOTIFICATION_WORKERS.
+    SMS_PROVIDER: str = "twilio"
+    EMAIL_PROVIDER: str = "sendgrid"
+    PROVIDER_POOL_SIZE: int = 10
+    PROVIDER_TIMEOUT_SECONDS: float = 10.0
+    PROVIDER_LOCAL_LATENCY_SECONDS: float = 0.0
+    ASYNC_DB_ENABLED: bool = False
+    # Connection pool sizing, per process. Keep replicas * (size + overflow)
+    # below Postgres max_connections, or set DB_PGBOUNCER behind PgBouncer.
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_PGBOUNCER: bool = False
+    # Requests issuing more queries than this are logged as possible N+1 loops.
+    DB_N_PLUS_ONE_THRESHOLD: int = 10
+    # Outbox dispatch: concurrent deliveries per replica, in-memory queue
+    # bound, retry schedule (exponential from the base, capped) before a
+    # notification is dead-lettered, and how often the outbox is swept for
+    # due retries and rows left behind by a restart.
+    NOTIFICATION_WORKERS: int = 8
+    NOTIFICATION_QUEUE_SIZE: int = 10000
+    NOTIFICATION_MAX_ATTEMPTS: int = 5
+    NOTIFICATION_RETRY_BASE_SECONDS: float = 2.0
+    NOTIFICATION_RETRY_MAX_SECONDS: float = 300.0
+    NOTIFICATION_POLL_SECONDS: float = 5.0
+    # A claimed notification is retried by any replica if not finished by then.
+    NOTIFICATION_SEND_LEASE_SECONDS: float = 60.0
+    # Recipients per SendGrid call during bulk sends (its personalizations limit).
+    EMAIL_BATCH_SIZE: int = 1000
+    # Preference cache reload interval (0 loads once at startup), and the
+    # channel used instead of one the user disabled ("" drops the notification).
+    PREFERENCE_CACHE_REFRESH_SECONDS: float = 60.0
+    NOTIFICATION_FALLBACK_CHANNEL: str = "in-app"
+    # Notifications listed in a digest message before "and N more".
+    NOTIFICATION_DIGEST_MAX_ITEMS: int = 20
+    # In-app inbox streams (SSE): events a stream may fall behind before it
+    # is disconnected, open streams per replica, idle keep-alive interval.
+    INBOX_STREAM_QUEUE_SIZE: int = 100
+    INBOX_STREAM_MAX_SUBSCRIBERS: int = 5000
+    INBOX_STREAM_KEEPALIVE_SECONDS: float = 15.0
     
 settings = Settings()
@@ -0,0 +1,28 @@
+"""notification_batch_id
+
+Revision ID: 8e3b5f2a7c91
+Revises: 4a7c9e1b2d58
+Create Date: 2026-10-18 18:12:47.503118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e3b5f2a7c91'
+down_revision = '4a7c9e1b2d58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('notifications') as batch_op:
+        batch_op.add_column(sa.Column('batch_id', sa.String(length=36), nullable=True))
+    op.create_index('ix_notifications_batch_id', 'notifications', ['batch_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_notifications_batch_id', table_name='notifications')
+    with op.batch_alter_table('notifications') as batch_op:
+        batch_op.drop_column('batch_id')
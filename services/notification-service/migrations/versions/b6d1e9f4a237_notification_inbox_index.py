@@ -0,0 +1,23 @@
+"""notification_inbox_index
+
+Revision ID: b6d1e9f4a237
+Revises: 8e3b5f2a7c91
+Create Date: 2026-10-18 19:26:08.914502
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6d1e9f4a237'
+down_revision = '8e3b5f2a7c91'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_notifications_recipient_status', 'notifications', ['recipient_id', 'status'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_notifications_recipient_status', table_name='notifications')
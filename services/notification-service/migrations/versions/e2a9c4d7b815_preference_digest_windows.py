@@ -0,0 +1,28 @@
+"""preference_digest_windows
+
+Revision ID: e2a9c4d7b815
+Revises: b6d1e9f4a237
+Create Date: 2026-10-18 20:41:53.270936
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a9c4d7b815'
+down_revision = 'b6d1e9f4a237'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('preferences') as batch_op:
+        batch_op.add_column(sa.Column('sms_digest_seconds', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('email_digest_seconds', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('preferences') as batch_op:
+        batch_op.drop_column('email_digest_seconds')
+        batch_op.drop_column('sms_digest_seconds')
@@ -0,0 +1,385 @@
+"""Outbox-backed notification dispatch.
+
+create_notification only stores the notification as ``queued`` and hands
+its id to this dispatcher. It never waits on a provider. The
+notifications table is the outbox, and delivery happens here:
+
+* ``NOTIFICATION_WORKERS`` asyncio workers take ids from a bounded
+  in-process queue. Each runs one delivery at a time on a dedicated
+  thread pool (the provider SDKs are blocking), so that is the cap on
+  concurrent provider calls per replica.
+* A notification is claimed with a conditional UPDATE to ``sending``
+  before delivery. Only one worker, on any replica, delivers it.
+* A failed delivery is retried with exponential backoff. After
+  NOTIFICATION_MAX_ATTEMPTS it is parked as ``dead_letter`` with the
+  last error.
+* Claimed notifications are routed again by the recipient's current
+  preferences (src/preferences.py), so an opt-out made after queueing is
+  honoured without a provider call.
+* A recipient with a digest window on a channel (Preference.*_digest_seconds)
+  has sends on it held for the window. When the first comes due, the
+  recipient's other pending notifications on the channel are claimed with
+  it and sent as one digest message.
+* Bulk sends (create_bulk) are claimed and delivered per batch, using
+  the provider's multi-recipient API where there is one.
+* A sweeper re-queues due retries, rows that did not fit in the queue, and
+  rows claimed by a replica that died (the claim expires after
+  NOTIFICATION_SEND_LEASE_SECONDS).
+
+No broker is needed (RABBITMQ_URL is not used): the outbox table is the
+durable queue, and the in-process queue only makes delivery immediate.
+"""
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Optional, Set, Tuple
+
+from sqlalchemy import and_, exists, or_, update
+from sqlalchemy.orm import Session, aliased
+
+from config.settings import settings
+from .database import SessionLocal
+from .logging_config import get_logger
+from .metrics import (
+    NOTIFICATION_BATCH_DURATION, NOTIFICATION_COALESCED, NOTIFICATION_DELIVERY_LATENCY, NOTIFICATION_DISPATCH,
+    NOTIFICATION_QUEUE_DEPTH, PROVIDER_BATCH_SIZE,
+)
+from .models import DEAD_LETTER, OPTED_OUT, QUEUED, SENDING, SENT, Notification
+from .preferences import digest_window, preference_cache, route
+from .utils import send_email, send_email_batch, send_in_app_notification, send_sms
+
+logger = get_logger(__name__)
+
+CHANNELS = ("sms", "email", "in-app")
+
+
+def deliver(notification: Notification) -> None:
+    """Send ``notification`` through its channel's provider; raises on failure.
+
+    In-app notifications have no provider: the row is the inbox entry, and
+    it is pushed to open streams by _publish_in_app once committed as sent.
+    """
+    _send(notification.notification_type, notification.recipient_id, notification.title, notification.content)
+
+
+def _send(channel: str, recipient_id: int, title: str, content: str) -> None:
+    if channel == "in-app":
+        return
+    sender = {"sms": send_sms, "email": send_email}[channel]
+    sender(recipient_id, title, content)
+
+
+def digest(notifications) -> Tuple[str, str]:
+    """Title and content of one message summarising ``notifications``, oldest first."""
+    notifications = sorted(notifications, key=lambda n: (n.created_at or datetime.min, n.id))
+    channel = notifications[0].notification_type
+    shown = notifications[:settings.NOTIFICATION_DIGEST_MAX_ITEMS]
+    lines = [f"{n.title}: {n.content}" for n in shown]
+    if len(notifications) > len(shown):
+        lines.append(f"and {len(notifications) - len(shown)} more")
+    return f"{len(notifications)} new notifications", ("<br>" if channel == "email" else "\n").join(lines)
+
+
+def _in_app_sent(notifications) -> list:
+    """Inbox entries to publish, captured before commit expires the rows."""
+    return [
+        dict(recipient_id=n.recipient_id, title=n.title, content=n.content, notification_id=n.id,
+             created_at=n.created_at)
+        for n in notifications if n.notification_type == "in-app" and n.status == SENT
+    ]
+
+
+def _publish_in_app(entries: list) -> None:
+    for entry in entries:
+        send_in_app_notification(**entry)
+
+
+def retry_delay(attempts: int) -> float:
+    """Backoff before attempt ``attempts + 1``, with jitter so retries do not arrive in waves."""
+    delay = min(settings.NOTIFICATION_RETRY_BASE_SECONDS * 2 ** (attempts - 1), settings.NOTIFICATION_RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _due(now: datetime, table=Notification):
+    """Notifications that may be claimed at ``now``."""
+    return (
+        table.status.in_((QUEUED, SENDING)),
+        or_(table.next_attempt_at.is_(None), table.next_attempt_at <= now),
+    )
+
+
+def _claim() -> dict:
+    """Column values that mark a notification as being sent, until the lease runs out."""
+    return {
+        "status": SENDING,
+        "next_attempt_at": datetime.utcnow() + timedelta(seconds=settings.NOTIFICATION_SEND_LEASE_SECONDS),
+    }
+
+
+def _apply_preferences(db: Session, notifications) -> list:
+    """Re-route claimed notifications by current preferences, in case they
+    changed since queueing; mark and drop the ones no longer wanted."""
+    preferences = preference_cache.lookup(db, {n.recipient_id for n in notifications})
+    wanted = []
+    for notification in notifications:
+        channel = route(preferences[notification.recipient_id], notification.notification_type, record=False)
+        if channel is None:
+            NOTIFICATION_DISPATCH.labels(channel=notification.notification_type, result=OPTED_OUT).inc()
+            notification.status = OPTED_OUT
+            notification.next_attempt_at = None
+        else:
+            notification.notification_type = channel
+            wanted.append(notification)
+    return wanted
+
+
+def _claim_for_delivery(db: Session, notification_id: str) -> list:
+    """Claim a notification for delivery, returning the notifications to send.
+
+    When the recipient has a digest window on the channel, the recipient's
+    other pending notifications on it are claimed too, in the same statement
+    and only if this one is due. Concurrent workers therefore never split a
+    digest: whichever claims first gets the whole group. The claim is
+    committed before anything is sent; the requested notification comes first.
+    """
+    notification = db.get(Notification, notification_id)
+    if notification is None:
+        return []
+    now = datetime.utcnow()
+    preference = preference_cache.lookup(db, [notification.recipient_id])[notification.recipient_id]
+    if notification.batch_id is None and digest_window(preference, notification.notification_type):
+        trigger = aliased(Notification)
+        claimed = db.execute(
+            update(Notification)
+            .where(
+                Notification.recipient_id == notification.recipient_id,
+                Notification.notification_type == notification.notification_type,
+                Notification.batch_id.is_(None),
+                or_(Notification.status == QUEUED, and_(*_due(now))),
+                exists().where(trigger.id == notification_id, *_due(now, trigger)),
+            )
+            .values(**_claim())
+            .returning(Notification.id)
+        ).scalars().all()
+        db.commit()
+        if notification_id not in claimed:
+            return []
+        group = db.query(Notification).filter(Notification.id.in_(claimed)).all()
+        return sorted(group, key=lambda n: n.id != notification_id)
+    claimed = db.execute(
+        update(Notification).where(Notification.id == notification_id, *_due(now)).values(**_claim())
+    ).rowcount
+    db.commit()
+    return [notification] if claimed else []
+
+
+def _record_sent(notification: Notification) -> None:
+    notification.status = SENT
+    notification.next_attempt_at = None
+    NOTIFICATION_DISPATCH.labels(channel=notification.notification_type, result="sent").inc()
+    if notification.created_at is not None:
+        NOTIFICATION_DELIVERY_LATENCY.labels(channel=notification.notification_type).observe(
+            (datetime.utcnow() - notification.created_at).total_seconds())
+
+
+def _record_failure(notification: Notification, error: Exception) -> Optional[float]:
+    """Schedule a retry, or dead-letter after the last attempt. Returns the retry delay."""
+    channel = notification.notification_type
+    notification.attempts = (notification.attempts or 0) + 1
+    notification.last_error = str(error)[:500]
+    if notification.attempts >= settings.NOTIFICATION_MAX_ATTEMPTS:
+        notification.status = DEAD_LETTER
+        notification.next_attempt_at = None
+        NOTIFICATION_DISPATCH.labels(channel=channel, result="dead_letter").inc()
+        logger.error(f"Notification {notification.id} dead-lettered after {notification.attempts} attempts: {error}")
+        return None
+    delay = retry_delay(notification.attempts)
+    notification.status = QUEUED
+    notification.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+    NOTIFICATION_DISPATCH.labels(channel=channel, result="retry").inc()
+    return delay
+
+
+class Dispatcher:
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self.session_factory = session_factory
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._queued: Set[tuple] = set()
+        self._tasks = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def process(self, notification_id: str) -> Optional[float]:
+        """Claim and deliver one notification, or the digest it opens; return the
+        retry delay if it failed and will be retried."""
+        db = self.session_factory()
+        try:
+            claimed = _claim_for_delivery(db, notification_id)
+            if not claimed:
+                return None
+            delay = None
+            notifications = _apply_preferences(db, claimed)
+            if notifications:
+                primary = notifications[0]
+                try:
+                    if len(notifications) == 1 or primary.notification_type == "in-app":
+                        for notification in notifications:
+                            deliver(notification)
+                    else:
+                        _send(primary.notification_type, primary.recipient_id, *digest(notifications))
+                        NOTIFICATION_COALESCED.labels(channel=primary.notification_type).inc(len(notifications) - 1)
+                    for notification in notifications:
+                        _record_sent(notification)
+                except Exception as e:
+                    delay = [_record_failure(notification, e) for notification in notifications][0]
+            in_app = _in_app_sent(notifications)
+            db.commit()
+            _publish_in_app(in_app)
+            return delay
+        finally:
+            db.close()
+
+    def process_batch(self, batch_id: str) -> None:
+        """Claim every due notification of a bulk send and deliver them together.
+
+        Emails with the same title and content go out in provider batches of
+        EMAIL_BATCH_SIZE; other channels are sent one by one. Failed rows
+        are scheduled for retry individually, which the sweeper picks up.
+        """
+        db = self.session_factory()
+        try:
+            claimed = db.execute(
+                update(Notification)
+                .where(Notification.batch_id == batch_id, *_due(datetime.utcnow()))
+                .values(**_claim())
+                .returning(Notification.id)
+            ).scalars().all()
+            db.commit()
+            if not claimed:
+                return
+            start = time.perf_counter()
+            notifications = db.query(Notification).filter(Notification.id.in_(claimed)).all()
+            groups = {}
+            notifications = _apply_preferences(db, notifications)
+            for notification in notifications:
+                key = (notification.notification_type, notification.title, notification.content)
+                groups.setdefault(key, []).append(notification)
+            for (channel, title, content), group in groups.items():
+                size = {"email": settings.EMAIL_BATCH_SIZE, "in-app": len(group)}.get(channel, 1)
+                for i in range(0, len(group), size):
+                    chunk = group[i:i + size]
+                    PROVIDER_BATCH_SIZE.labels(channel=channel).observe(len(chunk))
+                    try:
+                        if channel == "email":
+                            send_email_batch([n.recipient_id for n in chunk], title, content)
+                        else:
+                            deliver(chunk[0])
+                        for notification in chunk:
+                            _record_sent(notification)
+                    except Exception as e:
+                        for notification in chunk:
+                            _record_failure(notification, e)
+            in_app = _in_app_sent(notifications)
+            db.commit()
+            _publish_in_app(in_app)
+            NOTIFICATION_BATCH_DURATION.observe(time.perf_counter() - start)
+        finally:
+            db.close()
+
+    def submit(self, notification_id: str, delay: float = 0) -> None:
+        """Queue a committed notification for delivery, after ``delay`` seconds;
+        callable from any thread.
+
+        Before start() or when the queue is full the id is not queued; the
+        sweeper finds the row in the outbox instead.
+        """
+        if self._loop is None:
+            return
+        job = (self.process, notification_id)
+        if delay > 0:
+            self._loop.call_soon_threadsafe(self._loop.call_later, delay, self._enqueue, job)
+        else:
+            self._loop.call_soon_threadsafe(self._enqueue, job)
+
+    def submit_batch(self, batch_id: str) -> None:
+        """Queue the notifications of a bulk send for delivery together.
+
+        Rows the sweeper reaches first are delivered one by one.
+        """
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._enqueue, (self.process_batch, batch_id))
+
+    def _enqueue(self, job) -> None:
+        if job in self._queued:
+            return
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            return
+        self._queued.add(job)
+        NOTIFICATION_QUEUE_DEPTH.set(self._queue.qsize())
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._queue.get()
+            self._queued.discard(job)
+            NOTIFICATION_QUEUE_DEPTH.set(self._queue.qsize())
+            run, key = job
+            try:
+                delay = await self._loop.run_in_executor(self._executor, run, key)
+            except Exception as e:
+                logger.error(f"Dispatch of {key} failed: {e}")
+                continue
+            if delay is not None:
+                self._loop.call_later(delay, self._enqueue, job)
+
+    def _due_ids(self, limit: int) -> list:
+        db = self.session_factory()
+        try:
+            rows = (
+                db.query(Notification.id)
+                .filter(*_due(datetime.utcnow()))
+                .order_by(Notification.next_attempt_at)
+                .limit(limit)
+                .all()
+            )
+            return [row.id for row in rows]
+        finally:
+            db.close()
+
+    async def _sweep(self) -> None:
+        while True:
+            room = self._queue.maxsize - self._queue.qsize()
+            if room > 0:
+                try:
+                    for notification_id in await self._loop.run_in_executor(self._executor, self._due_ids, room):
+                        self._enqueue((self.process, notification_id))
+                except Exception as e:
+                    logger.error(f"Notification outbox sweep failed: {e}")
+            await asyncio.sleep(settings.NOTIFICATION_POLL_SECONDS)
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=settings.NOTIFICATION_QUEUE_SIZE)
+        # One extra thread so the sweeper is never starved by slow deliveries.
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.NOTIFICATION_WORKERS + 1, thread_name_prefix="notification-dispatch")
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(settings.NOTIFICATION_WORKERS)]
+        self._tasks.append(asyncio.create_task(self._sweep()))
+
+    async def stop(self) -> None:
+        """Stop taking work. Deliveries in flight finish on their threads;
+        undelivered rows stay in the outbox for the next start."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+        self._queued.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+
+dispatcher = Dispatcher()
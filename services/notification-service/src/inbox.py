@@ -0,0 +1,128 @@
+"""Server-Sent Events push of in-app notifications.
+
+An in-app notification's row is its inbox entry. Once the dispatcher has
+committed it as sent, it is published to the recipient's open streams (a
+user may have several, one per tab or device). Each stream has a bounded
+queue. One that falls INBOX_STREAM_QUEUE_SIZE events behind is sent a
+``dropped`` event and disconnected. It can reconnect and re-read its
+unread notifications from /api/inbox/{recipient_id}.
+
+Publishing happens on dispatcher threads; delivery always goes through
+the subscriber's event loop.
+"""
+import asyncio
+import json
+import threading
+from typing import Dict, Optional, Set
+
+from fastapi.encoders import jsonable_encoder
+
+from config.settings import settings
+from .metrics import INBOX_STREAM_DROPPED, INBOX_STREAM_EVENTS, INBOX_STREAM_SUBSCRIBERS
+
+_CLOSED = None
+_DROPPED = b'event: dropped\ndata: {"reason": "slow consumer"}\n\n'
+KEEPALIVE = b": keep-alive\n\n"
+
+
+class TooManySubscribers(Exception):
+    """Raised when INBOX_STREAM_MAX_SUBSCRIBERS streams are already open."""
+
+
+class Subscription:
+    def __init__(self, recipient_id: int, maxsize: int):
+        self.recipient_id = recipient_id
+        self.maxsize = maxsize
+        # One slot beyond maxsize is kept for the close marker.
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize + 1)
+        self.loop = asyncio.get_running_loop()
+        self.closed = False
+
+    def offer(self, chunk: bytes) -> bool:
+        """Queue ``chunk``; return False if the subscriber is too far behind."""
+        if self.closed:
+            return True
+        if self.queue.qsize() >= self.maxsize:
+            return False
+        self.queue.put_nowait(chunk)
+        return True
+
+    def close(self, chunk: Optional[bytes] = None) -> None:
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        if chunk is not None:
+            self.queue.put_nowait(chunk)
+        self.queue.put_nowait(_CLOSED)
+
+    async def next(self, timeout: float) -> Optional[bytes]:
+        """Next event, KEEPALIVE after ``timeout`` idle seconds, or None once closed."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return KEEPALIVE
+
+
+class InboxBroadcaster:
+    def __init__(self):
+        self._by_recipient: Dict[int, Set[Subscription]] = {}
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def subscribe(self, recipient_id: int) -> Subscription:
+        """Open a subscription; must be called on the event loop that will read it."""
+        subscription = Subscription(recipient_id, max(settings.INBOX_STREAM_QUEUE_SIZE, 1))
+        with self._lock:
+            if self._count >= settings.INBOX_STREAM_MAX_SUBSCRIBERS:
+                raise TooManySubscribers()
+            self._by_recipient.setdefault(recipient_id, set()).add(subscription)
+            self._count += 1
+            INBOX_STREAM_SUBSCRIBERS.set(self._count)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._by_recipient.get(subscription.recipient_id)
+            if subscribers is None or subscription not in subscribers:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._by_recipient[subscription.recipient_id]
+            self._count -= 1
+            INBOX_STREAM_SUBSCRIBERS.set(self._count)
+
+    def publish(self, event: str, recipient_id: int, payload) -> None:
+        """Send ``payload`` as an SSE ``event`` to the recipient's streams."""
+        with self._lock:
+            subscribers = list(self._by_recipient.get(recipient_id, ()))
+        if not subscribers:
+            return
+        INBOX_STREAM_EVENTS.labels(event=event).inc()
+        chunk = f"event: {event}\ndata: {json.dumps(jsonable_encoder(payload))}\n\n".encode()
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(self._deliver, subscription, chunk)
+            except RuntimeError:
+                # The subscriber's loop is gone (shutdown).
+                self.unsubscribe(subscription)
+
+    def _deliver(self, subscription: Subscription, chunk: bytes) -> None:
+        if not subscription.offer(chunk):
+            INBOX_STREAM_DROPPED.inc()
+            self.unsubscribe(subscription)
+            subscription.close(_DROPPED)
+
+
+inbox_broadcaster = InboxBroadcaster()
+
+
+async def event_stream(subscription: Subscription):
+    """SSE body for a subscription; unsubscribes when the client goes away."""
+    try:
+        while True:
+            chunk = await subscription.next(settings.INBOX_STREAM_KEEPALIVE_SECONDS)
+            if chunk is _CLOSED:
+                return
+            yield chunk
+    finally:
+        inbox_broadcaster.unsubscribe(subscription)
@@ -1,12 +1,17 @@
+import asyncio
 import uuid
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from .database import engine, Base
+from .dispatch import dispatcher
+from .preferences import run_preference_cache
+from .utils import providers
 from .routes import router
 from .health import router as health_router
 from .logging_config import setup_logging, get_logger
 from .metrics import setup_metrics
+from .query_metrics import QueryMetricsMiddleware
 from .rate_limit import get_limiter, setup_rate_limiting
 
 # Setup structured logging
@@ -20,7 +25,13 @@ async def lifespan(app: FastAPI):
     logger.info("Starting notification-service")
     # Tables are now managed by Alembic migrations via Helm Job
     # Base.metadata.create_all(bind=engine)
+    preference_task = asyncio.create_task(run_preference_cache())
+    providers.start()
+    await dispatcher.start()
     yield
+    await dispatcher.stop()
+    preference_task.cancel()
+    providers.close()
     logger.info("Shutting down notification-service")
 
 app = FastAPI(
@@ -44,6 +55,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(QueryMetricsMiddleware)
 
 @app.middleware("http")
 async def request_logging_middleware(request: Request, call_next):
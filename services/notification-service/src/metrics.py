@@ -26,7 +26,136 @@ ACTIVE_REQUESTS = Gauge(
 DB_QUERY_COUNT = Counter(
     "db_queries_total",
     "Total database queries",
-    ["operation"]
+    ["operation", "route"]
+)
+
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds",
+    "Database statement execution time in seconds",
+    ["operation", "route"],
+    buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0]
+)
+
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request",
+    "Database statements issued while serving one request",
+    ["route"],
+    buckets=[1, 2, 3, 5, 10, 20, 50, 100]
+)
+
+DB_N_PLUS_ONE_REQUESTS = Counter(
+    "db_n_plus_one_requests_total",
+    "Requests that issued more than DB_N_PLUS_ONE_THRESHOLD queries",
+    ["route"]
+)
+
+PROVIDER_LATENCY = Histogram(
+    "notification_provider_request_seconds",
+    "Latency of notification provider calls",
+    ["provider", "channel"],
+    buckets=[0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+)
+
+PROVIDER_ERRORS = Counter(
+    "notification_provider_errors_total",
+    "Notification provider calls that failed",
+    ["provider", "channel"]
+)
+
+NOTIFICATION_DISPATCH = Counter(
+    "notification_dispatch_total",
+    "Notification delivery attempts by channel and result (sent, retry, dead_letter, opted_out)",
+    ["channel", "result"]
+)
+
+NOTIFICATION_QUEUE_DEPTH = Gauge(
+    "notification_dispatch_queue_depth",
+    "Notifications waiting in the in-process dispatch queue"
+)
+
+NOTIFICATION_DELIVERY_LATENCY = Histogram(
+    "notification_delivery_latency_seconds",
+    "Time from a notification being queued to being sent",
+    ["channel"],
+    buckets=[0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 1800.0]
+)
+
+PREFERENCE_CACHE_REQUESTS = Counter(
+    "notification_preference_cache_requests_total",
+    "Preference lookups by result (hit, miss)",
+    ["result"]
+)
+
+NOTIFICATION_ROUTING = Counter(
+    "notification_routing_total",
+    "Channel routing decisions by requested channel and result (direct, rerouted, dropped)",
+    ["channel", "result"]
+)
+
+NOTIFICATION_COALESCED = Counter(
+    "notification_coalesced_total",
+    "Notifications merged into another's digest; each is a provider call saved",
+    ["channel"]
+)
+
+NOTIFICATION_BULK_RECIPIENTS = Counter(
+    "notification_bulk_recipients_total",
+    "Recipients of bulk sends by channel and result (queued, opted_out)",
+    ["channel", "result"]
+)
+
+PROVIDER_BATCH_SIZE = Histogram(
+    "notification_provider_batch_size",
+    "Notifications delivered per provider call during bulk dispatch",
+    ["channel"],
+    buckets=[1, 10, 50, 100, 250, 500, 1000]
+)
+
+NOTIFICATION_BATCH_DURATION = Histogram(
+    "notification_batch_dispatch_seconds",
+    "Time to deliver the claimed notifications of one bulk send",
+    buckets=[0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0]
+)
+
+INBOX_STREAM_SUBSCRIBERS = Gauge(
+    "notification_inbox_stream_subscribers",
+    "Open in-app inbox event streams"
+)
+
+INBOX_STREAM_EVENTS = Counter(
+    "notification_inbox_stream_events_total",
+    "Inbox events published to at least one stream",
+    ["event"]
+)
+
+INBOX_STREAM_DROPPED = Counter(
+    "notification_inbox_stream_dropped_subscribers_total",
+    "Inbox streams disconnected for falling too far behind"
+)
+
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a database connection from the pool",
+    ["engine"],
+    buckets=[0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0]
+)
+
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts_total",
+    "Connection checkouts that gave up after DB_POOL_TIMEOUT",
+    ["engine"]
+)
+
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_connections_checked_out",
+    "Database connections currently in use",
+    ["engine"]
+)
+
+DB_POOL_SATURATION = Gauge(
+    "db_pool_saturation_ratio",
+    "Checked-out connections as a fraction of pool size plus overflow",
+    ["engine"]
 )
 
 
@@ -51,3 +180,12 @@ def setup_metrics(app, service_name: str):
     instrumentator.instrument(app).expose(app, endpoint="/metrics")
     
     return instrumentator
+
+
+def track_pool(pool, engine: str, max_overflow: int):
+    """Export usage of a SQLAlchemy QueuePool, read at scrape time."""
+    capacity = pool.size() + max(max_overflow, 0)
+    DB_POOL_CHECKED_OUT.labels(engine=engine).set_function(pool.checkedout)
+    DB_POOL_SATURATION.labels(engine=engine).set_function(
+        lambda: pool.checkedout() / capacity if capacity else 0.0
+    )
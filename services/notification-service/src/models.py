@@ -1,7 +1,18 @@
-from sqlalchemy import Column, Integer, String, Boolean, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, Float, ForeignKey, DateTime, Index
 from .database import Base
+from datetime import datetime
 import uuid
 
+# Notification.status values used by the dispatch pipeline (src/dispatch.py).
+QUEUED = "queued"
+SENDING = "sending"
+SENT = "sent"
+DEAD_LETTER = "dead_letter"
+# The recipient disabled the channel (and its fallback) before delivery.
+OPTED_OUT = "opted_out"
+# An in-app notification the recipient has seen; unread ones are SENT.
+READ = "read"
+
 class Notification(Base):
     __tablename__ = "notifications"
 
@@ -11,6 +22,19 @@ class Notification(Base):
     recipient_id = Column(Integer, nullable=False)
     notification_type = Column(String, nullable=False)
     status = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    # Outbox bookkeeping: delivery attempts so far, when the row may next be
+    # claimed (retry time, or lease expiry while sending) and the last error.
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=True)
+    last_error = Column(String, nullable=True)
+    # Shared by the notifications of one bulk send, so they are delivered together.
+    batch_id = Column(String(36), nullable=True, index=True)
+
+    __table_args__ = (
+        Index("ix_notifications_status_next_attempt", "status", "next_attempt_at"),
+        Index("ix_notifications_recipient_status", "recipient_id", "status"),
+    )
 
 class Preference(Base):
     __tablename__ = "preferences"
@@ -20,3 +44,7 @@ class Preference(Base):
     sms_enabled = Column(Boolean, default=True)
     email_enabled = Column(Boolean, default=True)
     in_app_enabled = Column(Boolean, default=True)
+    # Digest windows: notifications arriving within this many seconds are
+    # merged into one message (0 sends each one on its own).
+    sms_digest_seconds = Column(Integer, nullable=False, default=0)
+    email_digest_seconds = Column(Integer, nullable=False, default=0)
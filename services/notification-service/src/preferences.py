@@ -0,0 +1,169 @@
+"""In-memory notification preferences and channel routing.
+
+The whole preferences table is loaded at startup (a few small columns per
+user), so a lookup is a dict read. A user missing from a loaded cache has
+no preference row and gets the defaults: every channel enabled.
+NotificationService.update_preferences writes through after commit.
+Changes made through other replicas show up at the next periodic reload
+(PREFERENCE_CACHE_REFRESH_SECONDS). Until the first load succeeds, unknown
+users are read from the database and cached.
+
+route() picks the channel a notification actually goes out on. A channel
+the user disabled is replaced by NOTIFICATION_FALLBACK_CHANNEL if that one
+is enabled; otherwise the notification is dropped before it is stored or
+handed to a provider.
+"""
+import asyncio
+import threading
+from typing import Dict, Iterable, NamedTuple, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from config.settings import settings
+from .database import SessionLocal
+from .logging_config import get_logger
+from .metrics import NOTIFICATION_ROUTING, PREFERENCE_CACHE_REQUESTS
+from .models import Preference
+
+logger = get_logger(__name__)
+
+
+class CachedPreference(NamedTuple):
+    id: str
+    user_id: int
+    sms_enabled: bool
+    email_enabled: bool
+    in_app_enabled: bool
+    sms_digest_seconds: int = 0
+    email_digest_seconds: int = 0
+
+
+_COLUMNS = (Preference.id, Preference.user_id, Preference.sms_enabled, Preference.email_enabled,
+            Preference.in_app_enabled, Preference.sms_digest_seconds, Preference.email_digest_seconds)
+
+
+def _cached(row) -> CachedPreference:
+    # NULL flags predate the column defaults and mean enabled.
+    return CachedPreference(
+        str(row.id), row.user_id, row.sms_enabled is not False, row.email_enabled is not False,
+        row.in_app_enabled is not False, row.sms_digest_seconds or 0, row.email_digest_seconds or 0)
+
+
+class PreferenceCache:
+    """Preferences by user id; safe to share across threads."""
+
+    def __init__(self):
+        # None records a user known to have no preference row.
+        self._prefs: Dict[int, Optional[CachedPreference]] = {}
+        self._lock = threading.Lock()
+        self._rebuilding = threading.Lock()
+        # Writes made while a reload is reading the table, replayed onto the
+        # reloaded cache so they are not lost.
+        self._pending: Optional[list] = None
+        self.loaded = False
+
+    def put(self, preference) -> None:
+        """Store ``preference`` (a Preference row) after it was committed."""
+        cached = _cached(preference)
+        with self._lock:
+            self._prefs[cached.user_id] = cached
+            if self._pending is not None:
+                self._pending.append(cached)
+
+    def lookup(self, db: Session, user_ids: Iterable[int]) -> Dict[int, Optional[CachedPreference]]:
+        """Preferences of ``user_ids`` (None where the user has none).
+
+        Only users unknown to a cache that is not loaded yet cost a query,
+        one for all of them.
+        """
+        user_ids = set(user_ids)
+        with self._lock:
+            if self.loaded:
+                PREFERENCE_CACHE_REQUESTS.labels(result="hit").inc(len(user_ids))
+                return {user_id: self._prefs.get(user_id) for user_id in user_ids}
+            found = {user_id: self._prefs[user_id] for user_id in user_ids if user_id in self._prefs}
+        missing = user_ids - found.keys()
+        PREFERENCE_CACHE_REQUESTS.labels(result="hit").inc(len(found))
+        if missing:
+            PREFERENCE_CACHE_REQUESTS.labels(result="miss").inc(len(missing))
+            rows = {row.user_id: _cached(row)
+                    for row in db.execute(select(*_COLUMNS).where(Preference.user_id.in_(missing)))}
+            with self._lock:
+                for user_id in missing:
+                    found[user_id] = self._prefs.setdefault(user_id, rows.get(user_id))
+        return found
+
+    def rebuild(self, db: Session) -> None:
+        with self._rebuilding:
+            with self._lock:
+                self._pending = []
+            try:
+                prefs = {row.user_id: _cached(row)
+                         for row in db.execute(select(*_COLUMNS).execution_options(yield_per=10000))}
+                with self._lock:
+                    for cached in self._pending:
+                        prefs[cached.user_id] = cached
+                    self._prefs = prefs
+                    self.loaded = True
+            finally:
+                with self._lock:
+                    self._pending = None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._prefs = {}
+            self.loaded = False
+
+
+preference_cache = PreferenceCache()
+
+
+def enabled(preference: Optional[CachedPreference], channel: str) -> bool:
+    if preference is None:
+        return True
+    return {"sms": preference.sms_enabled, "email": preference.email_enabled,
+            "in-app": preference.in_app_enabled}[channel]
+
+
+def digest_window(preference: Optional[CachedPreference], channel: str) -> int:
+    """Seconds to collect ``channel`` notifications into one digest; 0 when off.
+    In-app notifications cost no provider call and are never merged."""
+    if preference is None:
+        return 0
+    return {"sms": preference.sms_digest_seconds, "email": preference.email_digest_seconds}.get(channel, 0)
+
+
+def route(preference: Optional[CachedPreference], channel: str, record: bool = True) -> Optional[str]:
+    """Channel to use for a ``channel`` notification, or None to drop it."""
+    fallback = settings.NOTIFICATION_FALLBACK_CHANNEL
+    if enabled(preference, channel):
+        routed, result = channel, "direct"
+    elif fallback and fallback != channel and enabled(preference, fallback):
+        routed, result = fallback, "rerouted"
+    else:
+        routed, result = None, "dropped"
+    if record:
+        NOTIFICATION_ROUTING.labels(channel=channel, result=result).inc()
+    return routed
+
+
+def _rebuild_once() -> None:
+    db = SessionLocal()
+    try:
+        preference_cache.rebuild(db)
+    finally:
+        db.close()
+
+
+async def run_preference_cache() -> None:
+    """Load the cache, then reload it periodically; cancelled at shutdown."""
+    while True:
+        try:
+            await run_in_threadpool(_rebuild_once)
+        except Exception as e:
+            logger.error(f"Preference cache reload failed: {e}")
+        if settings.PREFERENCE_CACHE_REFRESH_SECONDS <= 0:
+            return
+        await asyncio.sleep(settings.PREFERENCE_CACHE_REFRESH_SECONDS)
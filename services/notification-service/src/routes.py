@@ -1,31 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Body
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, status, Body
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from .database import get_db
+from .inbox import TooManySubscribers, event_stream, inbox_broadcaster
 from .schemas import (
-    NotificationCreate, NotificationResponse,
+    MAX_INBOX_PAGE, InboxItem, InboxReadRequest, InboxReadResponse,
+    NotificationBulkCreate, NotificationBulkResponse, NotificationCreate, NotificationResponse,
     PreferenceUpdate, PreferenceResponse
 )
-from .services import NotificationService
+from .services import AsyncNotificationService
 
 router = APIRouter()
 
 @router.post("/api/notifications", response_model=dict)
-def create_notification(notification: NotificationCreate, db: Session = Depends(get_db)):
+async def create_notification(notification: NotificationCreate, db: Session = Depends(get_db)):
     # Sync handler because NotificationService uses Sync DB
-    new_notification = NotificationService.create_notification(db, notification)
-    return {"notification_id": new_notification.id}
+    new_notification = await AsyncNotificationService.create_notification(db, notification)
+    if new_notification is None:
+        return {"notification_id": None, "status": "opted_out"}
+    return {
+        "notification_id": new_notification.id,
+        "status": new_notification.status,
+        "notification_type": new_notification.notification_type,
+    }
+
+# Declared before /api/notifications/{notification_id}.
+@router.post("/api/notifications/bulk", response_model=NotificationBulkResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_bulk_notifications(bulk: NotificationBulkCreate, db: Session = Depends(get_db)):
+    return await AsyncNotificationService.create_bulk(db, bulk)
 
 @router.get("/api/notifications/{notification_id}", response_model=NotificationResponse)
-def get_notification(notification_id: str, db: Session = Depends(get_db)):
-    notification = NotificationService.get_notification(db, notification_id)
+async def get_notification(notification_id: str, db: Session = Depends(get_db)):
+    notification = await AsyncNotificationService.get_notification(db, notification_id)
     if not notification:
         raise HTTPException(status_code=404, detail="Notification not found")
     return notification
 
 @router.patch("/api/notifications/{notification_id}")
-def update_notification_status(notification_id: str, status: str = Body(..., embed=True), db: Session = Depends(get_db)):
+async def update_notification_status(notification_id: str, status: str = Body(..., embed=True), db: Session = Depends(get_db)):
     # Note: status is received potentially as query or body. 
     # Original code: `status: str` implies query parameter in FastAPI if not modeled. 
     # But usually status updates are body. 
@@ -39,25 +54,53 @@ def update_notification_status(notification_id: str, status: str = Body(..., emb
     
     # Original: status: str -> Query param '.../guid?status=read'
     
-    notification = NotificationService.get_notification(db, notification_id)
+    notification = await AsyncNotificationService.get_notification(db, notification_id)
     if not notification:
         raise HTTPException(status_code=404, detail="Notification not found")
     
-    NotificationService.update_notification_status(db, notification, status)
+    await AsyncNotificationService.update_notification_status(db, notification, status)
     return {"message": f"Notification {notification_id} status updated to {status}"}
 
+@router.get("/api/inbox/{recipient_id}", response_model=List[InboxItem])
+async def list_unread(
+    recipient_id: int,
+    limit: int = Query(50, ge=1, le=MAX_INBOX_PAGE),
+    before: Optional[datetime] = Query(None, description="Only notifications created before this time"),
+    db: Session = Depends(get_db),
+):
+    return await AsyncNotificationService.list_unread(db, recipient_id, limit, before)
+
+@router.post("/api/inbox/{recipient_id}/read", response_model=InboxReadResponse)
+async def mark_read(recipient_id: int, request: InboxReadRequest, db: Session = Depends(get_db)):
+    ids = None if request.notification_ids is None else [str(i) for i in request.notification_ids]
+    return InboxReadResponse(updated=await AsyncNotificationService.mark_read(db, recipient_id, ids))
+
+@router.get("/api/inbox/{recipient_id}/stream")
+async def stream_inbox(recipient_id: int):
+    """Server-Sent Events: ``notification`` for each new in-app notification and
+    ``read`` when notifications are marked read elsewhere."""
+    try:
+        subscription = inbox_broadcaster.subscribe(recipient_id)
+    except TooManySubscribers:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Too many open streams")
+    return StreamingResponse(
+        event_stream(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.get("/api/preferences/{user_id}", response_model=PreferenceResponse)
-def get_preferences(user_id: int, db: Session = Depends(get_db)):
-    preference = NotificationService.get_preferences(db, user_id)
+async def get_preferences(user_id: int, db: Session = Depends(get_db)):
+    preference = await AsyncNotificationService.get_preferences(db, user_id)
     if not preference:
         raise HTTPException(status_code=404, detail="User preferences not found")
     return preference
 
 @router.patch("/api/preferences/{user_id}")
-def update_preferences(user_id: int, preferences: PreferenceUpdate, db: Session = Depends(get_db)):
+async def update_preferences(user_id: int, preferences: PreferenceUpdate, db: Session = Depends(get_db)):
     # Enforce consistency
     if preferences.user_id != user_id:
          preferences.user_id = user_id
          
-    NotificationService.update_preferences(db, user_id, preferences)
+    await AsyncNotificationService.update_preferences(db, user_id, preferences)
     return {"message": f"Preferences for user {user_id} updated"}
@@ -1,7 +1,12 @@
-from pydantic import BaseModel, ConfigDict
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, Field
+from datetime import datetime
+from typing import Dict, List, Literal, Optional
 import uuid
 
+MAX_BULK_RECIPIENTS = 10000
+MAX_INBOX_PAGE = 200
+MAX_DIGEST_SECONDS = 86400
+
 class NotificationBase(BaseModel):
     title: str
     content: str
@@ -17,11 +22,47 @@ class NotificationResponse(NotificationBase):
     
     model_config = ConfigDict(from_attributes=True)
 
+class BulkRecipient(BaseModel):
+    recipient_id: int
+    # Values for the template's $placeholders; unknown placeholders are left as is.
+    variables: Dict[str, str] = {}
+
+class NotificationBulkCreate(BaseModel):
+    title: str
+    content: str
+    notification_type: Literal["sms", "email", "in-app"]
+    recipients: List[BulkRecipient] = Field(min_length=1, max_length=MAX_BULK_RECIPIENTS)
+
+class NotificationBulkResponse(BaseModel):
+    batch_id: uuid.UUID
+    queued: int
+    # Queued on the fallback channel because the requested one is disabled.
+    rerouted: int
+    opted_out: int
+
+class InboxItem(BaseModel):
+    id: uuid.UUID
+    title: str
+    content: str
+    created_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class InboxReadRequest(BaseModel):
+    # Omit to mark every unread notification of the recipient as read.
+    notification_ids: Optional[List[uuid.UUID]] = Field(None, max_length=MAX_INBOX_PAGE)
+
+class InboxReadResponse(BaseModel):
+    updated: int
+
 class PreferenceBase(BaseModel):
     user_id: int
     sms_enabled: bool
     email_enabled: bool
     in_app_enabled: bool
+    # Seconds over which notifications are merged into one digest; 0 is off.
+    sms_digest_seconds: int = Field(0, ge=0, le=MAX_DIGEST_SECONDS)
+    email_digest_seconds: int = Field(0, ge=0, le=MAX_DIGEST_SECONDS)
 
 class PreferenceCreate(PreferenceBase):
     pass
@@ -1,42 +1,88 @@
 import uuid
+from datetime import datetime, timedelta
+from string import Template
+from sqlalchemy import insert, update
 from sqlalchemy.orm import Session
-from typing import Optional
-from .models import Notification, Preference
-from .schemas import NotificationCreate, PreferenceUpdate
-from .utils import send_sms, send_email, send_in_app_notification
+from typing import List, Optional
+from .models import QUEUED, READ, SENT, Notification, Preference
+from .schemas import NotificationBulkCreate, NotificationBulkResponse, NotificationCreate, PreferenceUpdate
+from .database import AsyncService
+from .dispatch import CHANNELS, dispatcher
+from .inbox import inbox_broadcaster
+from .metrics import NOTIFICATION_BULK_RECIPIENTS
+from .preferences import CachedPreference, digest_window, preference_cache, route
 
 class NotificationService:
     @staticmethod
-    def create_notification(db: Session, notification: NotificationCreate) -> Notification:
+    def create_notification(db: Session, notification: NotificationCreate) -> Optional[Notification]:
+        """Store the notification in the outbox; delivery happens in the background.
+
+        The channel is routed by the recipient's preferences first. Returns None,
+        without touching the database, when the recipient opted out. Sends to
+        a recipient with a digest window on the channel are held for the window.
+        """
         new_notification = Notification(**notification.model_dump(), id=str(uuid.uuid4()))
+        if notification.notification_type in CHANNELS:
+            preference = preference_cache.lookup(db, [notification.recipient_id])[notification.recipient_id]
+            channel = route(preference, notification.notification_type)
+            if channel is None:
+                return None
+            new_notification.notification_type = channel
+            new_notification.status = QUEUED
+            # With a digest window the send waits for it, collecting later
+            # notifications to the same recipient and channel.
+            window = digest_window(preference, channel)
+            if window:
+                new_notification.next_attempt_at = datetime.utcnow() + timedelta(seconds=window)
+        else:
+            new_notification.status = "unknown_type"
+            window = 0
         db.add(new_notification)
-        # Commit to save initial state? Or wait.
-        # Original logic saved first, then updated status.
-        # We can replicate:
-        db.commit()
-        db.refresh(new_notification)
-
-        # Logic to send
-        try:
-            if notification.notification_type == "sms":
-                send_sms(notification.recipient_id, notification.title, notification.content)
-                new_notification.status = "sent"
-            elif notification.notification_type == "email":
-                send_email(notification.recipient_id, notification.title, notification.content)
-                new_notification.status = "sent"
-            elif notification.notification_type == "in-app":
-                send_in_app_notification(notification.recipient_id, notification.title, notification.content)
-                new_notification.status = "sent"
-            else:
-                new_notification.status = "unknown_type"
-        except Exception:
-            new_notification.status = "failed"
-            # Log error ideally
-        
         db.commit()
         db.refresh(new_notification)
+        if new_notification.status == QUEUED:
+            dispatcher.submit(new_notification.id, delay=window)
         return new_notification
 
+    @staticmethod
+    def create_bulk(db: Session, bulk: NotificationBulkCreate) -> NotificationBulkResponse:
+        """Render the template per recipient and store one queued notification each.
+
+        Each recipient's channel is routed by their preferences; recipients who
+        opted out are skipped. The rows are inserted in one statement and
+        delivered together by the dispatcher.
+        """
+        recipients = {r.recipient_id: r.variables for r in bulk.recipients}
+        preferences = preference_cache.lookup(db, recipients)
+        batch_id = str(uuid.uuid4())
+        now = datetime.utcnow()
+        title, content = Template(bulk.title), Template(bulk.content)
+        rows = []
+        for recipient_id, variables in recipients.items():
+            channel = route(preferences[recipient_id], bulk.notification_type)
+            if channel is None:
+                continue
+            rows.append({
+                "id": str(uuid.uuid4()),
+                "title": title.safe_substitute(variables),
+                "content": content.safe_substitute(variables),
+                "recipient_id": recipient_id,
+                "notification_type": channel,
+                "status": QUEUED,
+                "created_at": now,
+                "attempts": 0,
+                "batch_id": batch_id,
+            })
+        if rows:
+            db.execute(insert(Notification.__table__), rows)
+            db.commit()
+            dispatcher.submit_batch(batch_id)
+        opted_out = len(recipients) - len(rows)
+        rerouted = sum(row["notification_type"] != bulk.notification_type for row in rows)
+        NOTIFICATION_BULK_RECIPIENTS.labels(channel=bulk.notification_type, result="queued").inc(len(rows))
+        NOTIFICATION_BULK_RECIPIENTS.labels(channel=bulk.notification_type, result="opted_out").inc(opted_out)
+        return NotificationBulkResponse(batch_id=batch_id, queued=len(rows), rerouted=rerouted, opted_out=opted_out)
+
     @staticmethod
     def get_notification(db: Session, notification_id: str) -> Optional[Notification]:
         return db.query(Notification).filter(Notification.id == notification_id).first()
@@ -49,22 +95,58 @@ class NotificationService:
         return notification
 
     @staticmethod
-    def get_preferences(db: Session, user_id: int) -> Optional[Preference]:
-        return db.query(Preference).filter(Preference.user_id == user_id).first()
+    def list_unread(db: Session, recipient_id: int, limit: int, before: Optional[datetime] = None) -> List[Notification]:
+        """The recipient's unread in-app notifications, newest first; page with ``before``."""
+        filters = [
+            Notification.recipient_id == recipient_id,
+            Notification.status == SENT,
+            Notification.notification_type == "in-app",
+        ]
+        if before is not None:
+            filters.append(Notification.created_at < before)
+        return db.query(Notification).filter(*filters).order_by(Notification.created_at.desc()).limit(limit).all()
+
+    @staticmethod
+    def mark_read(db: Session, recipient_id: int, notification_ids: Optional[List[str]] = None) -> int:
+        """Mark unread in-app notifications as read in one statement (all of them
+        when ``notification_ids`` is None); the recipient's other open streams
+        are told which."""
+        stmt = update(Notification).where(
+            Notification.recipient_id == recipient_id,
+            Notification.status == SENT,
+            Notification.notification_type == "in-app",
+        )
+        if notification_ids is not None:
+            stmt = stmt.where(Notification.id.in_(notification_ids))
+        read = db.execute(stmt.values(status=READ).returning(Notification.id)).scalars().all()
+        db.commit()
+        if read:
+            inbox_broadcaster.publish("read", recipient_id, {"notification_ids": read})
+        return len(read)
+
+    @staticmethod
+    def get_preferences(db: Session, user_id: int) -> Optional[CachedPreference]:
+        return preference_cache.lookup(db, [user_id])[user_id]
 
     @staticmethod
     def update_preferences(db: Session, user_id: int, preferences_data: PreferenceUpdate) -> Preference:
-        existing_preference = NotificationService.get_preferences(db, user_id)
+        existing_preference = db.query(Preference).filter(Preference.user_id == user_id).first()
         if not existing_preference:
             new_preference = Preference(**preferences_data.model_dump(), id=str(uuid.uuid4()))
             db.add(new_preference)
             db.commit()
             db.refresh(new_preference)
+            preference_cache.put(new_preference)
             return new_preference
         else:
             existing_preference.sms_enabled = preferences_data.sms_enabled
             existing_preference.email_enabled = preferences_data.email_enabled
             existing_preference.in_app_enabled = preferences_data.in_app_enabled
+            existing_preference.sms_digest_seconds = preferences_data.sms_digest_seconds
+            existing_preference.email_digest_seconds = preferences_data.email_digest_seconds
             db.commit()
             db.refresh(existing_preference)
+            preference_cache.put(existing_preference)
             return existing_preference
+
+AsyncNotificationService = AsyncService(NotificationService)
@@ -1,37 +1,191 @@
-from twilio.rest import Client
-import sendgrid
+"""Notification providers.
+
+One client per provider is built when the app starts and closed when it
+stops, so every send reuses pooled keep-alive HTTPS connections instead of
+doing a fresh TLS handshake. Pools hold PROVIDER_POOL_SIZE connections,
+enough for the dispatch workers.
+
+In-app notifications are pushed to the recipient's inbox streams
+(src/inbox.py) instead of an external provider.
+
+SMS_PROVIDER / EMAIL_PROVIDER choose the implementation. ``local`` keeps
+messages in memory (optionally after PROVIDER_LOCAL_LATENCY_SECONDS), so
+tests, development and benchmarks run offline.
+"""
+import threading
+import time
+from collections import deque
+from typing import List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
 from sendgrid.helpers.mail import Mail
-from fastapi import HTTPException
+from twilio.http.http_client import TwilioHttpClient
+from twilio.rest import Client
+
 from config.settings import settings
+from .inbox import inbox_broadcaster
+from .metrics import PROVIDER_ERRORS, PROVIDER_LATENCY
 
-def send_sms(recipient_id, title, content):
-    account_sid = settings.TWILIO_ACCOUNT_SID
-    auth_token = settings.TWILIO_AUTH_TOKEN
-    client = Client(account_sid, auth_token)
-    
+SENDGRID_SEND_URL = "https://api.sendgrid.com/v3/mail/send"
+
+
+class ProviderError(Exception):
+    """A provider rejected or failed to accept a message."""
+
+
+def _pooled_session(session: Optional[requests.Session] = None) -> requests.Session:
+    session = session or requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=settings.PROVIDER_POOL_SIZE))
+    return session
+
+
+class TwilioSmsProvider:
+    name = "twilio"
+
+    def __init__(self):
+        self._http = TwilioHttpClient(pool_connections=True, timeout=settings.PROVIDER_TIMEOUT_SECONDS)
+        _pooled_session(self._http.session)
+        self._client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN, http_client=self._http)
+
+    def send(self, to: str, body: str) -> str:
+        return self._client.messages.create(body=body, from_=settings.TWILIO_FROM_NUMBER, to=to).sid
+
+    def close(self) -> None:
+        self._http.session.close()
+
+
+class SendGridEmailProvider:
+    """SendGrid v3 mail/send over a pooled requests session.
+
+    The sendgrid SDK's own client opens a new connection per request, so
+    only its Mail helper is used to build the payload.
+    """
+
+    name = "sendgrid"
+
+    def __init__(self):
+        self._session = _pooled_session()
+        self._session.headers.update({"Authorization": f"Bearer {settings.SENDGRID_API_KEY}"})
+
+    def send(self, to: str, subject: str, html: str) -> int:
+        mail = Mail(settings.SENDGRID_FROM_EMAIL, to, subject=subject, html_content=html)
+        response = self._session.post(SENDGRID_SEND_URL, json=mail.get(), timeout=settings.PROVIDER_TIMEOUT_SECONDS)
+        if response.status_code >= 300:
+            raise ProviderError(f"SendGrid returned {response.status_code}: {response.text[:200]}")
+        return response.status_code
+
+    def send_many(self, to: List[str], subject: str, html: str) -> int:
+        """One request for many recipients; each gets their own personalization,
+        so recipients do not see each other."""
+        mail = Mail(settings.SENDGRID_FROM_EMAIL, to, subject=subject, html_content=html, is_multiple=True)
+        response = self._session.post(SENDGRID_SEND_URL, json=mail.get(), timeout=settings.PROVIDER_TIMEOUT_SECONDS)
+        if response.status_code >= 300:
+            raise ProviderError(f"SendGrid returned {response.status_code}: {response.text[:200]}")
+        return response.status_code
+
+    def close(self) -> None:
+        self._session.close()
+
+
+class LocalProvider:
+    """Offline stand-in for any channel; keeps the last messages in ``sent``."""
+
+    name = "local"
+
+    def __init__(self, keep: int = 1000):
+        self.sent = deque(maxlen=keep)
+        self._lock = threading.Lock()
+
+    def send(self, to: str, *message) -> str:
+        if settings.PROVIDER_LOCAL_LATENCY_SECONDS:
+            time.sleep(settings.PROVIDER_LOCAL_LATENCY_SECONDS)
+        with self._lock:
+            self.sent.append((to, *message))
+            return f"local-{len(self.sent)}"
+
+    def send_many(self, to: List[str], *message) -> str:
+        if settings.PROVIDER_LOCAL_LATENCY_SECONDS:
+            time.sleep(settings.PROVIDER_LOCAL_LATENCY_SECONDS)
+        with self._lock:
+            self.sent.extend((address, *message) for address in to)
+            return f"local-{len(self.sent)}"
+
+    def close(self) -> None:
+        pass
+
+
+_SMS_PROVIDERS = {"twilio": TwilioSmsProvider, "local": LocalProvider}
+_EMAIL_PROVIDERS = {"sendgrid": SendGridEmailProvider, "local": LocalProvider}
+
+
+class Providers:
+    """The app's provider clients, one per channel."""
+
+    def __init__(self):
+        self.sms = None
+        self.email = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            if self.sms is None:
+                self.sms = _SMS_PROVIDERS[settings.SMS_PROVIDER]()
+            if self.email is None:
+                self.email = _EMAIL_PROVIDERS[settings.EMAIL_PROVIDER]()
+
+    def close(self) -> None:
+        with self._lock:
+            for provider in (self.sms, self.email):
+                if provider is not None:
+                    provider.close()
+            self.sms = self.email = None
+
+    def get(self, channel: str):
+        if getattr(self, channel) is None:
+            # Used outside the app lifespan (scripts, shell).
+            self.start()
+        return getattr(self, channel)
+
+
+providers = Providers()
+
+
+def _call(channel: str, *args, batch: bool = False):
+    provider = providers.get(channel)
+    start = time.perf_counter()
     try:
-        message = client.messages.create(
-            body=f"{title}: {content}",
-            from_="YOUR_TWILIO_PHONE_NUMBER",
-            to=f"+{recipient_id}"
-        )
-        return message.sid
+        return provider.send_many(*args) if batch else provider.send(*args)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        PROVIDER_ERRORS.labels(provider=provider.name, channel=channel).inc()
+        raise e if isinstance(e, ProviderError) else ProviderError(str(e)) from e
+    finally:
+        PROVIDER_LATENCY.labels(provider=provider.name, channel=channel).observe(time.perf_counter() - start)
+
+
+def send_sms(recipient_id, title, content):
+    return _call("sms", f"+{recipient_id}", f"{title}: {content}")
+
+
+def _email_address(recipient_id) -> str:
+    return f"user-{recipient_id}@example.com"  # Replace with actual email logic
+
 
 def send_email(recipient_id, title, content):
-    sg = sendgrid.SendGridAPIClient(api_key=settings.SENDGRID_API_KEY)
-    from_email = "your-email@example.com"
-    to_email = f"user-{recipient_id}@example.com"  # Replace with actual email logic
-    
-    mail = Mail(from_email, to_email, subject=title, html_content=content)
-    
-    try:
-        response = sg.client.mail.send.post(request_body=mail.get())
-        return response.status_code
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return _call("email", _email_address(recipient_id), title, content)
+
+
+def send_email_batch(recipient_ids, title, content):
+    """Send the same email to many recipients in one provider call."""
+    return _call("email", [_email_address(r) for r in recipient_ids], title, content, batch=True)
+
+
+def send_in_app_notification(recipient_id, title, content, notification_id=None, created_at=None):
+    """Push an in-app notification to the recipient's open inbox streams.
 
-def send_in_app_notification(recipient_id, title, content):
-    # Implement in-app notification logic here
-    pass
+    The stored notification is the inbox entry; this only makes it show up
+    without the client polling.
+    """
+    inbox_broadcaster.publish("notification", recipient_id, {
+        "id": notification_id, "title": title, "content": content, "created_at": created_at,
+    })
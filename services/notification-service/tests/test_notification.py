@@ -1,13 +1,31 @@
+import asyncio
 import pytest
 import uuid
-from unittest.mock import MagicMock, patch
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
 from fastapi.testclient import TestClient
 from src.main import app
 from src.routes import get_db
 from src.models import Notification, Preference
+from src.dispatch import Dispatcher
+from src.inbox import inbox_broadcaster
+from src.preferences import preference_cache
+from src.utils import LocalProvider, ProviderError, providers, send_email, send_email_batch, send_sms
 
 # --- Fixtures ---
 
+@pytest.fixture(autouse=True)
+def clear_preference_cache():
+    preference_cache.clear()
+    yield
+    preference_cache.clear()
+
+def _load_preferences(*preferences):
+    """Fill the preference cache as the startup load would."""
+    session = MagicMock()
+    session.execute.return_value = list(preferences)
+    preference_cache.rebuild(session)
+
 @pytest.fixture
 def mock_db_session():
     """Returns a mock implementation of the SQLAlchemy Session."""
@@ -30,8 +48,9 @@ def client(mock_db_session):
     
     app.dependency_overrides[get_db] = override_get_db
     
-    # Patch create_all
-    with patch("src.main.Base.metadata.create_all"):
+    # Patch create_all; dispatch workers are exercised directly below.
+    with patch("src.main.Base.metadata.create_all"), patch("src.main.run_preference_cache", AsyncMock()), \
+            patch("src.main.dispatcher.start", AsyncMock()), patch("src.main.dispatcher.stop", AsyncMock()):
         with TestClient(app) as c:
             yield c
             
@@ -47,37 +66,194 @@ def test_create_notification_sms(client, mock_db_session):
         "notification_type": "sms"
     }
     
-    # Mock external senders in SERVICES, not main
-    with patch("src.services.send_sms") as mock_send:
+    # The request only queues the notification; no provider is called inline.
+    with patch("src.dispatch.send_sms") as mock_send, patch("src.services.dispatcher.submit") as mock_submit:
         response = client.post("/api/notifications", json=payload)
         
         assert response.status_code == 200
         assert "notification_id" in response.json()
-        mock_send.assert_called_with(1, "Welcome", "Hello User")
+        mock_send.assert_not_called()
         
-        # Verify call to persistence
-        mock_db_session.add.assert_called()
-        # With commit/refresh logic, the object added might be updated or a new instance.
-        # We can check if add was called. Status check depends on how session handles the object ref.
-        # In mock, the object passed to add is same ref.
         added_notification = mock_db_session.add.call_args[0][0]
-        assert added_notification.status == "sent"
+        assert added_notification.status == "queued"
+        mock_db_session.commit.assert_called_once()
+        mock_submit.assert_called_once_with(added_notification.id, delay=0)
 
-def test_create_notification_failure_handler(client, mock_db_session):
+def test_create_notification_routes_by_cached_preferences(client, mock_db_session):
+    _load_preferences(
+        Preference(id="p1", user_id=1, sms_enabled=False, email_enabled=True, in_app_enabled=True),
+        Preference(id="p2", user_id=2, sms_enabled=False, email_enabled=True, in_app_enabled=False))
+    payload = {"title": "Welcome", "content": "Hello User", "recipient_id": 1, "notification_type": "sms"}
+
+    with patch("src.services.dispatcher.submit"):
+        response = client.post("/api/notifications", json=payload)
+    assert response.json()["notification_type"] == "in-app"
+
+    # Opted out of SMS and the in-app fallback: nothing is stored.
+    mock_db_session.reset_mock()
+    response = client.post("/api/notifications", json={**payload, "recipient_id": 2})
+    assert response.json() == {"notification_id": None, "status": "opted_out"}
+    assert not mock_db_session.method_calls
+
+def test_create_bulk_skips_opted_out_recipients(client, mock_db_session):
+    _load_preferences(
+        Preference(id="p2", user_id=2, sms_enabled=True, email_enabled=False, in_app_enabled=False))
     payload = {
-        "title": "Welcome",
-        "content": "Hello User",
-        "recipient_id": 1,
-        "notification_type": "email"
+        "title": "Hi $name",
+        "content": "Tomatoes are $price/kg",
+        "notification_type": "email",
+        "recipients": [
+            {"recipient_id": 1, "variables": {"name": "Asha", "price": "24"}},
+            {"recipient_id": 2, "variables": {"name": "Ravi"}},
+            {"recipient_id": 3},
+        ],
     }
-    
-    # Mock external sender raising Exception
-    with patch("src.services.send_email", side_effect=Exception("SMTP Error")):
-        response = client.post("/api/notifications", json=payload)
-        
-        assert response.status_code == 200
-        added_notification = mock_db_session.add.call_args[0][0]
-        assert added_notification.status == "failed"
+
+    with patch("src.services.dispatcher.submit_batch") as mock_submit:
+        response = client.post("/api/notifications/bulk", json=payload)
+
+    assert response.status_code == 202
+    body = response.json()
+    assert (body["queued"], body["rerouted"], body["opted_out"]) == (2, 0, 1)
+    mock_db_session.query.assert_not_called()
+    rows = mock_db_session.execute.call_args[0][1]
+    assert [(r["recipient_id"], r["title"], r["content"]) for r in rows] == [
+        (1, "Hi Asha", "Tomatoes are 24/kg"), (3, "Hi $name", "Tomatoes are $price/kg")]
+    assert {r["batch_id"] for r in rows} == {body["batch_id"]}
+    mock_db_session.commit.assert_called_once()
+    mock_submit.assert_called_once_with(body["batch_id"])
+
+def test_dispatch_batch_groups_email_into_one_provider_call():
+    notifications = [
+        Notification(id=f"n{i}", title="Sale", content="20% off", recipient_id=i, notification_type="email",
+                     status="sending", attempts=0)
+        for i in range(1, 4)
+    ]
+    session = MagicMock()
+    session.execute.return_value.scalars.return_value.all.return_value = [n.id for n in notifications]
+    session.query.return_value.filter.return_value.all.return_value = notifications
+
+    with patch("src.dispatch.send_email_batch") as mock_batch, patch("src.dispatch.send_email") as mock_send:
+        Dispatcher(lambda: session).process_batch("b1")
+
+    mock_batch.assert_called_once_with([1, 2, 3], "Sale", "20% off")
+    mock_send.assert_not_called()
+    assert {n.status for n in notifications} == {"sent"}
+    session.commit.assert_called()
+
+def _claimed(notification):
+    """A session whose conditional claim succeeds and which returns ``notification``."""
+    session = MagicMock()
+    session.execute.return_value.rowcount = 1
+    session.get.return_value = notification
+    return session
+
+def test_dispatch_delivers_queued_notification():
+    notification = Notification(
+        id="n1", title="Welcome", content="Hello User", recipient_id=1, notification_type="sms",
+        status="queued", attempts=0, created_at=datetime.utcnow())
+    session = _claimed(notification)
+
+    with patch("src.dispatch.send_sms") as mock_send:
+        assert Dispatcher(lambda: session).process("n1") is None
+
+    mock_send.assert_called_with(1, "Welcome", "Hello User")
+    assert notification.status == "sent"
+    session.close.assert_called_once()
+
+def test_dispatch_drops_notification_after_opt_out():
+    notification = Notification(
+        id="n1", title="Welcome", content="Hello User", recipient_id=1, notification_type="sms",
+        status="queued", attempts=0)
+    _load_preferences(Preference(id="p1", user_id=1, sms_enabled=False, email_enabled=True, in_app_enabled=False))
+    session = _claimed(notification)
+
+    with patch("src.dispatch.send_sms") as mock_send:
+        assert Dispatcher(lambda: session).process("n1") is None
+
+    mock_send.assert_not_called()
+    assert notification.status == "opted_out"
+
+def test_create_notification_waits_for_digest_window(client, mock_db_session):
+    _load_preferences(Preference(id="p1", user_id=1, sms_enabled=True, email_enabled=True, in_app_enabled=True,
+                                 sms_digest_seconds=60))
+    payload = {"title": "New bid", "content": "Okra 30/kg", "recipient_id": 1, "notification_type": "sms"}
+
+    with patch("src.services.dispatcher.submit") as mock_submit:
+        client.post("/api/notifications", json=payload)
+
+    added_notification = mock_db_session.add.call_args[0][0]
+    assert added_notification.next_attempt_at > datetime.utcnow()
+    mock_submit.assert_called_once_with(added_notification.id, delay=60)
+
+def test_dispatch_merges_pending_notifications_into_digest():
+    _load_preferences(Preference(id="p1", user_id=1, sms_enabled=True, email_enabled=True, in_app_enabled=True,
+                                 sms_digest_seconds=60))
+    pending = [
+        Notification(id=f"n{i}", title="New bid", content=f"Okra {20 + i}/kg", recipient_id=1,
+                     notification_type="sms", status="queued", attempts=0,
+                     created_at=datetime(2026, 10, 18, 9, i))
+        for i in range(3)
+    ]
+    session = _claimed(pending[0])
+    session.execute.return_value.scalars.return_value.all.return_value = ["n2", "n0", "n1"]
+    session.query.return_value.filter.return_value.all.return_value = pending[::-1]
+
+    with patch("src.dispatch.send_sms") as mock_send:
+        Dispatcher(lambda: session).process("n0")
+
+    mock_send.assert_called_once_with(
+        1, "3 new notifications", "New bid: Okra 20/kg\nNew bid: Okra 21/kg\nNew bid: Okra 22/kg")
+    assert {n.status for n in pending} == {"sent"}
+
+def test_dispatch_retries_then_dead_letters(monkeypatch):
+    monkeypatch.setattr("src.dispatch.settings.NOTIFICATION_MAX_ATTEMPTS", 2)
+    notification = Notification(
+        id="n1", title="Welcome", content="Hello User", recipient_id=1, notification_type="email",
+        status="queued", attempts=0)
+    dispatcher = Dispatcher(lambda: _claimed(notification))
+
+    with patch("src.dispatch.send_email", side_effect=Exception("SMTP Error")):
+        delay = dispatcher.process("n1")
+        assert delay is not None and delay > 0
+        assert (notification.status, notification.attempts) == ("queued", 1)
+        assert notification.next_attempt_at > datetime.utcnow()
+
+        assert dispatcher.process("n1") is None
+        assert (notification.status, notification.attempts) == ("dead_letter", 2)
+        assert notification.last_error == "SMTP Error"
+
+def test_send_uses_configured_provider(monkeypatch):
+    monkeypatch.setattr(providers, "sms", LocalProvider())
+    monkeypatch.setattr(providers, "email", LocalProvider())
+
+    send_sms(919812345678, "Price alert", "Tomato 24/kg")
+    send_email(7, "Order shipped", "<p>On its way</p>")
+
+    assert providers.sms.sent[-1] == ("+919812345678", "Price alert: Tomato 24/kg")
+    assert providers.email.sent[-1] == ("user-7@example.com", "Order shipped", "<p>On its way</p>")
+
+    send_email_batch([8, 9], "Sale", "<p>20% off</p>")
+    assert list(providers.email.sent)[-2:] == [
+        ("user-8@example.com", "Sale", "<p>20% off</p>"), ("user-9@example.com", "Sale", "<p>20% off</p>")]
+
+def test_provider_failure_raises_provider_error(monkeypatch):
+    failing = MagicMock(side_effect=ConnectionError("connection reset"))
+    monkeypatch.setattr(providers, "sms", MagicMock(send=failing))
+    providers.sms.name = "twilio"
+
+    with pytest.raises(ProviderError, match="connection reset"):
+        send_sms(1, "t", "c")
+
+def test_dispatch_skips_notification_claimed_elsewhere():
+    session = MagicMock()
+    session.execute.return_value.rowcount = 0
+
+    with patch("src.dispatch.send_sms") as mock_send:
+        assert Dispatcher(lambda: session).process("n1") is None
+
+    mock_send.assert_not_called()
+    session.commit.assert_called_once()
 
 def test_get_notification(client, mock_db_session):
     valid_uuid = "123e4567-e89b-12d3-a456-426614174000"
@@ -103,13 +279,18 @@ def test_update_notification_status(client, mock_db_session):
 def test_get_preferences(client, mock_db_session):
     valid_uuid = "123e4567-e89b-12d3-a456-426614174001"
     mock_pref = Preference(id=valid_uuid, user_id=1, sms_enabled=True, email_enabled=False, in_app_enabled=True)
-    mock_db_session.query.return_value.filter.return_value.first.return_value = mock_pref
+    mock_db_session.execute.return_value = [mock_pref]
     
     response = client.get("/api/preferences/1")
     
     assert response.status_code == 200
     assert response.json()["email_enabled"] is False
 
+    # Served from the cache afterwards.
+    mock_db_session.reset_mock()
+    assert client.get("/api/preferences/1").json()["email_enabled"] is False
+    mock_db_session.execute.assert_not_called()
+
 def test_update_preferences_new(client, mock_db_session):
     # Mock user doesn't exist
     mock_db_session.query.return_value.filter.return_value.first.return_value = None
@@ -145,3 +326,90 @@ def test_update_preferences_existing(client, mock_db_session):
     
     assert response.status_code == 200
     assert mock_pref.sms_enabled is False
+    assert preference_cache.lookup(mock_db_session, [1])[1].sms_enabled is False
+
+# --- Tests for the in-app inbox ---
+
+def test_dispatch_pushes_in_app_notification_to_inbox_stream():
+    notification = Notification(
+        id="n1", title="Outbid", content="Someone bid 30/kg", recipient_id=1, notification_type="in-app",
+        status="queued", attempts=0, created_at=datetime.utcnow())
+    session = _claimed(notification)
+
+    async def scenario():
+        subscription = inbox_broadcaster.subscribe(1)
+        try:
+            Dispatcher(lambda: session).process("n1")
+            await asyncio.sleep(0)
+            chunk = await subscription.next(0.1)
+            assert chunk.startswith(b"event: notification\ndata: ") and b'"id": "n1"' in chunk
+        finally:
+            inbox_broadcaster.unsubscribe(subscription)
+
+    asyncio.run(scenario())
+    assert notification.status == "sent"
+
+def test_list_unread_and_mark_read(client, mock_db_session):
+    unread = [
+        Notification(id=str(uuid.uuid4()), title=f"Deal {i}", content="c", recipient_id=1,
+                     notification_type="in-app", status="sent", created_at=datetime.utcnow())
+        for i in range(2)
+    ]
+    mock_db_session.query.return_value.filter.return_value.order_by.return_value.limit.return_value.all.return_value = unread
+
+    response = client.get("/api/inbox/1?limit=10")
+    assert response.status_code == 200
+    assert [item["title"] for item in response.json()] == ["Deal 0", "Deal 1"]
+
+    mock_db_session.execute.return_value.scalars.return_value.all.return_value = [n.id for n in unread]
+    response = client.post("/api/inbox/1/read", json={"notification_ids": [n.id for n in unread]})
+    assert response.json() == {"updated": 2}
+    mock_db_session.commit.assert_called_once()
+
+def test_inbox_stream_drops_slow_consumer_with_single_slot_queue(monkeypatch):
+    monkeypatch.setattr("src.inbox.settings.INBOX_STREAM_QUEUE_SIZE", 1)
+
+    async def scenario():
+        subscription = inbox_broadcaster.subscribe(1)
+        for i in range(2):
+            inbox_broadcaster.publish("notification", 1, {"id": i})
+        await asyncio.sleep(0)
+        assert (await subscription.next(0.1)).startswith(b"event: dropped")
+        assert await subscription.next(0.1) is None
+
+    asyncio.run(scenario())
+
+
+def test_request_queries_and_pool_checkouts_are_recorded(tmp_path):
+    from prometheus_client import REGISTRY
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from src.database import Base, TimedQueuePool, pool_options, settings, track_engine_pool
+
+    # The pool the service would build for Postgres, over a SQLite file.
+    engine = create_engine(
+        f"sqlite:///{tmp_path}/queries.db", **pool_options("postgresql+psycopg://u:p@db/app", TimedQueuePool))
+    assert isinstance(engine.pool, TimedQueuePool) and engine.pool.size() == settings.DB_POOL_SIZE
+    Base.metadata.create_all(engine)
+    track_engine_pool(engine, "sync")
+    sessions = sessionmaker(bind=engine)
+
+    def sqlite_db():
+        db = sessions()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = sqlite_db
+    route = "/api/inbox/{recipient_id}"
+    selects = REGISTRY.get_sample_value("db_queries_total", {"operation": "select", "route": route}) or 0
+    requests = REGISTRY.get_sample_value("db_queries_per_request_count", {"route": route}) or 0
+    checkouts = REGISTRY.get_sample_value("db_pool_checkout_wait_seconds_count", {"engine": "sync"}) or 0
+    try:
+        assert TestClient(app).get("/api/inbox/1").status_code == 200
+    finally:
+        app.dependency_overrides = {}
+    assert REGISTRY.get_sample_value("db_queries_total", {"operation": "select", "route": route}) > selects
+    assert REGISTRY.get_sample_value("db_queries_per_request_count", {"route": route}) == requests + 1
+    assert REGISTRY.get_sample_value("db_pool_checkout_wait_seconds_count", {"engine": "sync"}) > checkouts
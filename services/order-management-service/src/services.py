@@ -1,7 +1,9 @@
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from .models import Order as OrderModel
 from .schemas import OrderCreate, OrderUpdate
+from .pagination import PageParams, paginate
+from .database import AsyncService
 
 class OrderService:
     @staticmethod
@@ -13,8 +15,8 @@ class OrderService:
         return db_order
 
     @staticmethod
-    def get_orders(db: Session) -> List[OrderModel]:
-        return db.query(OrderModel).all()
+    def get_orders(db: Session, page: PageParams) -> Tuple[List[OrderModel], Optional[str]]:
+        return paginate(db.query(OrderModel), OrderModel.order_id, page)
 
     @staticmethod
     def get_order_by_id(db: Session, order_id: int) -> Optional[OrderModel]:
@@ -31,3 +33,5 @@ class OrderService:
     def delete_order(db: Session, order: OrderModel) -> None:
         db.delete(order)
         db.commit()
+
+AsyncOrderService = AsyncService(OrderService)
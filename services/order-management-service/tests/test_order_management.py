@@ -56,13 +56,42 @@ def test_get_orders(client, mock_db_session):
     mock_orders = [
         OrderModel(order_id=1, farmer_id=1, middleman_id=2, product_id=10, quantity=50, status="pending")
     ]
-    mock_db_session.query.return_value.all.return_value = mock_orders
+    mock_db_session.query.return_value.order_by.return_value.limit.return_value.all.return_value = mock_orders
     
     response = client.get("/api/orders")
     
     assert response.status_code == 200
     assert len(response.json()) == 1
     assert response.json()[0]["order_id"] == 1
+    assert "x-next-cursor" not in response.headers
+    # One extra row is fetched to detect whether another page exists
+    mock_db_session.query.return_value.order_by.return_value.limit.assert_called_with(51)
+
+def test_get_orders_next_cursor(client, mock_db_session):
+    mock_orders = [
+        OrderModel(order_id=i, farmer_id=1, middleman_id=2, product_id=10, quantity=5, status="pending")
+        for i in (1, 2, 3)
+    ]
+    mock_query = mock_db_session.query.return_value
+    mock_query.order_by.return_value.limit.return_value.all.return_value = mock_orders
+    
+    response = client.get("/api/orders?limit=2")
+    
+    assert response.status_code == 200
+    assert [o["order_id"] for o in response.json()] == [1, 2]
+    cursor = response.headers["x-next-cursor"]
+    
+    # Following the cursor filters on the key of the last row returned
+    mock_query.filter.return_value.order_by.return_value.limit.return_value.all.return_value = mock_orders[2:]
+    response = client.get(f"/api/orders?limit=2&after={cursor}")
+    
+    assert [o["order_id"] for o in response.json()] == [3]
+    assert "x-next-cursor" not in response.headers
+    assert str(mock_query.filter.call_args[0][0].right.value) == "2"
+
+def test_get_orders_rejects_bad_cursor_and_large_pages(client, mock_db_session):
+    assert client.get("/api/orders?after=not-a-cursor").status_code == 400
+    assert client.get("/api/orders?limit=10000").status_code == 422
 
 def test_get_order_by_id_success(client, mock_db_session):
     mock_order = OrderModel(order_id=1, farmer_id=1, middleman_id=2, product_id=10, quantity=50, status="pending")
@@ -102,3 +131,105 @@ def test_delete_order(client, mock_db_session):
     assert response.status_code == 200
     mock_db_session.delete.assert_called_with(mock_order)
     mock_db_session.commit.assert_called()
+
+def test_async_database_url():
+    from src.database import async_database_url
+
+    assert async_database_url("postgresql://u:p@db:5432/orders") == "postgresql+psycopg://u:p@db:5432/orders"
+    assert async_database_url("postgresql+psycopg://u:p@db/orders") == "postgresql+psycopg://u:p@db/orders"
+    assert async_database_url("sqlite:///./orders.db") == "sqlite+aiosqlite:///./orders.db"
+
+
+def test_pool_options(monkeypatch):
+    from sqlalchemy.pool import NullPool
+    from src.database import TimedQueuePool, pool_options, settings
+
+    assert pool_options("sqlite:///./orders.db", TimedQueuePool) == {}
+    options = pool_options("postgresql+psycopg://u:p@db/orders", TimedQueuePool)
+    assert options["poolclass"] is TimedQueuePool
+    assert options["pool_size"] == settings.DB_POOL_SIZE
+    assert options["pool_pre_ping"] is True
+
+    monkeypatch.setattr(settings, "DB_PGBOUNCER", True)
+    options = pool_options("postgresql+psycopg://u:p@db/orders", TimedQueuePool)
+    assert options == {"poolclass": NullPool, "connect_args": {"prepare_threshold": None}}
+
+
+def test_timed_pool_records_checkout_wait(tmp_path):
+    from prometheus_client import REGISTRY
+    from sqlalchemy import create_engine, text
+    from src.database import TimedQueuePool, settings, track_engine_pool
+
+    engine = create_engine(
+        f"sqlite:///{tmp_path}/pool.db", poolclass=TimedQueuePool, pool_size=2, max_overflow=settings.DB_MAX_OVERFLOW
+    )
+    track_engine_pool(engine, "sync")
+    before = REGISTRY.get_sample_value("db_pool_checkout_wait_seconds_count", {"engine": "sync"}) or 0
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        assert REGISTRY.get_sample_value("db_pool_connections_checked_out", {"engine": "sync"}) == 1
+        assert REGISTRY.get_sample_value("db_pool_saturation_ratio", {"engine": "sync"}) == 1 / (2 + settings.DB_MAX_OVERFLOW)
+    assert REGISTRY.get_sample_value("db_pool_checkout_wait_seconds_count", {"engine": "sync"}) == before + 1
+
+
+def test_query_metrics_flag_n_plus_one(tmp_path, monkeypatch):
+    from fastapi import FastAPI
+    from prometheus_client import REGISTRY
+    from sqlalchemy import create_engine, text
+    from src.query_metrics import QueryMetricsMiddleware, instrument_engine, settings
+
+    engine = create_engine(f"sqlite:///{tmp_path}/queries.db")
+    instrument_engine(engine)
+    probe = FastAPI()
+    probe.add_middleware(QueryMetricsMiddleware)
+
+    @probe.get("/probe/{n}")
+    def run_queries(n: int):
+        with engine.connect() as conn:
+            for _ in range(n):
+                conn.execute(text("SELECT 1"))
+        return {}
+
+    monkeypatch.setattr(settings, "DB_N_PLUS_ONE_THRESHOLD", 2)
+    labels = {"operation": "select", "route": "/probe/{n}"}
+    before = REGISTRY.get_sample_value("db_queries_total", labels) or 0
+    TestClient(probe).get("/probe/2")
+    assert REGISTRY.get_sample_value("db_queries_total", labels) == before + 2
+    assert REGISTRY.get_sample_value("db_n_plus_one_requests_total", {"route": "/probe/{n}"}) is None
+    TestClient(probe).get("/probe/3")
+    assert REGISTRY.get_sample_value("db_n_plus_one_requests_total", {"route": "/probe/{n}"}) == 1
+
+
+def test_request_queries_and_pool_checkouts_are_recorded(tmp_path):
+    from prometheus_client import REGISTRY
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from src.database import Base, TimedQueuePool, pool_options, settings, track_engine_pool
+
+    # The pool the service would build for Postgres, over a SQLite file.
+    engine = create_engine(
+        f"sqlite:///{tmp_path}/queries.db", **pool_options("postgresql+psycopg://u:p@db/app", TimedQueuePool))
+    assert isinstance(engine.pool, TimedQueuePool) and engine.pool.size() == settings.DB_POOL_SIZE
+    Base.metadata.create_all(engine)
+    track_engine_pool(engine, "sync")
+    sessions = sessionmaker(bind=engine)
+
+    def sqlite_db():
+        db = sessions()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = sqlite_db
+    route = "/api/orders"
+    selects = REGISTRY.get_sample_value("db_queries_total", {"operation": "select", "route": route}) or 0
+    requests = REGISTRY.get_sample_value("db_queries_per_request_count", {"route": route}) or 0
+    checkouts = REGISTRY.get_sample_value("db_pool_checkout_wait_seconds_count", {"engine": "sync"}) or 0
+    try:
+        assert TestClient(app).get("/api/orders").status_code == 200
+    finally:
+        app.dependency_overrides = {}
+    assert REGISTRY.get_sample_value("db_queries_total", {"operation": "select", "route": route}) > selects
+    assert REGISTRY.get_sample_value("db_queries_per_request_count", {"route": route}) == requests + 1
+    assert REGISTRY.get_sample_value("db_pool_checkout_wait_seconds_count", {"engine": "sync"}) > checkouts
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Response, status
 from sqlalchemy.orm import Session
 from typing import List
 from .database import get_db, engine, Base
@@ -7,60 +7,65 @@ from .schemas import (
     RefundRequest, RefundResponse, 
     DisputeRequest, DisputeResponse
 )
-from .services import PaymentService
+from .services import AsyncPaymentService
+from .pagination import PageParams, set_next_cursor
+from .query_metrics import QueryMetricsMiddleware
 
 # Tables managed by Alembic
 # Base.metadata.create_all(bind=engine)
 
 app = FastAPI()
+app.add_middleware(QueryMetricsMiddleware)
 
 @app.post("/api/payments", response_model=PaymentResponse, status_code=status.HTTP_201_CREATED)
-def create_payment(payment: PaymentRequest, db: Session = Depends(get_db)):
-    return PaymentService.create_payment(db, payment)
+async def create_payment(payment: PaymentRequest, db: Session = Depends(get_db)):
+    return await AsyncPaymentService.create_payment(db, payment)
 
 @app.get("/api/payments/{payment_id}", response_model=PaymentResponse)
-def get_payment(payment_id: int, db: Session = Depends(get_db)):
-    payment = PaymentService.get_payment(db, payment_id)
+async def get_payment(payment_id: int, db: Session = Depends(get_db)):
+    payment = await AsyncPaymentService.get_payment(db, payment_id)
     if not payment:
         raise HTTPException(status_code=404, detail="Payment not found")
     return payment
 
 @app.patch("/api/payments/{payment_id}", response_model=PaymentResponse)
-def update_payment_status(payment_id: int, status: str, db: Session = Depends(get_db)):
-    payment = PaymentService.get_payment(db, payment_id)
+async def update_payment_status(payment_id: int, status: str, db: Session = Depends(get_db)):
+    payment = await AsyncPaymentService.get_payment(db, payment_id)
     if not payment:
         raise HTTPException(status_code=404, detail="Payment not found")
     
-    return PaymentService.update_payment_status(db, payment, status)
+    return await AsyncPaymentService.update_payment_status(db, payment, status)
 
 @app.get("/api/payments/history/{user_id}", response_model=List[PaymentResponse])
-def get_payment_history(user_id: int, db: Session = Depends(get_db)):
-    return PaymentService.get_user_history(db, user_id)
+async def get_payment_history(user_id: int, response: Response, page: PageParams = Depends(), db: Session = Depends(get_db)):
+    payments, next_cursor = await AsyncPaymentService.get_user_history(db, user_id, page)
+    set_next_cursor(response, next_cursor)
+    return payments
 
 @app.post("/api/refunds", response_model=RefundResponse, status_code=status.HTTP_201_CREATED)
-def create_refund(refund: RefundRequest, db: Session = Depends(get_db)):
-    result = PaymentService.create_refund(db, refund)
+async def create_refund(refund: RefundRequest, db: Session = Depends(get_db)):
+    result = await AsyncPaymentService.create_refund(db, refund)
     if not result:
         raise HTTPException(status_code=404, detail="Payment not found")
     return result
 
 @app.get("/api/refunds/{refund_id}", response_model=RefundResponse)
-def get_refund(refund_id: int, db: Session = Depends(get_db)):
-    refund = PaymentService.get_refund(db, refund_id)
+async def get_refund(refund_id: int, db: Session = Depends(get_db)):
+    refund = await AsyncPaymentService.get_refund(db, refund_id)
     if not refund:
         raise HTTPException(status_code=404, detail="Refund not found")
     return refund
 
 @app.post("/api/disputes", response_model=DisputeResponse, status_code=status.HTTP_201_CREATED)
-def create_dispute(dispute: DisputeRequest, db: Session = Depends(get_db)):
-    result = PaymentService.create_dispute(db, dispute)
+async def create_dispute(dispute: DisputeRequest, db: Session = Depends(get_db)):
+    result = await AsyncPaymentService.create_dispute(db, dispute)
     if not result:
         raise HTTPException(status_code=404, detail="Payment not found")
     return result
 
 @app.get("/api/disputes/{dispute_id}", response_model=DisputeResponse)
-def get_dispute(dispute_id: int, db: Session = Depends(get_db)):
-    dispute = PaymentService.get_dispute(db, dispute_id)
+async def get_dispute(dispute_id: int, db: Session = Depends(get_db)):
+    dispute = await AsyncPaymentService.get_dispute(db, dispute_id)
     if not dispute:
         raise HTTPException(status_code=404, detail="Dispute not found")
     return dispute
@@ -0,0 +1,105 @@
+"""Per-request database query metrics.
+
+SQLAlchemy cursor events count and time every statement, labelled with the
+statement type and the route template of the request that issued it.
+QueryMetricsMiddleware scopes the counting to a single request and flags
+requests that issue more than DB_N_PLUS_ONE_THRESHOLD queries, which is
+usually a relationship being lazy-loaded once per row (N+1).
+"""
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+from config.settings import settings
+from .logging_config import get_logger
+from .metrics import DB_N_PLUS_ONE_REQUESTS, DB_QUERIES_PER_REQUEST, DB_QUERY_COUNT, DB_QUERY_LATENCY
+
+logger = get_logger(__name__)
+
+STATEMENT_TYPES = {"select", "insert", "update", "delete"}
+# Route label for queries issued outside a request (startup, background work).
+NO_ROUTE = "none"
+
+
+class RequestQueries:
+    """Queries issued while serving one HTTP request."""
+
+    __slots__ = ("scope", "count", "statements")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.count = 0
+        self.statements = Counter()
+
+    @property
+    def route(self) -> str:
+        # FastAPI stores the matched route in the scope during routing, so the
+        # template is known by the time any handler touches the database.
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or "unmatched"
+
+
+_request_queries: ContextVar[Optional[RequestQueries]] = ContextVar("request_queries", default=None)
+
+
+def statement_type(statement: str) -> str:
+    keyword = statement.lstrip()[:6].lower()
+    return keyword if keyword in STATEMENT_TYPES else "other"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_start_time"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info.pop("query_start_time", time.perf_counter())
+    operation = statement_type(statement)
+    queries = _request_queries.get()
+    route = queries.route if queries is not None else NO_ROUTE
+    DB_QUERY_COUNT.labels(operation=operation, route=route).inc()
+    DB_QUERY_LATENCY.labels(operation=operation, route=route).observe(elapsed)
+    if queries is not None:
+        queries.count += 1
+        queries.statements[statement] += 1
+
+
+def instrument_engine(engine) -> None:
+    """Attach the query listeners to a sync Engine (``AsyncEngine.sync_engine`` for async)."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class QueryMetricsMiddleware:
+    """ASGI middleware recording the query count of each request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        queries = RequestQueries(scope)
+        token = _request_queries.set(queries)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_queries.reset(token)
+            if queries.count:
+                self._observe(scope, queries)
+
+    @staticmethod
+    def _observe(scope, queries: RequestQueries) -> None:
+        route = queries.route
+        DB_QUERIES_PER_REQUEST.labels(route=route).observe(queries.count)
+        if queries.count > settings.DB_N_PLUS_ONE_THRESHOLD:
+            DB_N_PLUS_ONE_REQUESTS.labels(route=route).inc()
+            statement, repeats = queries.statements.most_common(1)[0]
+            logger.warning(
+                f"Possible N+1: {scope['method']} {route} issued {queries.count} queries "
+                f"(threshold {settings.DB_N_PLUS_ONE_THRESHOLD}); repeated {repeats}x: {statement}"
+            )
@@ -1,8 +1,10 @@
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from datetime import datetime
 from .models import Payment, Refund, Dispute, User
 from .schemas import PaymentRequest, RefundRequest, DisputeRequest
+from .pagination import PageParams, paginate
+from .database import AsyncService
 
 class PaymentService:
     @staticmethod
@@ -33,8 +35,8 @@ class PaymentService:
         return payment
 
     @staticmethod
-    def get_user_history(db: Session, user_id: int) -> List[Payment]:
-        return db.query(Payment).filter(Payment.user_id == user_id).all()
+    def get_user_history(db: Session, user_id: int, page: PageParams) -> Tuple[List[Payment], Optional[str]]:
+        return paginate(db.query(Payment).filter(Payment.user_id == user_id), Payment.id, page)
 
     @staticmethod
     def create_refund(db: Session, refund: RefundRequest) -> Optional[Refund]:
@@ -67,3 +69,5 @@ class PaymentService:
     @staticmethod
     def get_dispute(db: Session, dispute_id: int) -> Optional[Dispute]:
         return db.query(Dispute).filter(Dispute.id == dispute_id).first()
+
+AsyncPaymentService = AsyncService(PaymentService)
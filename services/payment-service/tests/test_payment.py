@@ -65,13 +65,33 @@ def test_get_payment_not_found(client, mock_db_session):
 
 def test_get_payment_history(client, mock_db_session):
     mock_payment = Payment(id=1, user_id=1, amount=100.0, status="completed", created_at=datetime.utcnow())
-    mock_db_session.query.return_value.filter.return_value.all.return_value = [mock_payment]
+    mock_db_session.query.return_value.filter.return_value.order_by.return_value.limit.return_value.all.return_value = [mock_payment]
     
     response = client.get("/api/payments/history/1")
     
     assert response.status_code == 200
     assert len(response.json()) == 1
 
+def test_get_payment_history_next_cursor(client, mock_db_session):
+    payments = [Payment(id=i, user_id=1, amount=10.0, status="completed", created_at=datetime.utcnow()) for i in (1, 2, 3)]
+    user_query = mock_db_session.query.return_value.filter.return_value
+    user_query.order_by.return_value.limit.return_value.all.return_value = payments
+
+    response = client.get("/api/payments/history/1?limit=2")
+
+    assert [p["id"] for p in response.json()] == [1, 2]
+    cursor = response.headers["x-next-cursor"]
+
+    user_query.filter.return_value.order_by.return_value.limit.return_value.all.return_value = payments[2:]
+    response = client.get(f"/api/payments/history/1?limit=2&after={cursor}")
+
+    assert [p["id"] for p in response.json()] == [3]
+    assert "x-next-cursor" not in response.headers
+    assert str(user_query.filter.call_args[0][0].right.value) == "2"
+
+def test_get_payment_history_rejects_large_pages(client):
+    assert client.get("/api/payments/history/1?limit=201").status_code == 422
+
 # --- Tests for Refunds ---
 
 def test_create_refund_success(client, mock_db_session):
@@ -105,3 +125,37 @@ def test_create_dispute_success(client, mock_db_session):
     assert response.status_code == 201
     assert response.json()["status"] == "open"
 
+
+def test_request_queries_and_pool_checkouts_are_recorded(tmp_path):
+    from prometheus_client import REGISTRY
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from src.database import Base, TimedQueuePool, pool_options, settings, track_engine_pool
+
+    # The pool the service would build for Postgres, over a SQLite file.
+    engine = create_engine(
+        f"sqlite:///{tmp_path}/queries.db", **pool_options("postgresql+psycopg://u:p@db/app", TimedQueuePool))
+    assert isinstance(engine.pool, TimedQueuePool) and engine.pool.size() == settings.DB_POOL_SIZE
+    Base.metadata.create_all(engine)
+    track_engine_pool(engine, "sync")
+    sessions = sessionmaker(bind=engine)
+
+    def sqlite_db():
+        db = sessions()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = sqlite_db
+    route = "/api/payments/history/{user_id}"
+    selects = REGISTRY.get_sample_value("db_queries_total", {"operation": "select", "route": route}) or 0
+    requests = REGISTRY.get_sample_value("db_queries_per_request_count", {"route": route}) or 0
+    checkouts = REGISTRY.get_sample_value("db_pool_checkout_wait_seconds_count", {"engine": "sync"}) or 0
+    try:
+        assert TestClient(app).get("/api/payments/history/1").status_code == 200
+    finally:
+        app.dependency_overrides = {}
+    assert REGISTRY.get_sample_value("db_queries_total", {"operation": "select", "route": route}) > selects
+    assert REGISTRY.get_sample_value("db_queries_per_request_count", {"route": route}) == requests + 1
+    assert REGISTRY.get_sample_value("db_pool_checkout_wait_seconds_count", {"engine": "sync"}) > checkouts
@@ -7,5 +7,35 @@ load_dotenv()
 class Settings(BaseSettings):
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./pricing.db")
     DEBUG: bool = False
+    ASYNC_DB_ENABLED: bool = False
+    # Connection pool sizing, per process. Keep replicas * (size + overflow)
+    # below Postgres max_connections, or set DB_PGBOUNCER behind PgBouncer.
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_PGBOUNCER: bool = False
+    # Requests issuing more queries than this are logged as possible N+1 loops.
+    DB_N_PLUS_ONE_THRESHOLD: int = 10
+    # Per-replica cache in front of the latest_prices table.
+    LATEST_PRICE_CACHE_TTL_SECONDS: float = 5.0
+    LATEST_PRICE_CACHE_MAX_ENTRIES: int = 50000
+    # OHLC rollups: how often the job runs (0 disables it) and how long a
+    # bucket must have been closed before it is rolled up.
+    PRICE_ROLLUP_INTERVAL_SECONDS: float = 300.0
+    PRICE_ROLLUP_DELAY_SECONDS: float = 3600.0
+    # The bid order book is reloaded this often to pick up bids changed
+    # through other replicas (0 loads it once at startup).
+    BID_BOOK_REFRESH_SECONDS: float = 30.0
+    # Price/bid SSE streams: events a subscriber may fall behind before it
+    # is disconnected, open streams per replica, idle keep-alive interval.
+    STREAM_QUEUE_SIZE: int = 100
+    STREAM_MAX_SUBSCRIBERS: int = 5000
+    STREAM_KEEPALIVE_SECONDS: float = 15.0
+    # Bulk price uploads: rows validated and inserted per transaction, and
+    # rejected lines listed in the response.
+    PRICE_INGEST_CHUNK_SIZE: int = 5000
+    PRICE_INGEST_MAX_ERRORS: int = 100
 
 settings = Settings()
\ No newline at end of file
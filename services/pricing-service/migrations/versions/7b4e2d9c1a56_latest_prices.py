@@ -0,0 +1,38 @@
+"""latest_prices
+
+Revision ID: 7b4e2d9c1a56
+Revises: 9d625f8f8477
+Create Date: 2026-10-18 15:20:44.118342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b4e2d9c1a56'
+down_revision = '9d625f8f8477'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('latest_prices',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('price_id', sa.Integer(), nullable=True),
+    sa.Column('price', sa.Float(), nullable=True),
+    sa.Column('timestamp', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('product_id')
+    )
+    # Backfill: the newest price per product (ties broken by id).
+    op.execute(
+        "INSERT INTO latest_prices (product_id, price_id, price, timestamp) "
+        "SELECT p.product_id, p.id, p.price, p.timestamp FROM prices p "
+        "WHERE p.product_id IS NOT NULL AND NOT EXISTS ("
+        " SELECT 1 FROM prices q WHERE q.product_id = p.product_id"
+        " AND (q.timestamp > p.timestamp OR (q.timestamp = p.timestamp AND q.id > p.id)))"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('latest_prices')
@@ -0,0 +1,41 @@
+"""price_rollups
+
+Revision ID: c41f8a2e6d13
+Revises: 7b4e2d9c1a56
+Create Date: 2026-10-18 16:02:17.540913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41f8a2e6d13'
+down_revision = '7b4e2d9c1a56'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Filled by the rollup job in src/history.py, starting from the oldest price.
+    op.create_table('price_rollups',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('interval', sa.String(length=3), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('open', sa.Float(), nullable=True),
+    sa.Column('high', sa.Float(), nullable=True),
+    sa.Column('low', sa.Float(), nullable=True),
+    sa.Column('close', sa.Float(), nullable=True),
+    sa.Column('count', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('product_id', 'interval', 'bucket_start')
+    )
+    op.create_table('price_rollup_watermarks',
+    sa.Column('interval', sa.String(length=3), nullable=False),
+    sa.Column('rolled_up_to', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('interval')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('price_rollup_watermarks')
+    op.drop_table('price_rollups')
@@ -0,0 +1,100 @@
+"""In-process caches for pricing reads.
+
+latest_price_cache fronts the latest_prices table for GET /api/prices/latest.
+PricingService drops a product's entry whenever it changes one of its prices;
+other replicas pick the change up once LATEST_PRICE_CACHE_TTL_SECONDS pass.
+Readers fill it through VersionedTTLCache.fill(), so a read that loaded a
+row before a change was committed cannot cache it after the drop.
+"""
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from config.settings import settings
+
+
+class TTLCache:
+    """Thread-safe LRU mapping whose entries expire ``ttl`` seconds after being set."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class VersionedTTLCache(TTLCache):
+    """TTLCache whose pop() turns away fills from readers that started before it.
+
+    A reader takes version(key) before loading the value and passes it to
+    fill(), which stores the value only if the key was not popped since.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        super().__init__(maxsize, ttl)
+        # Versions come from one counter, so a version that was evicted and
+        # recreated never matches one handed out before.
+        self._versions = TTLCache(maxsize, ttl)
+        self._counter = itertools.count(1)
+        self._version_lock = threading.Lock()
+
+    def version(self, key) -> int:
+        with self._version_lock:
+            version = self._versions.get(key)
+            if version is None:
+                version = next(self._counter)
+                self._versions.set(key, version)
+            return version
+
+    def fill(self, key, value, version: int) -> bool:
+        with self._version_lock:
+            if self._versions.get(key) != version:
+                return False
+            self.set(key, value)
+            return True
+
+    def pop(self, key) -> None:
+        with self._version_lock:
+            super().pop(key)
+            self._versions.set(key, next(self._counter))
+
+    def clear(self) -> None:
+        with self._version_lock:
+            super().clear()
+            self._versions.clear()
+
+
+latest_price_cache = VersionedTTLCache(settings.LATEST_PRICE_CACHE_MAX_ENTRIES, settings.LATEST_PRICE_CACHE_TTL_SECONDS)
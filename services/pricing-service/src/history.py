@@ -0,0 +1,250 @@
+"""Downsampled price history: open/high/low/close/count per time bucket.
+
+Buckets are computed in SQL with ``date_trunc`` on Postgres. Other
+databases (SQLite in development and tests) return only the
+(product_id, timestamp, price) columns, and NumPy does the bucketing.
+
+Buckets that closed more than PRICE_ROLLUP_DELAY_SECONDS ago are copied
+into ``price_rollups`` by a background job. Each interval has a watermark
+in ``price_rollup_watermarks``. Reads take buckets before the watermark
+from the rollup table and compute only the rest. A price written, moved or
+deleted behind the watermark refreshes its bucket in the same transaction.
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import select, delete, func, literal_column, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from config.settings import settings
+from .database import SessionLocal
+from .logging_config import get_logger
+from .models import Price, PriceRollup, PriceRollupWatermark
+from .schemas import PriceBucket
+
+logger = get_logger(__name__)
+
+INTERVALS = {"1m": timedelta(minutes=1), "1h": timedelta(hours=1), "1d": timedelta(days=1)}
+_PG_UNITS = {"1m": "minute", "1h": "hour", "1d": "day"}
+_NUMPY_UNITS = {"1m": "datetime64[m]", "1h": "datetime64[h]", "1d": "datetime64[D]"}
+# How much history one rollup transaction covers, so catching up on a large
+# table happens in bounded steps.
+_ROLLUP_STEPS = {"1m": timedelta(hours=6), "1h": timedelta(days=7), "1d": timedelta(days=180)}
+
+
+def naive_utc(ts: datetime) -> datetime:
+    """``ts`` as naive UTC, the form timestamps are stored in."""
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def truncate(ts: datetime, interval: str) -> datetime:
+    """Start of the ``interval`` bucket containing ``ts``."""
+    ts = naive_utc(ts).replace(second=0, microsecond=0)
+    if interval in ("1h", "1d"):
+        ts = ts.replace(minute=0)
+    if interval == "1d":
+        ts = ts.replace(hour=0)
+    return ts
+
+
+def _pg_buckets(db: Session, interval: str, start, end, product_id) -> List[dict]:
+    # Inlined rather than bound so GROUP BY matches the selected expression.
+    unit = literal_column(f"'{_PG_UNITS[interval]}'")
+    bucket = func.date_trunc(unit, Price.timestamp).label("bucket_start")
+    first = postgresql.array_agg(postgresql.aggregate_order_by(Price.price, Price.timestamp.asc(), Price.id.asc()))
+    last = postgresql.array_agg(postgresql.aggregate_order_by(Price.price, Price.timestamp.desc(), Price.id.desc()))
+    query = select(
+        Price.product_id, bucket,
+        first[1].label("open"), func.max(Price.price).label("high"),
+        func.min(Price.price).label("low"), last[1].label("close"), func.count().label("count"),
+    ).where(*_range(start, end, product_id)).group_by(Price.product_id, bucket).order_by(Price.product_id, bucket)
+    return [dict(row._mapping) for row in db.execute(query)]
+
+
+def _numpy_buckets(db: Session, interval: str, start, end, product_id) -> List[dict]:
+    rows = db.execute(
+        select(Price.product_id, Price.timestamp, Price.price)
+        .where(*_range(start, end, product_id))
+        .order_by(Price.product_id, Price.timestamp, Price.id)
+    ).all()
+    if not rows:
+        return []
+    product_ids, timestamps, prices = zip(*rows)
+    product_ids = np.asarray(product_ids, dtype=np.int64)
+    buckets = np.asarray(timestamps, dtype="datetime64[us]").astype(_NUMPY_UNITS[interval])
+    prices = np.asarray(prices, dtype=np.float64)
+    # Rows are sorted by (product, timestamp), so each group is a contiguous run.
+    changed = (product_ids[1:] != product_ids[:-1]) | (buckets[1:] != buckets[:-1])
+    starts = np.concatenate(([0], np.flatnonzero(changed) + 1))
+    ends = np.append(starts[1:], len(prices))
+    highs = np.maximum.reduceat(prices, starts)
+    lows = np.minimum.reduceat(prices, starts)
+    bucket_starts = buckets[starts].astype("datetime64[us]").tolist()
+    return [
+        {
+            "product_id": int(product_ids[s]), "bucket_start": bucket_starts[i],
+            "open": float(prices[s]), "high": float(highs[i]), "low": float(lows[i]),
+            "close": float(prices[e - 1]), "count": int(e - s),
+        }
+        for i, (s, e) in enumerate(zip(starts, ends))
+    ]
+
+
+def _range(start, end, product_id) -> list:
+    clauses = [Price.timestamp.is_not(None), Price.product_id.is_not(None)]
+    if product_id is not None:
+        clauses.append(Price.product_id == product_id)
+    if start is not None:
+        clauses.append(Price.timestamp >= start)
+    if end is not None:
+        clauses.append(Price.timestamp < end)
+    return clauses
+
+
+def compute_buckets(db: Session, interval: str, start: Optional[datetime], end: Optional[datetime],
+                    product_id: Optional[int] = None) -> List[dict]:
+    """Buckets over prices in [start, end), for one product or all of them."""
+    compute = _pg_buckets if db.get_bind().dialect.name == "postgresql" else _numpy_buckets
+    return compute(db, interval, start, end, product_id)
+
+
+def _watermarks(db: Session) -> Dict[str, datetime]:
+    return {row.interval: row.rolled_up_to for row in db.query(PriceRollupWatermark)}
+
+
+def get_buckets(db: Session, product_id: int, interval: str,
+                start_date: Optional[datetime], end_date: Optional[datetime]) -> List[PriceBucket]:
+    """Buckets for one product, widened to whole buckets at both ends."""
+    start = truncate(start_date, interval) if start_date else None
+    end = truncate(end_date, interval) + INTERVALS[interval] if end_date else None
+    watermark = _watermarks(db).get(interval)
+
+    buckets = []
+    if watermark is not None and (start is None or start < watermark):
+        rolled_up_to = min(watermark, end) if end is not None else watermark
+        query = db.query(PriceRollup).filter(
+            PriceRollup.product_id == product_id, PriceRollup.interval == interval,
+            PriceRollup.bucket_start < rolled_up_to,
+        )
+        if start is not None:
+            query = query.filter(PriceRollup.bucket_start >= start)
+        buckets = [PriceBucket.model_validate(row) for row in query.order_by(PriceRollup.bucket_start)]
+        start = rolled_up_to
+    if end is None or start is None or start < end:
+        buckets += [PriceBucket(**row) for row in compute_buckets(db, interval, start, end, product_id)]
+    return buckets
+
+
+def _insert(db: Session):
+    """Dialect-specific INSERT, which is the one that supports ON CONFLICT."""
+    return postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+
+
+def _store(db: Session, interval: str, rows: List[dict]) -> None:
+    if not rows:
+        return
+    stmt = _insert(db)(PriceRollup).values([{**row, "interval": interval} for row in rows])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[PriceRollup.product_id, PriceRollup.interval, PriceRollup.bucket_start],
+        set_={column: stmt.excluded[column] for column in ("open", "high", "low", "close", "count")},
+    ))
+
+
+def refresh_rollups(db: Session, product_id: int, timestamps: Iterable[Optional[datetime]]) -> None:
+    """Recompute rolled-up buckets of ``product_id`` that contain any of ``timestamps``.
+
+    Called before commit by every write to ``prices``. Nothing is read
+    beyond the watermark query unless a timestamp is behind a watermark.
+    """
+    timestamps = [ts for ts in timestamps if ts is not None]
+    if not timestamps:
+        return
+    for interval, watermark in _watermarks(db).items():
+        for bucket_start in {truncate(ts, interval) for ts in timestamps}:
+            if bucket_start >= watermark:
+                continue
+            bucket_end = bucket_start + INTERVALS[interval]
+            db.execute(delete(PriceRollup).where(
+                PriceRollup.product_id == product_id, PriceRollup.interval == interval,
+                PriceRollup.bucket_start == bucket_start,
+            ))
+            _store(db, interval, compute_buckets(db, interval, bucket_start, bucket_end, product_id))
+
+
+def rewind_rollups(db: Session, earliest: datetime) -> None:
+    """Move watermarks back to the bucket of ``earliest`` after a bulk load of older prices.
+
+    Reads compute buckets after the moved watermark from ``prices``, and the
+    job rolls them up again. That is cheaper than refreshing each affected
+    bucket one at a time.
+    """
+    for interval, watermark in _watermarks(db).items():
+        bucket_start = truncate(earliest, interval)
+        if bucket_start < watermark:
+            db.query(PriceRollupWatermark).filter(PriceRollupWatermark.interval == interval).update(
+                {"rolled_up_to": bucket_start}, synchronize_session=False
+            )
+
+
+def roll_up(db: Session, now: Optional[datetime] = None) -> int:
+    """Roll up every bucket that closed at least PRICE_ROLLUP_DELAY_SECONDS ago.
+
+    Commits after each step. Returns the number of buckets written.
+    """
+    now = now or datetime.utcnow()
+    written = 0
+    for interval in INTERVALS:
+        cutoff = truncate(now - timedelta(seconds=settings.PRICE_ROLLUP_DELAY_SECONDS), interval)
+        watermark = _watermarks(db).get(interval)
+        recorded = watermark is not None
+        if watermark is None:
+            oldest = db.query(func.min(Price.timestamp)).scalar()
+            watermark = truncate(oldest, interval) if oldest is not None else cutoff
+        while watermark < cutoff:
+            step_end = min(watermark + _ROLLUP_STEPS[interval], cutoff)
+            rows = compute_buckets(db, interval, watermark, step_end)
+            _store(db, interval, rows)
+            # Advance only from the watermark this step started at: a bulk
+            # load may have moved it back meanwhile (rewind_rollups).
+            if recorded:
+                advance = update(PriceRollupWatermark).where(
+                    PriceRollupWatermark.interval == interval, PriceRollupWatermark.rolled_up_to == watermark,
+                ).values(rolled_up_to=step_end)
+            else:
+                advance = _insert(db)(PriceRollupWatermark).values(
+                    interval=interval, rolled_up_to=step_end
+                ).on_conflict_do_nothing()
+            if db.execute(advance).rowcount == 0:
+                db.rollback()
+                break
+            db.commit()
+            recorded = True
+            written += len(rows)
+            watermark = step_end
+    return written
+
+
+def _roll_up_once() -> int:
+    db = SessionLocal()
+    try:
+        return roll_up(db)
+    finally:
+        db.close()
+
+
+async def run_rollups() -> None:
+    """Background loop started from the lifespan; cancelled at shutdown."""
+    while True:
+        await asyncio.sleep(settings.PRICE_ROLLUP_INTERVAL_SECONDS)
+        try:
+            written = await run_in_threadpool(_roll_up_once)
+            if written:
+                logger.info(f"Rolled up {written} price buckets")
+        except Exception as e:
+            logger.error(f"Price rollup failed: {e}")
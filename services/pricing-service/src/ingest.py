@@ -0,0 +1,106 @@
+"""Streaming parser for bulk price uploads (NDJSON or CSV).
+
+The request body is read as it arrives and split into lines. Rows are
+validated against PriceCreate and yielded in chunks of
+PRICE_INGEST_CHUNK_SIZE, so memory stays flat however large the file is.
+Invalid rows are recorded by line number and skipped; they do not stop
+the upload.
+"""
+import csv
+import json
+from typing import AsyncIterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from .schemas import PriceCreate, PriceIngestError
+
+NDJSON_TYPES = ("application/x-ndjson", "application/jsonl", "application/json-seq", "application/ndjson")
+CSV_TYPES = ("text/csv", "application/csv")
+CSV_FIELDS = ("product_id", "price", "timestamp")
+
+
+class UnsupportedUploadType(Exception):
+    """Raised for a Content-Type other than NDJSON or CSV."""
+
+
+class BadCsvHeader(Exception):
+    """Raised when the CSV header lacks a required column; no row could be read."""
+
+
+async def _lines(body: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, str]]:
+    """Yield (line_number, text) for each non-blank line of the body."""
+    buffer = b""
+    number = 0
+    async for data in body:
+        buffer += data
+        *complete, buffer = buffer.split(b"\n")
+        for line in complete:
+            number += 1
+            text = line.decode("utf-8-sig" if number == 1 else "utf-8", errors="replace").strip()
+            if text:
+                yield number, text
+    if buffer.strip():
+        yield number + 1, buffer.decode("utf-8-sig" if number == 0 else "utf-8", errors="replace").strip()
+
+
+def _describe(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, e['loc'])) or 'row'}: {e['msg']}" for e in error.errors())
+
+
+class PriceRowParser:
+    """Turns uploaded lines into PriceCreate rows, collecting per-line errors."""
+
+    def __init__(self, content_type: str, max_errors: int):
+        media_type = content_type.split(";")[0].strip().lower()
+        if media_type in NDJSON_TYPES:
+            self._parse = self._parse_json
+        elif media_type in CSV_TYPES:
+            self._parse = self._parse_csv
+        else:
+            raise UnsupportedUploadType(media_type)
+        self._header: Optional[List[str]] = None
+        self.max_errors = max_errors
+        self.errors: List[PriceIngestError] = []
+        self.error_count = 0
+        self.rows = 0
+
+    def _parse_json(self, text: str):
+        return json.loads(text)
+
+    def _parse_csv(self, text: str):
+        values = next(csv.reader([text]))
+        if self._header is None:
+            header = [v.strip().lower() for v in values]
+            missing = set(CSV_FIELDS) - set(header)
+            if missing:
+                raise BadCsvHeader(f"CSV header is missing {', '.join(sorted(missing))}")
+            self._header = header
+            return None
+        if len(values) != len(self._header):
+            raise ValueError(f"expected {len(self._header)} columns, got {len(values)}")
+        return dict(zip(self._header, values))
+
+    def _reject(self, line: int, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append(PriceIngestError(line=line, error=message))
+
+    async def chunks(self, body: AsyncIterator[bytes], size: int) -> AsyncIterator[List[PriceCreate]]:
+        chunk: List[PriceCreate] = []
+        async for line, text in _lines(body):
+            try:
+                data = self._parse(text)
+                if data is None:
+                    continue
+                self.rows += 1
+                chunk.append(PriceCreate.model_validate(data))
+            except ValidationError as e:
+                self._reject(line, _describe(e))
+            except (ValueError, csv.Error) as e:
+                self.rows += 1
+                self._reject(line, str(e))
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
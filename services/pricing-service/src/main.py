@@ -1,13 +1,18 @@
+import asyncio
 import uuid
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from .database import engine, Base
+from .history import run_rollups
+from .order_book import run_order_book
 from .routes import router
 from .health import router as health_router
 from .logging_config import setup_logging, get_logger
 from .metrics import setup_metrics
+from .query_metrics import QueryMetricsMiddleware
 from .rate_limit import get_limiter, setup_rate_limiting
+from config.settings import settings
 
 # Setup structured logging
 logger = setup_logging("pricing-service")
@@ -20,7 +25,12 @@ async def lifespan(app: FastAPI):
     logger.info("Starting pricing-service")
     # Tables are now managed by Alembic migrations via Helm Job
     # Base.metadata.create_all(bind=engine)
+    rollups = asyncio.create_task(run_rollups()) if settings.PRICE_ROLLUP_INTERVAL_SECONDS > 0 else None
+    bid_book = asyncio.create_task(run_order_book())
     yield
+    bid_book.cancel()
+    if rollups is not None:
+        rollups.cancel()
     logger.info("Shutting down pricing-service")
 
 app = FastAPI(
@@ -44,6 +54,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(QueryMetricsMiddleware)
 
 
 @app.middleware("http")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, Float, String, ForeignKey, DateTime, PrimaryKeyConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -17,3 +17,30 @@ class Bid(Base):
     bid_amount = Column(Float)
     bidder_id = Column(Integer)
     timestamp = Column(DateTime, default=datetime.utcnow)
+
+class LatestPrice(Base):
+    """Most recent Price per product, maintained by PricingService in the same transaction."""
+    __tablename__ = "latest_prices"
+    product_id = Column(Integer, primary_key=True)
+    price_id = Column(Integer)
+    price = Column(Float)
+    timestamp = Column(DateTime)
+
+class PriceRollup(Base):
+    """Precomputed OHLC bucket of a product's prices; see src/history.py."""
+    __tablename__ = "price_rollups"
+    product_id = Column(Integer, nullable=False)
+    interval = Column(String(3), nullable=False)
+    bucket_start = Column(DateTime, nullable=False)
+    open = Column(Float)
+    high = Column(Float)
+    low = Column(Float)
+    close = Column(Float)
+    count = Column(Integer)
+    __table_args__ = (PrimaryKeyConstraint("product_id", "interval", "bucket_start"),)
+
+class PriceRollupWatermark(Base):
+    """Buckets of ``interval`` starting before ``rolled_up_to`` are in price_rollups."""
+    __tablename__ = "price_rollup_watermarks"
+    interval = Column(String(3), primary_key=True)
+    rolled_up_to = Column(DateTime, nullable=False)
@@ -0,0 +1,149 @@
+"""In-memory bid order book.
+
+Each product's open bids are kept in a list sorted by price-time priority
+(highest amount first, then earliest bid, then lowest id). Top-of-book and
+best-bid queries are answered from memory without touching the database.
+
+The book is loaded from the bids table at startup and updated by
+PricingService after each committed bid change. Bids changed through other
+replicas show up at the next periodic rebuild (BID_BOOK_REFRESH_SECONDS).
+"""
+import asyncio
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from config.settings import settings
+from .database import SessionLocal, run_db
+from .logging_config import get_logger
+from .metrics import BID_BOOK_BIDS
+from .models import Bid
+from .schemas import BidResponse
+
+logger = get_logger(__name__)
+
+_Key = Tuple[float, datetime, int]
+
+
+def _key(bid: BidResponse) -> _Key:
+    return (-bid.bid_amount, bid.timestamp.replace(tzinfo=None), bid.id)
+
+
+class OrderBook:
+    """Open bids per product in price-time priority; safe to share across threads."""
+
+    def __init__(self):
+        self._books: Dict[int, List[_Key]] = {}
+        self._bids: Dict[int, BidResponse] = {}
+        self._lock = threading.Lock()
+        self._rebuilding = threading.Lock()
+        # Changes made while a rebuild is reading the table, replayed onto
+        # the rebuilt book so they are not lost.
+        self._pending: Optional[list] = None
+        self.loaded = False
+
+    def _put(self, books, bids, bid: BidResponse) -> None:
+        self._drop(books, bids, bid.id)
+        bids[bid.id] = bid
+        insort(books.setdefault(bid.product_id, []), _key(bid))
+
+    @staticmethod
+    def _drop(books, bids, bid_id: int) -> None:
+        bid = bids.pop(bid_id, None)
+        if bid is None:
+            return
+        book = books[bid.product_id]
+        del book[bisect_left(book, _key(bid))]
+        if not book:
+            del books[bid.product_id]
+
+    def put(self, bid) -> None:
+        """Add a bid, or replace it if its id is already in the book."""
+        bid = BidResponse.model_validate(bid)
+        with self._lock:
+            self._put(self._books, self._bids, bid)
+            if self._pending is not None:
+                self._pending.append((self._put, bid))
+            BID_BOOK_BIDS.set(len(self._bids))
+
+    def remove(self, bid_id: int) -> None:
+        with self._lock:
+            self._drop(self._books, self._bids, bid_id)
+            if self._pending is not None:
+                self._pending.append((self._drop, bid_id))
+            BID_BOOK_BIDS.set(len(self._bids))
+
+    def top(self, product_id: int, n: int) -> List[BidResponse]:
+        with self._lock:
+            return [self._bids[key[2]] for key in self._books.get(product_id, ())[:n]]
+
+    def best(self, product_ids: Iterable[int]) -> List[BidResponse]:
+        """Highest bid of each product that has one, in the order asked."""
+        with self._lock:
+            return [
+                self._bids[self._books[product_id][0][2]]
+                for product_id in dict.fromkeys(product_ids) if product_id in self._books
+            ]
+
+    def rebuild(self, db: Session) -> None:
+        with self._rebuilding:
+            with self._lock:
+                self._pending = []
+            try:
+                rows = db.execute(
+                    select(Bid.id, Bid.product_id, Bid.bid_amount, Bid.bidder_id, Bid.timestamp)
+                    .where(Bid.product_id.is_not(None), Bid.bid_amount.is_not(None), Bid.timestamp.is_not(None))
+                ).all()
+                bids = {row.id: BidResponse.model_validate(row) for row in rows}
+                books: Dict[int, List[_Key]] = {}
+                for bid in bids.values():
+                    books.setdefault(bid.product_id, []).append(_key(bid))
+                for book in books.values():
+                    book.sort()
+                with self._lock:
+                    for apply, arg in self._pending:
+                        apply(books, bids, arg)
+                    self._books, self._bids = books, bids
+                    self.loaded = True
+                    BID_BOOK_BIDS.set(len(bids))
+            finally:
+                with self._lock:
+                    self._pending = None
+
+    async def ensure_loaded(self, db) -> None:
+        """Load the book through a request's session if startup could not."""
+        if not self.loaded:
+            await run_db(db, self.rebuild)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._books, self._bids = {}, {}
+            self.loaded = False
+
+
+order_book = OrderBook()
+
+
+def _rebuild_once() -> None:
+    db = SessionLocal()
+    try:
+        order_book.rebuild(db)
+    finally:
+        db.close()
+
+
+async def run_order_book() -> None:
+    """Load the book, then rebuild it periodically; cancelled at shutdown."""
+    while True:
+        try:
+            await run_in_threadpool(_rebuild_once)
+        except Exception as e:
+            logger.error(f"Bid order book rebuild failed: {e}")
+        if settings.BID_BOOK_REFRESH_SECONDS <= 0:
+            return
+        await asyncio.sleep(settings.BID_BOOK_REFRESH_SECONDS)
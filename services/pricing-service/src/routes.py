@@ -1,69 +1,146 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Literal, Optional, Union
 from datetime import datetime
 
 from .database import get_db
 from .schemas import (
     PriceCreate, PriceUpdate, PriceResponse,
-    BidCreate, BidUpdate, BidResponse
+    BidCreate, BidUpdate, BidResponse,
+    LatestPriceResponse, MAX_PRODUCT_IDS, PriceBucket, PriceIngestResult
 )
-from .services import PricingService
+from .services import AsyncPricingService
+from .order_book import order_book
+from .streaming import TooManySubscribers, broadcaster, event_stream
+from .ingest import BadCsvHeader, PriceRowParser, UnsupportedUploadType
+from .metrics import PRICE_INGEST_ROWS
+from config.settings import settings
 
 router = APIRouter()
 
 @router.post("/api/prices", status_code=status.HTTP_201_CREATED, response_model=PriceResponse)
-def create_price(price: PriceCreate, db: Session = Depends(get_db)):
-    return PricingService.create_price(db, price)
+async def create_price(price: PriceCreate, db: Session = Depends(get_db)):
+    return await AsyncPricingService.create_price(db, price)
+
+@router.post("/api/prices:bulk", response_model=PriceIngestResult)
+async def ingest_prices(request: Request, db: Session = Depends(get_db)):
+    """Load an NDJSON or CSV (header: product_id,price,timestamp) upload of prices.
+
+    The body is streamed and inserted in chunks, each in its own transaction.
+    Invalid lines are skipped and reported.
+    """
+    try:
+        parser = PriceRowParser(request.headers.get("content-type", ""), settings.PRICE_INGEST_MAX_ERRORS)
+    except UnsupportedUploadType:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="Send application/x-ndjson or text/csv")
+    inserted = 0
+    try:
+        async for chunk in parser.chunks(request.stream(), settings.PRICE_INGEST_CHUNK_SIZE):
+            inserted += await AsyncPricingService.ingest_prices(db, chunk)
+    except BadCsvHeader as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    finally:
+        PRICE_INGEST_ROWS.labels(result="inserted").inc(inserted)
+        PRICE_INGEST_ROWS.labels(result="rejected").inc(parser.error_count)
+    return PriceIngestResult(rows=parser.rows, inserted=inserted, rejected=parser.error_count, errors=parser.errors)
+
+def _product_ids(product_ids: str) -> List[int]:
+    try:
+        ids = [int(part) for part in product_ids.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="product_ids must be comma-separated integers")
+    if not ids or len(ids) > MAX_PRODUCT_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"Between 1 and {MAX_PRODUCT_IDS} product_ids required")
+    return ids
+
+# /latest and /stream are declared before /api/prices/{price_id} so they are not taken for an id.
+@router.get("/api/prices/latest", response_model=List[LatestPriceResponse])
+async def get_latest_prices(product_ids: str = Query(..., description="Comma-separated product ids"), db: Session = Depends(get_db)):
+    return await AsyncPricingService.get_latest_prices(db, _product_ids(product_ids))
+
+@router.get("/api/prices/stream")
+async def stream_prices(product_ids: str = Query(..., description="Comma-separated product ids")):
+    """Server-Sent Events: price, price_deleted, bid and bid_cancelled events for the given products."""
+    ids = _product_ids(product_ids)
+    try:
+        subscription = broadcaster.subscribe(ids)
+    except TooManySubscribers:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Too many open streams")
+    return StreamingResponse(
+        event_stream(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @router.get("/api/prices/{price_id}", response_model=PriceResponse)
-def get_price(price_id: int, db: Session = Depends(get_db)):
-    price = PricingService.get_price(db, price_id)
+async def get_price(price_id: int, db: Session = Depends(get_db)):
+    price = await AsyncPricingService.get_price(db, price_id)
     if not price:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Price not found")
     return price
 
 @router.patch("/api/prices/{price_id}", response_model=PriceResponse)
-def update_price(price_id: int, price_update: PriceUpdate, db: Session = Depends(get_db)):
-    price = PricingService.get_price(db, price_id)
+async def update_price(price_id: int, price_update: PriceUpdate, db: Session = Depends(get_db)):
+    price = await AsyncPricingService.get_price(db, price_id)
     if not price:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Price not found")
-    return PricingService.update_price(db, price, price_update)
+    return await AsyncPricingService.update_price(db, price, price_update)
 
 @router.delete("/api/prices/{price_id}")
-def delete_price(price_id: int, db: Session = Depends(get_db)):
-    price = PricingService.get_price(db, price_id)
+async def delete_price(price_id: int, db: Session = Depends(get_db)):
+    price = await AsyncPricingService.get_price(db, price_id)
     if not price:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Price not found")
-    PricingService.delete_price(db, price)
+    await AsyncPricingService.delete_price(db, price)
     return {"message": f"Price {price_id} deleted successfully"}
 
-@router.get("/api/prices/history/{product_id}", response_model=List[PriceResponse])
-def get_price_history(product_id: int, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None, db: Session = Depends(get_db)):
-    return PricingService.get_price_history(db, product_id, start_date, end_date)
+@router.get("/api/prices/history/{product_id}", response_model=Union[List[PriceResponse], List[PriceBucket]])
+async def get_price_history(
+    product_id: int,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    interval: Optional[Literal["1m", "1h", "1d"]] = Query(None, description="Return OHLC buckets instead of every price"),
+    db: Session = Depends(get_db),
+):
+    return await AsyncPricingService.get_price_history(db, product_id, start_date, end_date, interval)
 
 @router.post("/api/bids", status_code=status.HTTP_201_CREATED, response_model=BidResponse)
-def create_bid(bid: BidCreate, db: Session = Depends(get_db)):
-    return PricingService.create_bid(db, bid)
+async def create_bid(bid: BidCreate, db: Session = Depends(get_db)):
+    return await AsyncPricingService.create_bid(db, bid)
+
+@router.get("/api/bids/top/{product_id}", response_model=List[BidResponse])
+async def get_top_bids(product_id: int, n: int = Query(10, ge=1, le=100), db: Session = Depends(get_db)):
+    await order_book.ensure_loaded(db)
+    return order_book.top(product_id, n)
+
+# Declared before /api/bids/{bid_id} so "best" is not taken for an id.
+@router.get("/api/bids/best", response_model=List[BidResponse])
+async def get_best_bids(product_ids: str = Query(..., description="Comma-separated product ids"), db: Session = Depends(get_db)):
+    ids = _product_ids(product_ids)
+    await order_book.ensure_loaded(db)
+    return order_book.best(ids)
 
 @router.get("/api/bids/{bid_id}", response_model=BidResponse)
-def get_bid(bid_id: int, db: Session = Depends(get_db)):
-    bid = PricingService.get_bid(db, bid_id)
+async def get_bid(bid_id: int, db: Session = Depends(get_db)):
+    bid = await AsyncPricingService.get_bid(db, bid_id)
     if not bid:
         raise HTTPException(status_code=404, detail="Bid not found")
     return bid
 
 @router.patch("/api/bids/{bid_id}", response_model=BidResponse)
-def update_bid(bid_id: int, bid_update: BidUpdate, db: Session = Depends(get_db)):
-    bid = PricingService.get_bid(db, bid_id)
+async def update_bid(bid_id: int, bid_update: BidUpdate, db: Session = Depends(get_db)):
+    bid = await AsyncPricingService.get_bid(db, bid_id)
     if not bid:
         raise HTTPException(status_code=404, detail="Bid not found")
-    return PricingService.update_bid(db, bid, bid_update)
+    return await AsyncPricingService.update_bid(db, bid, bid_update)
 
 @router.delete("/api/bids/{bid_id}")
-def cancel_bid(bid_id: int, db: Session = Depends(get_db)):
-    bid = PricingService.get_bid(db, bid_id)
+async def cancel_bid(bid_id: int, db: Session = Depends(get_db)):
+    bid = await AsyncPricingService.get_bid(db, bid_id)
     if not bid:
         raise HTTPException(status_code=404, detail="Bid not found")
-    PricingService.delete_bid(db, bid)
+    await AsyncPricingService.delete_bid(db, bid)
     return {"message": "Bid cancelled successfully"}
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, ConfigDict
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 class PriceCreate(BaseModel):
     product_id: int
@@ -15,6 +15,16 @@ class PriceResponse(PriceCreate):
     id: int
     model_config = ConfigDict(from_attributes=True)
 
+class PriceBucket(BaseModel):
+    """Prices of one interval bucket, as returned by history with ``interval=``."""
+    bucket_start: datetime
+    open: float
+    high: float
+    low: float
+    close: float
+    count: int
+    model_config = ConfigDict(from_attributes=True)
+
 class BidCreate(BaseModel):
     product_id: int
     bid_amount: float
@@ -27,3 +37,23 @@ class BidResponse(BidCreate):
     id: int
     timestamp: datetime
     model_config = ConfigDict(from_attributes=True)
+
+MAX_PRODUCT_IDS = 200
+
+class LatestPriceResponse(BaseModel):
+    product_id: int
+    price_id: int
+    price: float
+    timestamp: datetime
+    model_config = ConfigDict(from_attributes=True)
+
+class PriceIngestError(BaseModel):
+    line: int
+    error: str
+
+class PriceIngestResult(BaseModel):
+    """Outcome of a bulk upload; ``errors`` lists at most PRICE_INGEST_MAX_ERRORS lines."""
+    rows: int
+    inserted: int
+    rejected: int
+    errors: List[PriceIngestError]
@@ -1,8 +1,75 @@
+from sqlalchemy import and_, func, insert, or_, select
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Union
 from datetime import datetime
-from .models import Price, Bid
-from .schemas import PriceCreate, PriceUpdate, BidCreate, BidUpdate
+import time
+from .models import Price, Bid, LatestPrice
+from .schemas import (
+    PriceCreate, PriceUpdate, PriceResponse, BidCreate, BidUpdate, BidResponse, LatestPriceResponse, PriceBucket
+)
+from .database import AsyncService
+from .cache import latest_price_cache
+from .history import _insert, get_buckets, naive_utc, refresh_rollups, rewind_rollups
+from .order_book import order_book
+from .streaming import broadcaster
+from .metrics import LATEST_PRICE_CACHE_REQUESTS, PRICE_INGEST_CHUNK_DURATION
+
+
+_LATEST_COLUMNS = ["product_id", "price_id", "price", "timestamp"]
+
+
+def _newest(*criteria):
+    """SELECT the newest of the prices matching ``criteria`` for each product, as latest_prices rows."""
+    ranked = select(
+        Price.product_id, Price.id, Price.price, Price.timestamp,
+        func.row_number().over(
+            partition_by=Price.product_id, order_by=(Price.timestamp.desc(), Price.id.desc())
+        ).label("rank"),
+    ).where(Price.product_id.is_not(None), Price.timestamp.is_not(None), *criteria).subquery()
+    return select(ranked.c.product_id, ranked.c.id, ranked.c.price, ranked.c.timestamp).where(ranked.c.rank == 1)
+
+
+def _upsert_latest(db: Session, stmt) -> None:
+    """Run a latest_prices INSERT, replacing existing rows only with newer prices."""
+    newer = or_(
+        LatestPrice.timestamp < stmt.excluded.timestamp,
+        and_(LatestPrice.timestamp == stmt.excluded.timestamp, LatestPrice.price_id <= stmt.excluded.price_id),
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[LatestPrice.product_id],
+        set_={"price_id": stmt.excluded.price_id, "price": stmt.excluded.price, "timestamp": stmt.excluded.timestamp},
+        where=newer,
+    ))
+
+
+def _record_latest(db: Session, price: Price) -> None:
+    """Make ``price`` the product's latest price unless a newer one is recorded."""
+    _upsert_latest(db, _insert(db)(LatestPrice).values(
+        product_id=price.product_id, price_id=price.id, price=price.price, timestamp=price.timestamp
+    ))
+
+
+def _rebuild_latest(db: Session, product_id: int) -> None:
+    """Recompute a product's latest price after one of its prices changed or went away."""
+    db.query(LatestPrice).filter(LatestPrice.product_id == product_id).delete(synchronize_session=False)
+    db.execute(insert(LatestPrice).from_select(_LATEST_COLUMNS, _newest(Price.product_id == product_id)))
+
+
+def _copy_prices(db: Session, rows: List[tuple]) -> bool:
+    """Load rows with COPY when the session runs on sync psycopg; False otherwise."""
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    import psycopg
+
+    driver = db.connection().connection.driver_connection
+    if not isinstance(driver, psycopg.Connection):
+        return False
+    with driver.cursor() as cursor:
+        with cursor.copy("COPY prices (product_id, price, timestamp) FROM STDIN") as copy:
+            for row in rows:
+                copy.write_row(row)
+    return True
+
 
 class PricingService:
     @staticmethod
@@ -13,10 +80,45 @@ class PricingService:
             timestamp=price.timestamp
         )
         db.add(new_price)
+        db.flush()
+        _record_latest(db, new_price)
+        refresh_rollups(db, new_price.product_id, [new_price.timestamp])
         db.commit()
+        latest_price_cache.pop(new_price.product_id)
         db.refresh(new_price)
+        broadcaster.publish("price", new_price.product_id, PriceResponse.model_validate(new_price))
         return new_price
 
+    @staticmethod
+    def ingest_prices(db: Session, prices: List[PriceCreate]) -> int:
+        """Insert one chunk of a bulk upload in a single transaction; returns rows inserted.
+
+        Uses COPY on Postgres and one executemany INSERT elsewhere. After the
+        commit, each subscribed product's newest row is published as a price
+        event.
+        """
+        start = time.perf_counter()
+        rows = [(p.product_id, p.price, naive_utc(p.timestamp)) for p in prices]
+        # Ids only grow, so the new rows are the ones above the current maximum.
+        after_id = db.query(func.max(Price.id)).scalar() or 0
+        if not _copy_prices(db, rows):
+            # Core table insert: an executemany without ORM bookkeeping.
+            db.execute(insert(Price.__table__), [{"product_id": r[0], "price": r[1], "timestamp": r[2]} for r in rows])
+        _upsert_latest(db, _insert(db)(LatestPrice).from_select(_LATEST_COLUMNS, _newest(Price.id > after_id)))
+        rewind_rollups(db, min(row[2] for row in rows))
+        product_ids = {row[0] for row in rows}
+        # Stream each watched product's newest row of the chunk, like create_price.
+        watched = broadcaster.subscribed(product_ids)
+        published = db.execute(_newest(Price.id > after_id, Price.product_id.in_(watched))).all() if watched else []
+        db.commit()
+        for product_id in product_ids:
+            latest_price_cache.pop(product_id)
+        for row in published:
+            broadcaster.publish("price", row.product_id, PriceResponse(
+                id=row.id, product_id=row.product_id, price=row.price, timestamp=row.timestamp))
+        PRICE_INGEST_CHUNK_DURATION.observe(time.perf_counter() - start)
+        return len(rows)
+
     @staticmethod
     def get_price(db: Session, price_id: int) -> Optional[Price]:
         return db.query(Price).filter(Price.id == price_id).first()
@@ -24,19 +126,55 @@ class PricingService:
     @staticmethod
     def update_price(db: Session, price: Price, update: PriceUpdate) -> Price:
         update_data = update.model_dump(exclude_unset=True)
+        old_timestamp = price.timestamp
         for key, value in update_data.items():
             setattr(price, key, value)
+        db.flush()
+        _rebuild_latest(db, price.product_id)
+        refresh_rollups(db, price.product_id, [old_timestamp, price.timestamp])
         db.commit()
+        latest_price_cache.pop(price.product_id)
         db.refresh(price)
+        broadcaster.publish("price", price.product_id, PriceResponse.model_validate(price))
         return price
 
     @staticmethod
     def delete_price(db: Session, price: Price) -> None:
+        price_id, product_id, timestamp = price.id, price.product_id, price.timestamp
         db.delete(price)
+        db.flush()
+        _rebuild_latest(db, product_id)
+        refresh_rollups(db, product_id, [timestamp])
         db.commit()
+        latest_price_cache.pop(product_id)
+        broadcaster.publish("price_deleted", product_id, {"id": price_id, "product_id": product_id})
 
     @staticmethod
-    def get_price_history(db: Session, product_id: int, start_date: Optional[datetime], end_date: Optional[datetime]) -> List[Price]:
+    def get_latest_prices(db: Session, product_ids: List[int]) -> List[LatestPriceResponse]:
+        """Current price of each product that has one, in the order asked."""
+        found = {}
+        for product_id in product_ids:
+            latest = latest_price_cache.get(product_id)
+            if latest is not None:
+                found[product_id] = latest
+        LATEST_PRICE_CACHE_REQUESTS.labels(result="hit").inc(len(found))
+        missing = set(product_ids) - found.keys()
+        if missing:
+            LATEST_PRICE_CACHE_REQUESTS.labels(result="miss").inc(len(missing))
+            # Taken before the query: a price committed while it runs drops
+            # the version, and the row loaded here is then not cached.
+            versions = {product_id: latest_price_cache.version(product_id) for product_id in missing}
+            for row in db.query(LatestPrice).filter(LatestPrice.product_id.in_(missing)):
+                latest = LatestPriceResponse.model_validate(row)
+                latest_price_cache.fill(row.product_id, latest, versions[row.product_id])
+                found[row.product_id] = latest
+        return [found[product_id] for product_id in dict.fromkeys(product_ids) if product_id in found]
+
+    @staticmethod
+    def get_price_history(db: Session, product_id: int, start_date: Optional[datetime], end_date: Optional[datetime],
+                          interval: Optional[str] = None) -> Union[List[Price], List[PriceBucket]]:
+        if interval is not None:
+            return get_buckets(db, product_id, interval, start_date, end_date)
         query = db.query(Price).filter(Price.product_id == product_id)
         if start_date:
             query = query.filter(Price.timestamp >= start_date)
@@ -55,6 +193,8 @@ class PricingService:
         db.add(new_bid)
         db.commit()
         db.refresh(new_bid)
+        order_book.put(new_bid)
+        broadcaster.publish("bid", new_bid.product_id, BidResponse.model_validate(new_bid))
         return new_bid
 
     @staticmethod
@@ -66,9 +206,16 @@ class PricingService:
         bid.bid_amount = update.bid_amount
         db.commit()
         db.refresh(bid)
+        order_book.put(bid)
+        broadcaster.publish("bid", bid.product_id, BidResponse.model_validate(bid))
         return bid
 
     @staticmethod
     def delete_bid(db: Session, bid: Bid) -> None:
+        bid_id, product_id = bid.id, bid.product_id
         db.delete(bid)
         db.commit()
+        order_book.remove(bid_id)
+        broadcaster.publish("bid_cancelled", product_id, {"id": bid_id, "product_id": product_id})
+
+AsyncPricingService = AsyncService(PricingService)
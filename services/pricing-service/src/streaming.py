@@ -0,0 +1,139 @@
+"""Server-Sent Events push of price and bid changes.
+
+PricingService publishes an event after each committed price or bid change.
+The broadcaster fans it out to the subscribers of that product id. Each
+subscriber has a bounded queue. One that falls STREAM_QUEUE_SIZE events
+behind is sent a ``dropped`` event and disconnected, so a slow client
+cannot hold memory or delay the others. It can reconnect and re-read
+current state from /api/prices/latest and /api/bids/top.
+
+Events are serialized once per publish and the same bytes go to every
+subscriber. Publishing may happen on a worker thread (sync routes) or on
+the event loop (async routes); delivery always goes through the
+subscriber's loop.
+"""
+import asyncio
+import json
+import threading
+from typing import Dict, Iterable, Optional, Set
+
+from fastapi.encoders import jsonable_encoder
+
+from config.settings import settings
+from .metrics import STREAM_DROPPED, STREAM_EVENTS, STREAM_SUBSCRIBERS
+
+_CLOSED = None
+_DROPPED = b'event: dropped\ndata: {"reason": "slow consumer"}\n\n'
+KEEPALIVE = b": keep-alive\n\n"
+
+
+class TooManySubscribers(Exception):
+    """Raised when STREAM_MAX_SUBSCRIBERS streams are already open."""
+
+
+class Subscription:
+    def __init__(self, product_ids: Iterable[int], maxsize: int):
+        self.product_ids = frozenset(product_ids)
+        self.maxsize = maxsize
+        # One slot beyond maxsize is kept for the close marker.
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize + 1)
+        self.loop = asyncio.get_running_loop()
+        self.closed = False
+
+    def offer(self, chunk: bytes) -> bool:
+        """Queue ``chunk``; return False if the subscriber is too far behind."""
+        if self.closed:
+            return True
+        if self.queue.qsize() >= self.maxsize:
+            return False
+        self.queue.put_nowait(chunk)
+        return True
+
+    def close(self, chunk: Optional[bytes] = None) -> None:
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        if chunk is not None:
+            self.queue.put_nowait(chunk)
+        self.queue.put_nowait(_CLOSED)
+
+    async def next(self, timeout: float) -> Optional[bytes]:
+        """Next event, KEEPALIVE after ``timeout`` idle seconds, or None once closed."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return KEEPALIVE
+
+
+class Broadcaster:
+    def __init__(self):
+        self._by_product: Dict[int, Set[Subscription]] = {}
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def subscribe(self, product_ids: Iterable[int]) -> Subscription:
+        """Open a subscription; must be called on the event loop that will read it."""
+        subscription = Subscription(product_ids, max(settings.STREAM_QUEUE_SIZE, 1))
+        with self._lock:
+            if self._count >= settings.STREAM_MAX_SUBSCRIBERS:
+                raise TooManySubscribers()
+            for product_id in subscription.product_ids:
+                self._by_product.setdefault(product_id, set()).add(subscription)
+            self._count += 1
+            STREAM_SUBSCRIBERS.set(self._count)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            removed = False
+            for product_id in subscription.product_ids:
+                subscribers = self._by_product.get(product_id)
+                if subscribers is not None and subscription in subscribers:
+                    subscribers.discard(subscription)
+                    removed = True
+                    if not subscribers:
+                        del self._by_product[product_id]
+            if removed:
+                self._count -= 1
+                STREAM_SUBSCRIBERS.set(self._count)
+
+    def subscribed(self, product_ids: Iterable[int]) -> Set[int]:
+        """The ones of ``product_ids`` that have at least one subscriber."""
+        with self._lock:
+            return {product_id for product_id in product_ids if product_id in self._by_product}
+
+    def publish(self, event: str, product_id: int, payload) -> None:
+        """Send ``payload`` as an SSE ``event`` to the product's subscribers."""
+        with self._lock:
+            subscribers = list(self._by_product.get(product_id, ()))
+        if not subscribers:
+            return
+        STREAM_EVENTS.labels(event=event).inc()
+        chunk = f"event: {event}\ndata: {json.dumps(jsonable_encoder(payload))}\n\n".encode()
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(self._deliver, subscription, chunk)
+            except RuntimeError:
+                # The subscriber's loop is gone (shutdown).
+                self.unsubscribe(subscription)
+
+    def _deliver(self, subscription: Subscription, chunk: bytes) -> None:
+        if not subscription.offer(chunk):
+            STREAM_DROPPED.inc()
+            self.unsubscribe(subscription)
+            subscription.close(_DROPPED)
+
+
+broadcaster = Broadcaster()
+
+
+async def event_stream(subscription: Subscription):
+    """SSE body for a subscription; unsubscribes when the client goes away."""
+    try:
+        while True:
+            chunk = await subscription.next(settings.STREAM_KEEPALIVE_SECONDS)
+            if chunk is _CLOSED:
+                return
+            yield chunk
+    finally:
+        broadcaster.unsubscribe(subscription)
@@ -1,13 +1,27 @@
+import asyncio
 import pytest
 from unittest.mock import MagicMock
 from fastapi.testclient import TestClient
 from datetime import datetime
 from src.main import app
 from src.routes import get_db
-from src.models import Price, Bid
+from src.models import Price, Bid, LatestPrice
+from src.cache import latest_price_cache
+from src.order_book import order_book
+from src.streaming import KEEPALIVE, broadcaster
+from src.services import PricingService
+from src.schemas import PriceCreate
 
 # --- Fixtures ---
 
+@pytest.fixture(autouse=True)
+def clear_latest_price_cache():
+    latest_price_cache.clear()
+    order_book.clear()
+    yield
+    latest_price_cache.clear()
+    order_book.clear()
+
 @pytest.fixture
 def mock_db_session():
     """Returns a mock implementation of the SQLAlchemy Session."""
@@ -33,8 +47,8 @@ def client(mock_db_session):
     app.dependency_overrides[get_db] = override_get_db
     
     # Patch create_all
-    from unittest.mock import patch
-    with patch("src.main.Base.metadata.create_all"):
+    from unittest.mock import AsyncMock, patch
+    with patch("src.main.Base.metadata.create_all"), patch("src.main.run_order_book", AsyncMock()):
         with TestClient(app) as c:
             yield c
             
@@ -82,6 +96,102 @@ def test_get_price_history(client, mock_db_session):
     assert response.status_code == 200
     assert len(response.json()) == 1
 
+def test_get_price_history_buckets(client, mock_db_session):
+    mock_db_session.execute.return_value.all.return_value = [
+        (1, datetime(2026, 3, 1, 10, 0, 5), 5.0),
+        (1, datetime(2026, 3, 1, 10, 40), 7.0),
+        (1, datetime(2026, 3, 1, 10, 59), 3.0),
+        (1, datetime(2026, 3, 1, 11, 30), 9.0),
+    ]
+
+    response = client.get("/api/prices/history/1?interval=1h")
+
+    assert response.status_code == 200
+    assert response.json() == [
+        {"bucket_start": "2026-03-01T10:00:00", "open": 5.0, "high": 7.0, "low": 3.0, "close": 3.0, "count": 3},
+        {"bucket_start": "2026-03-01T11:00:00", "open": 9.0, "high": 9.0, "low": 9.0, "close": 9.0, "count": 1},
+    ]
+    assert client.get("/api/prices/history/1?interval=5m").status_code == 422
+
+def test_get_latest_prices(client, mock_db_session):
+    now = datetime.utcnow()
+    rows = [
+        LatestPrice(product_id=2, price_id=7, price=20.0, timestamp=now),
+        LatestPrice(product_id=1, price_id=3, price=10.0, timestamp=now),
+    ]
+    mock_db_session.query.return_value.filter.return_value = rows
+
+    response = client.get("/api/prices/latest?product_ids=1,2,3")
+
+    assert response.status_code == 200
+    # Request order; products without a price are left out.
+    assert [p["product_id"] for p in response.json()] == [1, 2]
+    assert response.json()[0]["price_id"] == 3
+
+    # Second read is served from the cache.
+    mock_db_session.query.reset_mock()
+    response = client.get("/api/prices/latest?product_ids=2,1")
+    assert [p["price"] for p in response.json()] == [20.0, 10.0]
+    mock_db_session.query.assert_not_called()
+
+def test_get_latest_prices_does_not_cache_row_read_before_a_write(client, mock_db_session):
+    stale = LatestPrice(product_id=1, price_id=3, price=10.0, timestamp=datetime.utcnow())
+
+    def rows_then_write():
+        # A price for product 1 commits while the read is loading rows.
+        latest_price_cache.pop(1)
+        yield stale
+
+    mock_db_session.query.return_value.filter.side_effect = lambda *args: rows_then_write()
+
+    assert client.get("/api/prices/latest?product_ids=1").json()[0]["price"] == 10.0
+    assert latest_price_cache.get(1) is None
+
+def test_get_latest_prices_rejects_bad_ids(client):
+    assert client.get("/api/prices/latest?product_ids=1,x").status_code == 400
+    ids = ",".join(str(i) for i in range(201))
+    assert client.get(f"/api/prices/latest?product_ids={ids}").status_code == 400
+
+def test_create_price_invalidates_latest(client, mock_db_session):
+    latest_price_cache.set(1, "stale")
+    payload = {"product_id": 1, "price": 100.0, "timestamp": datetime.utcnow().isoformat()}
+
+    assert client.post("/api/prices", json=payload).status_code == 201
+    assert latest_price_cache.get(1) is None
+
+def test_bulk_ingest_csv_reports_bad_lines(client, mock_db_session):
+    mock_db_session.query.return_value.scalar.return_value = 0
+    body = (
+        "product_id,price,timestamp\n"
+        "1,10.5,2026-03-01T10:00:00\n"
+        "x,11,2026-03-01T10:00:00\n"
+        "\n"
+        "2,12\n"
+        "2,13,2026-03-01T11:00:00"
+    )
+
+    response = client.post("/api/prices:bulk", content=body, headers={"Content-Type": "text/csv"})
+
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["rows"], result["inserted"], result["rejected"]) == (4, 2, 2)
+    assert [e["line"] for e in result["errors"]] == [3, 5]
+    inserted = mock_db_session.execute.call_args_list[0][0][1]
+    assert [row["product_id"] for row in inserted] == [1, 2]
+    mock_db_session.commit.assert_called_once()
+
+def test_bulk_ingest_ndjson_and_bad_requests(client, mock_db_session):
+    mock_db_session.query.return_value.scalar.return_value = 0
+    body = '{"product_id": 1, "price": 5, "timestamp": "2026-03-01T10:00:00Z"}\nnot json\n'
+
+    response = client.post("/api/prices:bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert response.json()["inserted"] == 1
+    assert response.json()["errors"][0]["line"] == 2
+
+    csv_without_price = client.post("/api/prices:bulk", content="product_id,timestamp\n", headers={"Content-Type": "text/csv"})
+    assert csv_without_price.status_code == 400
+    assert client.post("/api/prices:bulk", content="[]", headers={"Content-Type": "application/json"}).status_code == 415
+
 # --- Tests for Bids ---
 
 def test_create_bid(client, mock_db_session):
@@ -125,3 +235,133 @@ def test_cancel_bid(client, mock_db_session):
     
     assert response.status_code == 200
     mock_db_session.delete.assert_called_with(mock_bid)
+
+def test_top_bids_from_order_book(client, mock_db_session):
+    now = datetime.utcnow()
+    mock_db_session.execute.return_value.all.return_value = [
+        Bid(id=1, product_id=1, bid_amount=90.0, bidder_id=2, timestamp=now),
+        Bid(id=2, product_id=1, bid_amount=95.0, bidder_id=3, timestamp=now),
+        Bid(id=3, product_id=1, bid_amount=95.0, bidder_id=4, timestamp=now),
+        Bid(id=4, product_id=2, bid_amount=50.0, bidder_id=2, timestamp=now),
+    ]
+
+    response = client.get("/api/bids/top/1?n=2")
+
+    assert response.status_code == 200
+    # Highest amount first; equal amounts keep arrival order.
+    assert [b["id"] for b in response.json()] == [2, 3]
+    assert [b["id"] for b in client.get("/api/bids/best?product_ids=2,1,9").json()] == [4, 2]
+
+    # Later reads come from memory and follow bid changes.
+    mock_db_session.execute.reset_mock()
+    lookup = mock_db_session.query.return_value.filter.return_value.first
+    lookup.return_value = Bid(id=1, product_id=1, bid_amount=90.0, bidder_id=2, timestamp=now)
+    client.patch("/api/bids/1", json={"bid_amount": 99.0})
+    lookup.return_value = Bid(id=3, product_id=1, bid_amount=95.0, bidder_id=4, timestamp=now)
+    client.delete("/api/bids/3")
+    assert [b["id"] for b in client.get("/api/bids/top/1").json()] == [1, 2]
+    mock_db_session.execute.assert_not_called()
+
+# --- Tests for streaming ---
+
+def test_stream_receives_only_subscribed_products(mock_db_session):
+    async def scenario():
+        subscription = broadcaster.subscribe([1])
+        try:
+            for product_id in (2, 1):
+                PricingService.create_price(
+                    mock_db_session, PriceCreate(product_id=product_id, price=10.0, timestamp=datetime.utcnow()))
+            await asyncio.sleep(0)
+            chunk = await subscription.next(0.1)
+            assert chunk.startswith(b"event: price\ndata: ") and b'"product_id": 1' in chunk
+            assert await subscription.next(0.01) == KEEPALIVE
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    asyncio.run(scenario())
+
+def test_stream_receives_bulk_ingested_price(mock_db_session):
+    mock_db_session.query.return_value.scalar.return_value = 0
+    newest = MagicMock(id=7, product_id=1, price=12.0, timestamp=datetime(2026, 3, 1, 11))
+    mock_db_session.execute.return_value.all.return_value = [newest]
+
+    async def scenario():
+        subscription = broadcaster.subscribe([1])
+        try:
+            PricingService.ingest_prices(mock_db_session, [
+                PriceCreate(product_id=1, price=p, timestamp=datetime(2026, 3, 1, h)) for p, h in ((10.0, 10), (12.0, 11))
+            ] + [PriceCreate(product_id=2, price=5.0, timestamp=datetime(2026, 3, 1, 10))])
+            await asyncio.sleep(0)
+            chunk = await subscription.next(0.1)
+            assert chunk.startswith(b"event: price\ndata: ")
+            assert b'"id": 7' in chunk and b'"price": 12.0' in chunk
+            assert await subscription.next(0.01) == KEEPALIVE
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    asyncio.run(scenario())
+
+def test_stream_drops_slow_consumer(monkeypatch):
+    monkeypatch.setattr("src.streaming.settings.STREAM_QUEUE_SIZE", 2)
+
+    async def scenario():
+        subscription = broadcaster.subscribe([1])
+        for i in range(3):
+            broadcaster.publish("bid", 1, {"id": i})
+        await asyncio.sleep(0)
+        assert (await subscription.next(0.1)).startswith(b"event: dropped")
+        assert await subscription.next(0.1) is None
+        # Unsubscribed: later events are not delivered.
+        broadcaster.publish("bid", 1, {"id": 4})
+        await asyncio.sleep(0)
+        assert subscription.queue.empty()
+
+    asyncio.run(scenario())
+
+def test_stream_drops_slow_consumer_with_single_slot_queue(monkeypatch):
+    monkeypatch.setattr("src.streaming.settings.STREAM_QUEUE_SIZE", 1)
+
+    async def scenario():
+        subscription = broadcaster.subscribe([1])
+        for i in range(2):
+            broadcaster.publish("bid", 1, {"id": i})
+        await asyncio.sleep(0)
+        assert (await subscription.next(0.1)).startswith(b"event: dropped")
+        assert await subscription.next(0.1) is None
+
+    asyncio.run(scenario())
+
+
+def test_request_queries_and_pool_checkouts_are_recorded(tmp_path):
+    from prometheus_client import REGISTRY
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from src.database import Base, TimedQueuePool, pool_options, settings, track_engine_pool
+
+    # The pool the service would build for Postgres, over a SQLite file.
+    engine = create_engine(
+        f"sqlite:///{tmp_path}/queries.db", **pool_options("postgresql+psycopg://u:p@db/app", TimedQueuePool))
+    assert isinstance(engine.pool, TimedQueuePool) and engine.pool.size() == settings.DB_POOL_SIZE
+    Base.metadata.create_all(engine)
+    track_engine_pool(engine, "sync")
+    sessions = sessionmaker(bind=engine)
+
+    def sqlite_db():
+        db = sessions()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = sqlite_db
+    route = "/api/prices/{price_id}"
+    selects = REGISTRY.get_sample_value("db_queries_total", {"operation": "select", "route": route}) or 0
+    requests = REGISTRY.get_sample_value("db_queries_per_request_count", {"route": route}) or 0
+    checkouts = REGISTRY.get_sample_value("db_pool_checkout_wait_seconds_count", {"engine": "sync"}) or 0
+    try:
+        assert TestClient(app).get("/api/prices/1").status_code == 404
+    finally:
+        app.dependency_overrides = {}
+    assert REGISTRY.get_sample_value("db_queries_total", {"operation": "select", "route": route}) > selects
+    assert REGISTRY.get_sample_value("db_queries_per_request_count", {"route": route}) == requests + 1
+    assert REGISTRY.get_sample_value("db_pool_checkout_wait_seconds_count", {"engine": "sync"}) > checkouts
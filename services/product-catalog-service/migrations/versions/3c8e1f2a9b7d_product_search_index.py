@@ -0,0 +1,41 @@
+"""product_search_index
+
+Revision ID: 3c8e1f2a9b7d
+Revises: 56560460b428
+Create Date: 2026-10-18 10:12:41.318204
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3c8e1f2a9b7d'
+down_revision = '56560460b428'
+branch_labels = None
+depends_on = None
+
+
+# Expressions must stay identical to src/search.py:_pg_vector so the planner
+# can match them against the query.
+NAME_VECTOR = "to_tsvector('simple'::regconfig, coalesce(name, ''))"
+DESCRIPTION_VECTOR = "to_tsvector('simple'::regconfig, coalesce(description, ''))"
+
+
+def upgrade() -> None:
+    # Full-text indexes are Postgres-only; SQLite uses the in-process index.
+    if op.get_context().dialect.name != "postgresql":
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute(f"CREATE INDEX IF NOT EXISTS ix_products_name_tsv ON products USING gin ({NAME_VECTOR})")
+    op.execute(f"CREATE INDEX IF NOT EXISTS ix_products_description_tsv ON products USING gin ({DESCRIPTION_VECTOR})")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_products_name_trgm ON products USING gin (name gin_trgm_ops)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_products_description_trgm ON products USING gin (description gin_trgm_ops)")
+
+
+def downgrade() -> None:
+    if op.get_context().dialect.name != "postgresql":
+        return
+    op.execute("DROP INDEX IF EXISTS ix_products_description_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_products_name_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_products_description_tsv")
+    op.execute("DROP INDEX IF EXISTS ix_products_name_tsv")
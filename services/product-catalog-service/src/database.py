@@ -1,16 +1,131 @@
-from sqlalchemy import create_engine
+import time
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.orm import declarative_base
 from config.settings import settings
+from .metrics import DB_POOL_CHECKOUT_WAIT, DB_POOL_TIMEOUTS, track_pool
+from .query_metrics import instrument_engine
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    metrics_label = "sync"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            DB_POOL_TIMEOUTS.labels(engine=self.metrics_label).inc()
+            raise
+        finally:
+            DB_POOL_CHECKOUT_WAIT.labels(engine=self.metrics_label).observe(time.perf_counter() - start)
+
+
+class TimedAsyncQueuePool(TimedQueuePool, AsyncAdaptedQueuePool):
+    metrics_label = "async"
+
 
-engine = create_engine(settings.DATABASE_URL)
+def pool_options(url: str, poolclass) -> dict:
+    """Engine pool arguments from the DB_POOL_* and DB_PGBOUNCER settings."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        # Local development keeps SQLAlchemy's default SQLite pooling.
+        return {}
+    if settings.DB_PGBOUNCER:
+        # PgBouncer (transaction pooling) owns the connections: keep none idle
+        # here, and skip server-side prepared statements, which break when
+        # consecutive transactions land on different server connections.
+        options = {"poolclass": NullPool}
+        if parsed.get_driver_name() == "psycopg":
+            options["connect_args"] = {"prepare_threshold": None}
+        return options
+    return {
+        "poolclass": poolclass,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def track_engine_pool(engine, label: str) -> None:
+    if isinstance(engine.pool, QueuePool):
+        track_pool(engine.pool, label, settings.DB_MAX_OVERFLOW)
+    instrument_engine(engine)
+
+
+engine = create_engine(settings.DATABASE_URL, **pool_options(settings.DATABASE_URL, TimedQueuePool))
+track_engine_pool(engine, "sync")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
-def get_db():
+def get_sync_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+# Opt-in async data path. With ASYNC_DB_ENABLED the routes get an AsyncSession
+# and service calls run on the event loop through AsyncSession.run_sync, so a
+# request waiting on Postgres does not hold one of the worker threads.
+ASYNC_DRIVERS = {"postgresql": "postgresql+psycopg", "sqlite": "sqlite+aiosqlite"}
+
+
+def async_database_url(url: str) -> str:
+    parsed = make_url(url)
+    if parsed.drivername in ASYNC_DRIVERS.values() or parsed.drivername == "postgresql+asyncpg":
+        return url
+    return parsed.set(drivername=ASYNC_DRIVERS.get(parsed.get_backend_name(), parsed.drivername)).render_as_string(hide_password=False)
+
+
+async_engine = None
+if settings.ASYNC_DB_ENABLED:
+    ASYNC_DATABASE_URL = async_database_url(settings.DATABASE_URL)
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **pool_options(ASYNC_DATABASE_URL, TimedAsyncQueuePool))
+    track_engine_pool(async_engine.sync_engine, "async")
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+get_db = get_async_db if settings.ASYNC_DB_ENABLED else get_sync_db
+
+
+async def run_db(db, fn, *args, **kwargs):
+    """Call sync ``fn(db, *args, **kwargs)`` from a coroutine.
+
+    AsyncSession runs it on the event loop; a plain Session (the default
+    path, and the test doubles) is offloaded to the thread pool as before.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+
+class AsyncService:
+    """Awaitable facade over a ``*Service`` class of ``(db, ...)`` static methods."""
+
+    def __init__(self, service):
+        self._service = service
+
+    def __getattr__(self, name):
+        method = getattr(self._service, name)
+
+        async def call(db, *args, **kwargs):
+            return await run_db(db, method, *args, **kwargs)
+
+        return call
@@ -7,7 +7,9 @@ from .routes import router
 from .health import router as health_router
 from .logging_config import setup_logging, get_logger
 from .metrics import setup_metrics
+from .query_metrics import QueryMetricsMiddleware
 from .rate_limit import get_limiter, setup_rate_limiting
+from .pagination import NEXT_CURSOR_HEADER
 
 # Setup structured logging
 logger = setup_logging("product-catalog-service")
@@ -43,7 +45,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
+app.add_middleware(QueryMetricsMiddleware)
 
 
 @app.middleware("http")
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
@@ -7,75 +7,85 @@ from .schemas import (
     CategoryCreate, CategoryUpdate, CategoryResponse,
     ProductCreate, ProductUpdate, ProductResponse
 )
-from .services import CategoryService, ProductService
+from .services import AsyncCategoryService, AsyncProductService
+from .pagination import PageParams, set_next_cursor
 
 router = APIRouter()
 
+MAX_SEARCH_PAGE_SIZE = 200
+
 @router.post("/api/categories", status_code=status.HTTP_201_CREATED, response_model=CategoryResponse)
-def create_category(category: CategoryCreate, db: Session = Depends(get_db)):
-    if CategoryService.get_by_name(db, category.name):
+async def create_category(category: CategoryCreate, db: Session = Depends(get_db)):
+    if await AsyncCategoryService.get_by_name(db, category.name):
         raise HTTPException(status_code=400, detail="Category already exists")
-    return CategoryService.create(db, category)
+    return await AsyncCategoryService.create(db, category)
 
 @router.get("/api/categories", response_model=List[CategoryResponse])
-def list_categories(db: Session = Depends(get_db)):
-    return CategoryService.get_all(db)
+async def list_categories(response: Response, page: PageParams = Depends(), db: Session = Depends(get_db)):
+    categories, next_cursor = await AsyncCategoryService.get_all(db, page)
+    set_next_cursor(response, next_cursor)
+    return categories
 
 @router.patch("/api/categories/{category_id}", response_model=CategoryResponse)
-def update_category(category_id: int, category: CategoryUpdate, db: Session = Depends(get_db)):
-    db_category = CategoryService.get_by_id(db, category_id)
+async def update_category(category_id: int, category: CategoryUpdate, db: Session = Depends(get_db)):
+    db_category = await AsyncCategoryService.get_by_id(db, category_id)
     if not db_category:
         raise HTTPException(status_code=404, detail="Category not found")
-    return CategoryService.update(db, db_category, category)
+    return await AsyncCategoryService.update(db, db_category, category)
 
 @router.delete("/api/categories/{category_id}")
-def delete_category(category_id: int, db: Session = Depends(get_db)):
-    db_category = CategoryService.get_by_id(db, category_id)
+async def delete_category(category_id: int, db: Session = Depends(get_db)):
+    db_category = await AsyncCategoryService.get_by_id(db, category_id)
     if not db_category:
         raise HTTPException(status_code=404, detail="Category not found")
-    CategoryService.delete(db, db_category)
+    await AsyncCategoryService.delete(db, db_category)
     return {"message": "Category deleted successfully"}
 
 @router.post("/api/products", status_code=status.HTTP_201_CREATED, response_model=ProductResponse)
-def create_product(product: ProductCreate, db: Session = Depends(get_db)):
-    return ProductService.create(db, product)
+async def create_product(product: ProductCreate, db: Session = Depends(get_db)):
+    return await AsyncProductService.create(db, product)
 
 @router.get("/api/products/search", response_model=List[ProductResponse])
-def search_products(
+async def search_products(
     name: Optional[str] = None, 
     description: Optional[str] = None, 
     category_id: Optional[int] = None, 
+    q: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_SEARCH_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
     db: Session = Depends(get_db)
 ):
-    return ProductService.search(db, name, description, category_id)
+    # Results are ranked by relevance when any search term is given.
+    # `limit` is optional so existing callers that fetch the full catalog keep working.
+    return await AsyncProductService.search(db, name, description, category_id, q, limit, offset)
 
 @router.get("/api/products/filter", response_model=List[ProductResponse])
-def filter_products(
+async def filter_products(
     min_price: Optional[float] = None, 
     max_price: Optional[float] = None, 
     category_id: Optional[int] = None, 
     db: Session = Depends(get_db)
 ):
-    return ProductService.filter_products(db, min_price, max_price, category_id)
+    return await AsyncProductService.filter_products(db, min_price, max_price, category_id)
 
 @router.get("/api/products/{product_id}", response_model=ProductResponse)
-def get_product(product_id: int, db: Session = Depends(get_db)):
-    product = ProductService.get_by_id(db, product_id)
+async def get_product(product_id: int, db: Session = Depends(get_db)):
+    product = await AsyncProductService.get_by_id(db, product_id)
     if not product:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
     return product
 
 @router.patch("/api/products/{product_id}", response_model=ProductResponse)
-def update_product(product_id: int, product_update: ProductUpdate, db: Session = Depends(get_db)):
-    product = ProductService.get_by_id(db, product_id)
+async def update_product(product_id: int, product_update: ProductUpdate, db: Session = Depends(get_db)):
+    product = await AsyncProductService.get_by_id(db, product_id)
     if not product:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
-    return ProductService.update(db, product, product_update)
+    return await AsyncProductService.update(db, product, product_update)
 
 @router.delete("/api/products/{product_id}")
-def delete_product(product_id: int, db: Session = Depends(get_db)):
-    product = ProductService.get_by_id(db, product_id)
+async def delete_product(product_id: int, db: Session = Depends(get_db)):
+    product = await AsyncProductService.get_by_id(db, product_id)
     if not product:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
-    ProductService.delete(db, product)
+    await AsyncProductService.delete(db, product)
     return {"message": f"Product {product_id} deleted successfully"}
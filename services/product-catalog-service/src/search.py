@@ -0,0 +1,246 @@
+"""Full-text product search.
+
+On PostgreSQL, queries are answered by the tsvector and trigram GIN indexes
+created in the ``product_search_index`` migration. Other dialects (SQLite in
+local development and tests) use an in-process inverted index that
+ProductService keeps in sync on create, update and delete.
+"""
+import math
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, literal_column, or_
+from sqlalchemy.orm import Query
+
+from .models import Product
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Field weights used for ranking: a hit in the product name counts for more
+# than a hit in the free-text description.
+FIELD_WEIGHTS = {"name": 2.0, "description": 1.0}
+
+# Postgres text search configuration. "simple" avoids English stemming, which
+# mangles the regional produce names in the catalog.
+PG_SEARCH_CONFIG = literal_column("'simple'::regconfig")
+
+# BM25 tuning constants.
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return [token.lower() for token in TOKEN_RE.findall(text)]
+
+
+class SearchIndex:
+    """Thread-safe in-process inverted index over product name and description.
+
+    Query terms match indexed tokens exactly or by prefix (so "tom" finds
+    "tomato") and results are ranked with BM25 per field. Unlike the
+    ``ILIKE '%term%'`` filter this replaced, and unlike the trigram match on
+    Postgres, a term never matches inside a word: "mato" does not find
+    "tomato".
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        # field -> token -> {product_id: term frequency}
+        self._postings: Dict[str, Dict[str, Dict[int, int]]] = {f: {} for f in FIELD_WEIGHTS}
+        # field -> sorted vocabulary, for prefix lookups
+        self._vocabulary: Dict[str, List[str]] = {f: [] for f in FIELD_WEIGHTS}
+        # field -> product_id -> distinct tokens, so removal touches only its postings
+        self._doc_tokens: Dict[str, Dict[int, List[str]]] = {f: {} for f in FIELD_WEIGHTS}
+        # field -> product_id -> token count
+        self._lengths: Dict[str, Dict[int, int]] = {f: {} for f in FIELD_WEIGHTS}
+        self._total_length: Dict[str, int] = {f: 0 for f in FIELD_WEIGHTS}
+        self._categories: Dict[int, Optional[int]] = {}
+        self.built = False
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reset()
+
+    def __len__(self) -> int:
+        return len(self._categories)
+
+    def build(self, products: Iterable) -> None:
+        with self._lock:
+            self.clear()
+            for product in products:
+                self._add(product)
+            self.built = True
+
+    def ensure_built(self, db) -> None:
+        """Load every product from the database the first time it is needed."""
+        if self.built:
+            return
+        with self._lock:
+            if not self.built:
+                self.build(db.query(Product).all())
+
+    def upsert(self, product) -> None:
+        with self._lock:
+            self._remove(product.id)
+            self._add(product)
+
+    def remove(self, product_id: int) -> None:
+        with self._lock:
+            self._remove(product_id)
+
+    def search(
+        self,
+        name: Optional[str] = None,
+        description: Optional[str] = None,
+        q: Optional[str] = None,
+        category_id: Optional[int] = None,
+    ) -> List[int]:
+        """Return matching product ids, best match first.
+
+        Every term of every supplied parameter must match (AND semantics);
+        ``q`` terms may match either field.
+        """
+        clauses: List[Tuple[str, Tuple[str, ...]]] = []
+        for token in tokenize(name):
+            clauses.append((token, ("name",)))
+        for token in tokenize(description):
+            clauses.append((token, ("description",)))
+        for token in tokenize(q):
+            clauses.append((token, tuple(FIELD_WEIGHTS)))
+
+        with self._lock:
+            scores: Optional[Dict[int, float]] = None
+            for token, fields in clauses:
+                clause_scores: Dict[int, float] = {}
+                for field in fields:
+                    for doc_id, score in self._score_field(field, token).items():
+                        clause_scores[doc_id] = clause_scores.get(doc_id, 0.0) + score
+                if scores is None:
+                    scores = clause_scores
+                else:
+                    scores = {
+                        doc_id: scores[doc_id] + score
+                        for doc_id, score in clause_scores.items()
+                        if doc_id in scores
+                    }
+                if not scores:
+                    return []
+
+            if scores is None:
+                scores = {doc_id: 0.0 for doc_id in self._categories}
+            if category_id:
+                scores = {
+                    doc_id: score for doc_id, score in scores.items()
+                    if self._categories.get(doc_id) == category_id
+                }
+
+        return [doc_id for doc_id, _ in sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))]
+
+    def _score_field(self, field: str, term: str) -> Dict[int, float]:
+        postings = self._postings[field]
+        lengths = self._lengths[field]
+        doc_count = len(self._categories)
+        if not doc_count:
+            return {}
+        avg_length = (self._total_length[field] / doc_count) or 1.0
+        weight = FIELD_WEIGHTS[field]
+
+        scores: Dict[int, float] = {}
+        for token in self._expand(field, term):
+            docs = postings[token]
+            idf = math.log(1 + (doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+            # Exact token matches outrank prefix completions.
+            match_weight = weight if token == term else weight * 0.5
+            for doc_id, tf in docs.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[doc_id] / avg_length)
+                score = idf * tf * (BM25_K1 + 1) / (tf + norm) * match_weight
+                if score > scores.get(doc_id, 0.0):
+                    scores[doc_id] = score
+        return scores
+
+    def _expand(self, field: str, term: str) -> List[str]:
+        vocabulary = self._vocabulary[field]
+        matches = []
+        for i in range(bisect_left(vocabulary, term), len(vocabulary)):
+            if not vocabulary[i].startswith(term):
+                break
+            matches.append(vocabulary[i])
+        return matches
+
+    def _add(self, product) -> None:
+        self._categories[product.id] = product.category_id
+        for field in FIELD_WEIGHTS:
+            counts = Counter(tokenize(getattr(product, field)))
+            postings = self._postings[field]
+            for token, tf in counts.items():
+                if token not in postings:
+                    postings[token] = {}
+                    insort(self._vocabulary[field], token)
+                postings[token][product.id] = tf
+            self._doc_tokens[field][product.id] = list(counts)
+            length = sum(counts.values())
+            self._lengths[field][product.id] = length
+            self._total_length[field] += length
+
+    def _remove(self, product_id: int) -> None:
+        if product_id not in self._categories:
+            return
+        del self._categories[product_id]
+        for field in FIELD_WEIGHTS:
+            postings = self._postings[field]
+            vocabulary = self._vocabulary[field]
+            for token in self._doc_tokens[field].pop(product_id, []):
+                del postings[token][product_id]
+                if not postings[token]:
+                    del postings[token]
+                    del vocabulary[bisect_left(vocabulary, token)]
+            self._total_length[field] -= self._lengths[field].pop(product_id, 0)
+
+
+product_index = SearchIndex()
+
+
+def uses_pg_search(db) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def _pg_vector(column):
+    # Must match the index expressions in the product_search_index migration
+    # exactly, otherwise the planner falls back to a sequential scan.
+    return func.to_tsvector(PG_SEARCH_CONFIG, func.coalesce(column, literal_column("''")))
+
+
+def pg_search(
+    query: Query,
+    name: Optional[str] = None,
+    description: Optional[str] = None,
+    q: Optional[str] = None,
+) -> Query:
+    """Filter and rank ``query`` with the Postgres full-text and trigram indexes."""
+    rank = None
+    terms = [(name, (Product.name,)), (description, (Product.description,)), (q, (Product.name, Product.description))]
+    for term, columns in terms:
+        if not term:
+            continue
+        ts_query = func.plainto_tsquery(PG_SEARCH_CONFIG, term)
+        matches = []
+        for column in columns:
+            vector = _pg_vector(column)
+            weight = FIELD_WEIGHTS["name" if column is Product.name else "description"]
+            # The trigram index serves the ILIKE branch, which keeps partial
+            # word matches ("tom" -> "tomato") working.
+            matches.extend([vector.op("@@")(ts_query), column.ilike(f"%{term}%")])
+            column_rank = (func.ts_rank(vector, ts_query) + func.similarity(func.coalesce(column, ""), term)) * weight
+            rank = column_rank if rank is None else rank + column_rank
+        query = query.filter(or_(*matches))
+    if rank is not None:
+        query = query.order_by(rank.desc(), Product.id)
+    return query
@@ -1,7 +1,10 @@
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from .models import Product, Category
 from .schemas import ProductCreate, ProductUpdate, CategoryCreate, CategoryUpdate
+from .search import product_index, pg_search, uses_pg_search
+from .pagination import PageParams, paginate
+from .database import AsyncService
 
 class CategoryService:
     @staticmethod
@@ -13,8 +16,8 @@ class CategoryService:
         return db.query(Category).filter(Category.name == name).first()
 
     @staticmethod
-    def get_all(db: Session) -> List[Category]:
-        return db.query(Category).all()
+    def get_all(db: Session, page: PageParams) -> Tuple[List[Category], Optional[str]]:
+        return paginate(db.query(Category), Category.id, page)
 
     @staticmethod
     def create(db: Session, category: CategoryCreate) -> Category:
@@ -47,6 +50,8 @@ class ProductService:
         db.add(new_product)
         db.commit()
         db.refresh(new_product)
+        if product_index.built:
+            product_index.upsert(new_product)
         return new_product
 
     @staticmethod
@@ -55,23 +60,48 @@ class ProductService:
             setattr(product, key, value)
         db.commit()
         db.refresh(product)
+        if product_index.built:
+            product_index.upsert(product)
         return product
 
     @staticmethod
     def delete(db: Session, product: Product) -> None:
+        product_id = product.id
         db.delete(product)
         db.commit()
+        if product_index.built:
+            product_index.remove(product_id)
 
     @staticmethod
-    def search(db: Session, name: Optional[str] = None, description: Optional[str] = None, category_id: Optional[int] = None) -> List[Product]:
-        query = db.query(Product)
-        if name:
-            query = query.filter(Product.name.ilike(f"%{name}%"))
-        if description:
-            query = query.filter(Product.description.ilike(f"%{description}%"))
-        if category_id:
-            query = query.filter(Product.category_id == category_id)
-        return query.all()
+    def search(
+        db: Session,
+        name: Optional[str] = None,
+        description: Optional[str] = None,
+        category_id: Optional[int] = None,
+        q: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> List[Product]:
+        if uses_pg_search(db):
+            query = pg_search(db.query(Product), name, description, q)
+            if category_id:
+                query = query.filter(Product.category_id == category_id)
+            if not (name or description or q):
+                query = query.order_by(Product.id)
+            if offset:
+                query = query.offset(offset)
+            if limit is not None:
+                query = query.limit(limit)
+            return query.all()
+
+        # In-process index: rank ids here, then hydrate just the requested page.
+        product_index.ensure_built(db)
+        ids = product_index.search(name, description, q, category_id)
+        page = ids[offset:offset + limit] if limit is not None else ids[offset:]
+        if not page:
+            return []
+        products = {p.id: p for p in db.query(Product).filter(Product.id.in_(page)).all()}
+        return [products[product_id] for product_id in page if product_id in products]
 
     @staticmethod
     def filter_products(db: Session, min_price: Optional[float] = None, max_price: Optional[float] = None, category_id: Optional[int] = None) -> List[Product]:
@@ -83,3 +113,6 @@ class ProductService:
         if category_id:
             query = query.filter(Product.category_id == category_id)
         return query.all()
+
+AsyncCategoryService = AsyncService(CategoryService)
+AsyncProductService = AsyncService(ProductService)
@@ -3,9 +3,18 @@ from unittest.mock import MagicMock
 from fastapi.testclient import TestClient
 from src.main import app
 from src.routes import get_db
+from src.models import Category, Product
+from src.search import SearchIndex, product_index
 
 # --- Fixtures ---
 
+@pytest.fixture(autouse=True)
+def reset_search_index():
+    """The in-process search index is a module singleton; start each test empty."""
+    product_index.clear()
+    yield
+    product_index.clear()
+
 @pytest.fixture
 def mock_db_session():
     """Returns a mock implementation of the SQLAlchemy Session."""
@@ -84,7 +93,7 @@ def test_list_categories(client, mock_db_session):
     cat2.name = "Fruits"
 
     mock_categories = [cat1, cat2]
-    mock_db_session.query.return_value.all.return_value = mock_categories
+    mock_db_session.query.return_value.order_by.return_value.limit.return_value.all.return_value = mock_categories
     
     response = client.get("/api/categories")
     
@@ -92,6 +101,28 @@ def test_list_categories(client, mock_db_session):
     assert len(response.json()) == 2
     assert response.json()[0]["name"] == "Veg"
 
+def test_list_categories_next_cursor(client, mock_db_session):
+    categories = [Category(id=i, name=f"Category {i}") for i in (1, 2, 3)]
+    mock_query = mock_db_session.query.return_value
+    mock_query.order_by.return_value.limit.return_value.all.return_value = categories
+
+    response = client.get("/api/categories?limit=2", headers={"Origin": "https://app.example"})
+
+    assert [c["id"] for c in response.json()] == [1, 2]
+    cursor = response.headers["x-next-cursor"]
+    # Browsers may only read the cursor header if CORS exposes it.
+    assert "x-next-cursor" in response.headers["access-control-expose-headers"].lower()
+
+    mock_query.filter.return_value.order_by.return_value.limit.return_value.all.return_value = categories[2:]
+    response = client.get(f"/api/categories?limit=2&after={cursor}")
+
+    assert [c["id"] for c in response.json()] == [3]
+    assert "x-next-cursor" not in response.headers
+    assert str(mock_query.filter.call_args[0][0].right.value) == "2"
+
+def test_list_categories_rejects_large_pages(client):
+    assert client.get("/api/categories?limit=201").status_code == 422
+
 # --- Tests for Products ---
 
 def test_create_product_success(client, mock_db_session):
@@ -156,3 +187,95 @@ def test_search_products(client, mock_db_session):
     assert response.status_code == 200
     assert len(response.json()) == 1
     assert response.json()[0]["name"] == "Carrot"
+
+def test_search_products_paginated(client, mock_db_session):
+    products = [
+        Product(id=1, name="Tomato", description="Hybrid tomato", price=20.0, category_id=1),
+        Product(id=2, name="Cherry Tomato", description="Sweet", price=40.0, category_id=1),
+        Product(id=3, name="Potato", description="Tomato sized", price=15.0, category_id=1),
+    ]
+    mock_query = mock_db_session.query.return_value
+    mock_query.all.return_value = products
+    mock_query.filter.return_value.all.return_value = products
+
+    response = client.get("/api/products/search?q=tomato&limit=2")
+
+    assert response.status_code == 200
+    assert [p["id"] for p in response.json()] == [1, 2]
+
+    response = client.get("/api/products/search?q=tomato&limit=2&offset=2")
+    assert [p["id"] for p in response.json()] == [3]
+
+# --- Tests for the in-process search index ---
+
+def test_search_index_ranks_name_matches_first():
+    index = SearchIndex()
+    index.build([
+        Product(id=1, name="Onion", description="Goes well with tomato", category_id=1),
+        Product(id=2, name="Tomato", description="Fresh red", category_id=1),
+    ])
+
+    assert index.search(q="tomato") == [2, 1]
+    assert index.search(name="tomato") == [2]
+    assert index.search(description="tomato") == [1]
+
+def test_search_index_prefix_and_category():
+    index = SearchIndex()
+    index.build([
+        Product(id=1, name="Tomato", description="", category_id=1),
+        Product(id=2, name="Tomatillo", description="", category_id=2),
+        Product(id=3, name="Carrot", description="", category_id=1),
+    ])
+
+    assert sorted(index.search(name="tom")) == [1, 2]
+    assert index.search(name="tom", category_id=2) == [2]
+    assert index.search(name="tomato carrot") == []
+
+def test_search_index_tracks_updates_and_deletes():
+    index = SearchIndex()
+    product = Product(id=1, name="Tomato", description="", category_id=1)
+    index.build([product])
+
+    product.name = "Brinjal"
+    index.upsert(product)
+    assert index.search(name="tomato") == []
+    assert index.search(name="brinjal") == [1]
+
+    index.remove(1)
+    assert index.search(name="brinjal") == []
+    assert len(index) == 0
+
+
+def test_request_queries_and_pool_checkouts_are_recorded(tmp_path):
+    from prometheus_client import REGISTRY
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from src.database import Base, TimedQueuePool, pool_options, settings, track_engine_pool
+
+    # The pool the service would build for Postgres, over a SQLite file.
+    engine = create_engine(
+        f"sqlite:///{tmp_path}/queries.db", **pool_options("postgresql+psycopg://u:p@db/app", TimedQueuePool))
+    assert isinstance(engine.pool, TimedQueuePool) and engine.pool.size() == settings.DB_POOL_SIZE
+    Base.metadata.create_all(engine)
+    track_engine_pool(engine, "sync")
+    sessions = sessionmaker(bind=engine)
+
+    def sqlite_db():
+        db = sessions()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = sqlite_db
+    route = "/api/categories"
+    selects = REGISTRY.get_sample_value("db_queries_total", {"operation": "select", "route": route}) or 0
+    requests = REGISTRY.get_sample_value("db_queries_per_request_count", {"route": route}) or 0
+    checkouts = REGISTRY.get_sample_value("db_pool_checkout_wait_seconds_count", {"engine": "sync"}) or 0
+    try:
+        assert TestClient(app).get("/api/categories").status_code == 200
+    finally:
+        app.dependency_overrides = {}
+    assert REGISTRY.get_sample_value("db_queries_total", {"operation": "select", "route": route}) > selects
+    assert REGISTRY.get_sample_value("db_queries_per_request_count", {"route": route}) == requests + 1
+    assert REGISTRY.get_sample_value("db_pool_checkout_wait_seconds_count", {"engine": "sync"}) > checkouts
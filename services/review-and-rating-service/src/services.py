@@ -3,6 +3,8 @@ from sqlalchemy.orm import Session
 from typing import List, Optional, Tuple
 from .models import Review
 from .schemas import ReviewCreate, ReviewUpdate, Rating, ModerationRequest
+from .pagination import PageParams, paginate
+from .database import AsyncService
 
 class ReviewService:
     @staticmethod
@@ -18,8 +20,8 @@ class ReviewService:
         return new_review
 
     @staticmethod
-    def get_all_reviews(db: Session) -> List[Review]:
-        return db.query(Review).all()
+    def get_all_reviews(db: Session, page: PageParams) -> Tuple[List[Review], Optional[str]]:
+        return paginate(db.query(Review), Review.id, page)
 
     @staticmethod
     def get_review(db: Session, review_id: str) -> Optional[Review]:
@@ -79,3 +81,5 @@ class ReviewService:
     @staticmethod
     def get_moderated_reviews(db: Session) -> List[Review]:
         return db.query(Review).filter(Review.content.like("[MODERATED]%")).all()
+
+AsyncReviewService = AsyncService(ReviewService)
@@ -50,6 +50,27 @@ def test_create_review(client, mock_db_session):
     mock_db_session.add.assert_called()
     mock_db_session.commit.assert_called()
 
+def test_get_all_reviews_next_cursor(client, mock_db_session):
+    ids = sorted(str(uuid.uuid4()) for _ in range(3))
+    reviews = [Review(id=i, rating=4.0, content="Fine", reviewer_id=1, reviewed_id=2) for i in ids]
+    mock_query = mock_db_session.query.return_value
+    mock_query.order_by.return_value.limit.return_value.all.return_value = reviews
+
+    response = client.get("/api/reviews?limit=2")
+
+    assert [r["id"] for r in response.json()] == ids[:2]
+    cursor = response.headers["x-next-cursor"]
+
+    mock_query.filter.return_value.order_by.return_value.limit.return_value.all.return_value = reviews[2:]
+    response = client.get(f"/api/reviews?limit=2&after={cursor}")
+
+    assert [r["id"] for r in response.json()] == ids[2:]
+    assert "x-next-cursor" not in response.headers
+    assert str(mock_query.filter.call_args[0][0].right.value) == ids[1]
+
+def test_get_all_reviews_rejects_large_pages(client):
+    assert client.get("/api/reviews?limit=201").status_code == 422
+
 def test_get_review(client, mock_db_session):
     valid_uuid = "123e4567-e89b-12d3-a456-426614174000"
     mock_review = Review(id=valid_uuid, rating=5.0, content="Good", reviewer_id=1, reviewed_id=2)
@@ -103,3 +124,38 @@ def test_flag_for_moderation(client, mock_db_session):
     
     assert response.status_code == 200
     assert mock_review.content.startswith("[MODERATED]")
+
+
+def test_request_queries_and_pool_checkouts_are_recorded(tmp_path):
+    from prometheus_client import REGISTRY
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from src.database import Base, TimedQueuePool, pool_options, settings, track_engine_pool
+
+    # The pool the service would build for Postgres, over a SQLite file.
+    engine = create_engine(
+        f"sqlite:///{tmp_path}/queries.db", **pool_options("postgresql+psycopg://u:p@db/app", TimedQueuePool))
+    assert isinstance(engine.pool, TimedQueuePool) and engine.pool.size() == settings.DB_POOL_SIZE
+    Base.metadata.create_all(engine)
+    track_engine_pool(engine, "sync")
+    sessions = sessionmaker(bind=engine)
+
+    def sqlite_db():
+        db = sessions()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = sqlite_db
+    route = "/api/reviews"
+    selects = REGISTRY.get_sample_value("db_queries_total", {"operation": "select", "route": route}) or 0
+    requests = REGISTRY.get_sample_value("db_queries_per_request_count", {"route": route}) or 0
+    checkouts = REGISTRY.get_sample_value("db_pool_checkout_wait_seconds_count", {"engine": "sync"}) or 0
+    try:
+        assert TestClient(app).get("/api/reviews").status_code == 200
+    finally:
+        app.dependency_overrides = {}
+    assert REGISTRY.get_sample_value("db_queries_total", {"operation": "select", "route": route}) > selects
+    assert REGISTRY.get_sample_value("db_queries_per_request_count", {"route": route}) == requests + 1
+    assert REGISTRY.get_sample_value("db_pool_checkout_wait_seconds_count", {"engine": "sync"}) > checkouts
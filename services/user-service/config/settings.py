@@ -10,6 +10,33 @@ class Settings(BaseSettings):
     SECRET_KEY: str = os.getenv("SECRET_KEY", "super-secret-key")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+    ASYNC_DB_ENABLED: bool = False
+    # Connection pool sizing, per process. Keep replicas * (size + overflow)
+    # below Postgres max_connections, or set DB_PGBOUNCER behind PgBouncer.
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_PGBOUNCER: bool = False
+    # Requests issuing more queries than this are logged as possible N+1 loops.
+    DB_N_PLUS_ONE_THRESHOLD: int = 10
+    # Verified JWTs are cached until their exp, but never longer than this.
+    TOKEN_CACHE_TTL_SECONDS: float = 300.0
+    TOKEN_CACHE_MAX_ENTRIES: int = 10000
+    # User rows behind get_current_user; other replicas see changes after this.
+    USER_CACHE_TTL_SECONDS: float = 15.0
+    USER_CACHE_MAX_ENTRIES: int = 10000
+    # Password hashing profile (src/passwords.py). Changing it takes effect
+    # for each user at their next login; no password reset is needed.
+    PASSWORD_HASH_SCHEME: str = "bcrypt"  # or "argon2" (needs argon2-cffi)
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+    PASSWORD_ARGON2_TIME_COST: int = 3
+    PASSWORD_ARGON2_MEMORY_COST: int = 65536  # KiB
+    PASSWORD_ARGON2_PARALLELISM: int = 1
+    # Threads dedicated to hashing, and how many operations may wait for them.
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 32
 
 
 settings = Settings()
@@ -0,0 +1,117 @@
+"""Caches on the authenticated request path.
+
+Every authenticated call used to decode its JWT and load the user row. With
+these, a repeated token costs one dictionary lookup. User rows are cached for
+USER_CACHE_TTL_SECONDS (by username for get_current_user, by id for bulk
+lookups) and dropped by UserService whenever it changes one;
+a change made through another replica is picked up when the entry expires.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from config.settings import settings
+from .metrics import AUTH_CACHE_REQUESTS
+
+
+class TTLCache:
+    """Thread-safe LRU mapping whose entries expire ``ttl`` seconds after being set."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class VerifiedTokenCache:
+    """Claims of already-verified JWTs, keyed by the token's SHA-256.
+
+    An entry lives until the token's ``exp`` (capped at ``max_ttl``), so an
+    expired token is never served from here and goes back through
+    ``jwt.decode``, which rejects it.
+    """
+
+    def __init__(self, maxsize: int, max_ttl: float):
+        self.max_ttl = max_ttl
+        self._entries = TTLCache(maxsize, max_ttl)
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[dict]:
+        claims = self._entries.get(self._key(token))
+        AUTH_CACHE_REQUESTS.labels(cache="token", result="hit" if claims is not None else "miss").inc()
+        return claims
+
+    def put(self, token: str, claims: dict) -> None:
+        ttl = self.max_ttl
+        if "exp" in claims:
+            ttl = min(ttl, float(claims["exp"]) - time.time())
+        if ttl > 0:
+            self._entries.set(self._key(token), claims, ttl=ttl)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class UserCache:
+    """User rows by username, detached from the session that loaded them."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._entries = TTLCache(maxsize, ttl)
+
+    def get(self, username: str):
+        user = self._entries.get(username)
+        AUTH_CACHE_REQUESTS.labels(cache="user", result="hit" if user is not None else "miss").inc()
+        return user
+
+    def put(self, user) -> None:
+        self._entries.set(user.username, user)
+
+    def invalidate(self, *usernames: str) -> None:
+        for username in usernames:
+            self._entries.pop(username)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+verified_tokens = VerifiedTokenCache(settings.TOKEN_CACHE_MAX_ENTRIES, settings.TOKEN_CACHE_TTL_SECONDS)
+user_cache = UserCache(settings.USER_CACHE_MAX_ENTRIES, settings.USER_CACHE_TTL_SECONDS)
+# Public fields of users by id, for bulk lookups.
+user_summaries = TTLCache(settings.USER_CACHE_MAX_ENTRIES, settings.USER_CACHE_TTL_SECONDS)
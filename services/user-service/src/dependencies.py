@@ -3,11 +3,12 @@ from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from .database import get_db
 from .models import User
-from .services import UserService, AuthService
+from .services import AuthService, AsyncUserService
+from .cache import user_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
     payload = AuthService.verify_token(token)
     if not payload:
         raise HTTPException(
@@ -19,7 +20,13 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     if username is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
     
-    user = UserService.get_by_username(db, username=username)
+    user = user_cache.get(username)
     if user is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+        user = await AsyncUserService.get_by_username(db, username=username)
+        if user is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+        # The cached row is shared between requests, so detach it from this
+        # request's session; UserService reloads it before any update.
+        db.expunge(user)
+        user_cache.put(user)
     return user
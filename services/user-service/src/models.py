@@ -2,9 +2,6 @@ from sqlalchemy import Column, Integer, String, Enum, Date
 from sqlalchemy.ext.declarative import declarative_base
 
 import enum
-from passlib.context import CryptContext
-
-pwd_context = CryptContext(schemes=["bcrypt"], default="bcrypt")
 
 Base = declarative_base()
 
@@ -29,9 +26,3 @@ class User(Base):
     address = Column(String, nullable=True)
     date_of_birth = Column(Date, nullable=True)
     payment_method_token = Column(String, nullable=True)
-
-    def set_password(self, password):
-        self.hashed_password = pwd_context.hash(password)
-
-    def verify_password(self, plain_password):
-        return pwd_context.verify(plain_password, self.hashed_password)
@@ -0,0 +1,88 @@
+"""Password hashing off the event loop.
+
+bcrypt/argon2 are deliberately slow, so hashing and verification run on a
+small dedicated thread pool instead of the event loop or the shared
+threadpool that serves sync routes and health checks. At most
+PASSWORD_HASH_MAX_PENDING operations may be queued or running; beyond that
+callers get PasswordHasherBusy and the route answers 503.
+
+The hashing profile comes from settings. Changing it does not invalidate
+existing hashes: verify() reports when a stored hash no longer matches the
+profile, and login stores a fresh hash.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+from config.settings import settings
+from .metrics import PASSWORD_HASH_DURATION, PASSWORD_HASH_QUEUE_DEPTH, PASSWORD_HASH_REJECTED
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when PASSWORD_HASH_MAX_PENDING operations are already queued."""
+
+
+def build_context() -> CryptContext:
+    # bcrypt stays in the list so existing hashes keep verifying (and get
+    # upgraded on login) after switching the default to argon2.
+    schemes = ["argon2", "bcrypt"] if settings.PASSWORD_HASH_SCHEME == "argon2" else ["bcrypt"]
+    return CryptContext(
+        schemes=schemes,
+        default=settings.PASSWORD_HASH_SCHEME,
+        deprecated="auto",
+        bcrypt__rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+        argon2__time_cost=settings.PASSWORD_ARGON2_TIME_COST,
+        argon2__memory_cost=settings.PASSWORD_ARGON2_MEMORY_COST,
+        argon2__parallelism=settings.PASSWORD_ARGON2_PARALLELISM,
+    )
+
+
+pwd_context = build_context()
+
+_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_pending = 0
+_pending_lock = threading.Lock()
+
+
+def _timed(operation: str, fn, *args):
+    start = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        PASSWORD_HASH_DURATION.labels(operation=operation).observe(time.perf_counter() - start)
+
+
+async def _submit(operation: str, fn, *args):
+    global _pending
+    with _pending_lock:
+        if _pending >= settings.PASSWORD_HASH_MAX_PENDING:
+            PASSWORD_HASH_REJECTED.inc()
+            raise PasswordHasherBusy()
+        _pending += 1
+        PASSWORD_HASH_QUEUE_DEPTH.set(_pending)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, _timed, operation, fn, *args)
+    finally:
+        with _pending_lock:
+            _pending -= 1
+            PASSWORD_HASH_QUEUE_DEPTH.set(_pending)
+
+
+async def hash_password(password: str) -> str:
+    return await _submit("hash", pwd_context.hash, password)
+
+
+async def verify_password(password: str, hashed: Optional[str]) -> Tuple[bool, Optional[str]]:
+    """Return (valid, new_hash); new_hash is set when the stored hash should be replaced.
+
+    With no stored hash (unknown user) a dummy verification still runs, so
+    the response time does not reveal whether the username exists.
+    """
+    if hashed is None:
+        await _submit("verify", pwd_context.dummy_verify)
+        return False, None
+    return await _submit("verify", pwd_context.verify_and_update, password, hashed)
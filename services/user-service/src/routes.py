@@ -1,39 +1,59 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from .database import get_db
 from .models import Role, User
 from .schemas import (
     UserCreate, UserUpdate, RoleUpdate, UserResponse,
-    PasswordForgot, PasswordReset, Token, LoginRequest
+    PasswordForgot, PasswordReset, Token, LoginRequest,
+    UserLookup, PUBLIC_USER_FIELDS, MAX_LOOKUP_IDS
 )
-from .services import UserService, AuthService
+from .services import AuthService, AsyncUserService, authenticate_user
+from .passwords import PasswordHasherBusy, hash_password
 from .dependencies import get_current_user
 
 router = APIRouter()
 
+def _busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many concurrent password operations, retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
+async def _hash_or_503(password: str) -> str:
+    try:
+        return await hash_password(password)
+    except PasswordHasherBusy:
+        raise _busy()
+
 @router.post("/api/users/register", status_code=status.HTTP_201_CREATED, response_model=dict)
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
-    if UserService.get_by_username(db, user.username):
+async def register_user(user: UserCreate, db: Session = Depends(get_db)):
+    if await AsyncUserService.get_by_username(db, user.username):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Username already exists")
 
     if user.role not in [r.value for r in Role]:
          raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid role. Must be one of {[r.value for r in Role]}")
 
-    new_user = UserService.create_user(db, user)
+    hashed_password = await _hash_or_503(user.password)
+    new_user = await AsyncUserService.create_user(db, user, hashed_password)
     return {"message": "User created successfully", "user_id": new_user.id}
 
 @router.post("/api/users/admin-register", status_code=status.HTTP_201_CREATED)
-def register_admin(user: UserCreate, db: Session = Depends(get_db)):
+async def register_admin(user: UserCreate, db: Session = Depends(get_db)):
     if user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Role must be 'admin' for this endpoint")
     
-    return register_user(user, db)
+    return await register_user(user, db)
 
 @router.post("/api/auth/login", response_model=Token)
-def login(login_req: LoginRequest, db: Session = Depends(get_db)):
-    user = AuthService.authenticate_user(db, login_req.username, login_req.password)
+async def login(login_req: LoginRequest, db: Session = Depends(get_db)):
+    try:
+        user = await authenticate_user(db, login_req.username, login_req.password)
+    except PasswordHasherBusy:
+        raise _busy()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -52,14 +72,43 @@ def read_users_me(current_user: User = Depends(get_current_user)):
     return current_user
 
 @router.patch("/api/users/me", response_model=UserResponse)
-def update_user_me(user_update: UserUpdate, 
+async def update_user_me(user_update: UserUpdate, 
                         current_user: User = Depends(get_current_user), 
                         db: Session = Depends(get_db)):
-    return UserService.update_user(db, current_user, user_update)
+    return await AsyncUserService.update_user(db, current_user, user_update)
+
+def _split_csv(value: Optional[str]) -> Optional[List[str]]:
+    return [part.strip() for part in value.split(",") if part.strip()] if value else None
+
+async def _lookup_users(db: Session, ids: List[int], fields: Optional[List[str]]) -> List[dict]:
+    if len(ids) > MAX_LOOKUP_IDS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"At most {MAX_LOOKUP_IDS} ids per lookup")
+    fields = fields or list(PUBLIC_USER_FIELDS)
+    unknown = set(fields) - set(PUBLIC_USER_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields {sorted(unknown)}. Must be among {list(PUBLIC_USER_FIELDS)}")
+    users = await AsyncUserService.get_public_by_ids(db, ids)
+    return [{field: user[field] for field in fields} for user in users]
+
+@router.get("/api/users", response_model=List[dict])
+async def lookup_users(ids: str = Query(..., description="Comma-separated user ids"),
+                       fields: Optional[str] = Query(None, description="Comma-separated subset of the public fields"),
+                       db: Session = Depends(get_db)):
+    try:
+        user_ids = [int(part) for part in _split_csv(ids) or []]
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="ids must be comma-separated integers")
+    return await _lookup_users(db, user_ids, _split_csv(fields))
+
+@router.post("/api/users/lookup", response_model=List[dict])
+async def lookup_users_bulk(lookup: UserLookup, db: Session = Depends(get_db)):
+    return await _lookup_users(db, lookup.ids, lookup.fields)
 
 @router.get("/api/users/{user_id}", response_model=UserResponse)
-def read_user(user_id: int, db: Session = Depends(get_db)):
-    user = UserService.get_by_id(db, user_id)
+async def read_user(user_id: int, db: Session = Depends(get_db)):
+    user = await AsyncUserService.get_by_id(db, user_id)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     return user
@@ -69,8 +118,8 @@ def list_roles():
     return {"roles": [r.value for r in Role]}
 
 @router.patch("/api/users/{user_id}/role")
-def update_user_role(user_id: int, role_update: RoleUpdate, db: Session = Depends(get_db)):
-    user = UserService.get_by_id(db, user_id)
+async def update_user_role(user_id: int, role_update: RoleUpdate, db: Session = Depends(get_db)):
+    user = await AsyncUserService.get_by_id(db, user_id)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     
@@ -78,7 +127,7 @@ def update_user_role(user_id: int, role_update: RoleUpdate, db: Session = Depend
          raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid role. Must be one of {[r.value for r in Role]}")
 
-    updated_user = UserService.update_role(db, user, role_update)
+    updated_user = await AsyncUserService.update_role(db, user, role_update)
     return {"message": "Role updated successfully", "new_role": updated_user.role}
 
 @router.post("/api/password/forgot")
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, ConfigDict, EmailStr
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
+from typing import List, Optional
 from datetime import date
 
 class UserCreate(BaseModel):
@@ -55,3 +55,12 @@ class Token(BaseModel):
 class LoginRequest(BaseModel):
     username: str
     password: str
+
+# Bulk lookup (GET /api/users?ids=..., POST /api/users/lookup) returns only
+# these display fields, never contact or payment details.
+PUBLIC_USER_FIELDS = ("id", "username", "role", "first_name", "last_name")
+MAX_LOOKUP_IDS = 200
+
+class UserLookup(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=MAX_LOOKUP_IDS)
+    fields: Optional[List[str]] = None
@@ -1,10 +1,14 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, List, Optional
 from jose import jwt, JWTError
 from sqlalchemy.orm import Session
 from config.settings import settings
-from .models import User
-from .schemas import UserCreate, UserUpdate, RoleUpdate
+from .models import Role, User
+from .schemas import UserCreate, UserUpdate, RoleUpdate, PUBLIC_USER_FIELDS
+from .database import AsyncService
+from .cache import user_cache, user_summaries, verified_tokens
+from .metrics import PASSWORD_REHASHES
+from .passwords import verify_password
 
 class AuthService:
     @staticmethod
@@ -17,20 +21,15 @@ class AuthService:
 
     @staticmethod
     def verify_token(token: str) -> Optional[dict]:
+        payload = verified_tokens.get(token)
+        if payload is not None:
+            return payload
         try:
             payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-            return payload
         except JWTError:
             return None
-
-    @staticmethod
-    def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
-        user = UserService.get_by_username(db, username)
-        if not user:
-            return None
-        if not user.verify_password(password):
-            return None
-        return user
+        verified_tokens.put(token, payload)
+        return payload
 
 class UserService:
     @staticmethod
@@ -42,16 +41,39 @@ class UserService:
         return db.query(User).filter(User.id == user_id).first()
 
     @staticmethod
-    def create_user(db: Session, user: UserCreate) -> User:
+    def get_public_by_ids(db: Session, ids: List[int]) -> List[Dict]:
+        """Public fields of each existing user in ``ids``, in the order given.
+
+        Ids missing from the cache are loaded with a single IN query.
+        """
+        found = {}
+        for user_id in ids:
+            summary = user_summaries.get(user_id)
+            if summary is not None:
+                found[user_id] = summary
+        missing = set(ids) - found.keys()
+        if missing:
+            columns = [getattr(User, field) for field in PUBLIC_USER_FIELDS]
+            for row in db.query(*columns).filter(User.id.in_(missing)):
+                summary = dict(row._mapping)
+                if isinstance(summary["role"], Role):
+                    summary["role"] = summary["role"].value
+                user_summaries.set(summary["id"], summary)
+                found[summary["id"]] = summary
+        return [found[user_id] for user_id in dict.fromkeys(ids) if user_id in found]
+
+    @staticmethod
+    def create_user(db: Session, user: UserCreate, hashed_password: str) -> User:
+        """Insert ``user``; the password is hashed beforehand with passwords.hash_password."""
         user_data = user.model_dump()
-        password = user_data.pop("password")
+        user_data.pop("password")
         
         # Role validation usually handled by Pydantic, but explicit check here is extra safety
         # user.role is a string in UserCreate, User model expects Enum or string depending on SQLA setup.
         # implementation in main.py line 50 checked against [r.value for r in Role]
         
         new_user = User(**user_data)
-        new_user.set_password(password)
+        new_user.hashed_password = hashed_password
         db.add(new_user)
         db.commit()
         db.refresh(new_user)
@@ -59,17 +81,51 @@ class UserService:
 
     @staticmethod
     def update_user(db: Session, user: User, update_data: UserUpdate) -> User:
+        if user not in db:
+            # current_user may come from user_cache, detached and possibly
+            # stale; apply the update to the row as it is now.
+            user = db.get(User, user.id)
+        old_username = user.username
         data = update_data.model_dump(exclude_unset=True)
         for key, value in data.items():
             setattr(user, key, value)
         
         db.commit()
         db.refresh(user)
+        user_cache.invalidate(old_username, user.username)
+        user_summaries.pop(user.id)
         return user
 
+    @staticmethod
+    def set_password_hash(db: Session, user: User, hashed_password: str) -> None:
+        user.hashed_password = hashed_password
+        db.commit()
+
     @staticmethod
     def update_role(db: Session, user: User, role_update: RoleUpdate) -> User:
         user.role = role_update.role
         db.commit()
         db.refresh(user)
+        user_cache.invalidate(user.username)
+        user_summaries.pop(user.id)
         return user
+
+AsyncAuthService = AsyncService(AuthService)
+AsyncUserService = AsyncService(UserService)
+
+
+async def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
+    """Check credentials, upgrading the stored hash if the hashing profile changed.
+
+    Verification runs on the password pool rather than inside the
+    database call, so a login burst does not occupy the event loop or the
+    threads serving other requests.
+    """
+    user = await AsyncUserService.get_by_username(db, username)
+    valid, new_hash = await verify_password(password, user.hashed_password if user else None)
+    if not valid:
+        return None
+    if new_hash:
+        await AsyncUserService.set_password_hash(db, user, new_hash)
+        PASSWORD_REHASHES.inc()
+    return user
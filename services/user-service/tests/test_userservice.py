@@ -107,3 +107,124 @@ def test_read_users_me_success(client, mock_db_session):
     
     # cleanup
     del app.dependency_overrides[get_current_user]
+
+
+def test_verify_token_cache_honors_exp():
+    from datetime import datetime, timedelta
+    from jose import jwt
+    from config.settings import settings
+    from src.cache import verified_tokens
+    from src.services import AuthService
+
+    verified_tokens.clear()
+    token = AuthService.create_access_token({"sub": "testuser"})
+    assert AuthService.verify_token(token)["sub"] == "testuser"
+    assert verified_tokens.get(token)["sub"] == "testuser"
+
+    expired = jwt.encode(
+        {"sub": "testuser", "exp": datetime.utcnow() - timedelta(seconds=1)},
+        settings.SECRET_KEY, algorithm=settings.ALGORITHM,
+    )
+    assert AuthService.verify_token(expired) is None
+    verified_tokens.put(expired, {"sub": "testuser", "exp": 0})
+    assert verified_tokens.get(expired) is None
+
+
+def test_current_user_cached_until_role_update(client, mock_db_session):
+    from src.cache import user_cache
+    from src.schemas import RoleUpdate
+    from src.services import AuthService, UserService
+
+    user_cache.clear()
+    mock_user = MagicMock(id=1, username="testuser", email="test@example.com", role="farmer",
+                          first_name=None, last_name=None, phone_number=None, address=None,
+                          date_of_birth=None, payment_method_token=None)
+    mock_db_session.query.return_value.filter.return_value.first.return_value = mock_user
+    headers = {"Authorization": f"Bearer {AuthService.create_access_token({'sub': 'testuser'})}"}
+
+    assert client.get("/api/users/me", headers=headers).status_code == 200
+    assert client.get("/api/users/me", headers=headers).status_code == 200
+    assert mock_db_session.query.call_count == 1
+
+    UserService.update_role(mock_db_session, mock_user, RoleUpdate(role="admin"))
+    assert client.get("/api/users/me", headers=headers).json()["role"] == "admin"
+    assert mock_db_session.query.call_count == 2
+
+
+def test_verify_password_flags_outdated_profile():
+    import asyncio
+    from passlib.context import CryptContext
+    from src.passwords import verify_password
+
+    cheap = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("secret")
+    valid, new_hash = asyncio.run(verify_password("secret", cheap))
+    assert valid and new_hash.startswith("$2b$12$")
+    assert asyncio.run(verify_password("wrong", cheap)) == (False, None)
+    assert asyncio.run(verify_password("secret", None)) == (False, None)
+
+
+def test_login_returns_503_when_hash_queue_full(client, monkeypatch):
+    from config.settings import settings
+
+    monkeypatch.setattr(settings, "PASSWORD_HASH_MAX_PENDING", 0)
+    response = client.post("/api/auth/login", json={"username": "testuser", "password": "secret"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_lookup_users_one_query_then_cached(client, mock_db_session):
+    from types import SimpleNamespace
+    from src.cache import user_summaries
+
+    user_summaries.clear()
+    rows = [
+        SimpleNamespace(_mapping={"id": i, "username": f"user{i}", "role": "farmer", "first_name": f"U{i}", "last_name": None})
+        for i in (1, 2)
+    ]
+    mock_db_session.query.return_value.filter.return_value = rows
+
+    response = client.get("/api/users?ids=2,1,3&fields=id,first_name")
+    assert response.status_code == 200
+    assert response.json() == [{"id": 2, "first_name": "U2"}, {"id": 1, "first_name": "U1"}]
+
+    response = client.post("/api/users/lookup", json={"ids": [1, 2]})
+    assert [u["username"] for u in response.json()] == ["user1", "user2"]
+    assert mock_db_session.query.call_count == 1
+
+    assert client.get("/api/users?ids=1&fields=payment_method_token").status_code == 400
+    assert client.get("/api/users?ids=1,a").status_code == 400
+
+
+def test_request_queries_and_pool_checkouts_are_recorded(tmp_path):
+    from prometheus_client import REGISTRY
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from src.database import Base, TimedQueuePool, pool_options, settings, track_engine_pool
+
+    # The pool the service would build for Postgres, over a SQLite file.
+    engine = create_engine(
+        f"sqlite:///{tmp_path}/queries.db", **pool_options("postgresql+psycopg://u:p@db/app", TimedQueuePool))
+    assert isinstance(engine.pool, TimedQueuePool) and engine.pool.size() == settings.DB_POOL_SIZE
+    Base.metadata.create_all(engine)
+    track_engine_pool(engine, "sync")
+    sessions = sessionmaker(bind=engine)
+
+    def sqlite_db():
+        db = sessions()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = sqlite_db
+    route = "/api/users/{user_id}"
+    selects = REGISTRY.get_sample_value("db_queries_total", {"operation": "select", "route": route}) or 0
+    requests = REGISTRY.get_sample_value("db_queries_per_request_count", {"route": route}) or 0
+    checkouts = REGISTRY.get_sample_value("db_pool_checkout_wait_seconds_count", {"engine": "sync"}) or 0
+    try:
+        assert TestClient(app).get("/api/users/1").status_code == 404
+    finally:
+        app.dependency_overrides = {}
+    assert REGISTRY.get_sample_value("db_queries_total", {"operation": "select", "route": route}) > selects
+    assert REGISTRY.get_sample_value("db_queries_per_request_count", {"route": route}) == requests + 1
+    assert REGISTRY.get_sample_value("db_pool_checkout_wait_seconds_count", {"engine": "sync"}) > checkouts